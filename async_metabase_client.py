@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Asyncio fetch of a whole Metabase instance: every dashboard and every card on it
+Read-only inventory for sizing a migration; the migration itself runs on MetabaseMigrator.
+A semaphore bounds the requests in flight. Uses aiohttp when it is installed; otherwise
+requests run on MetabaseTransport in a thread pool sized, paced and limited like the
+threaded migrator (HTTP_SETTINGS), so only requests is required.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from config import METABASE_CONFIG, MIGRATION_SETTINGS, HTTP_SETTINGS
+from metabase_migrator import MetabaseConfig, MetabaseTransport, RateLimiter, AdaptiveConcurrency, RETRY_STATUSES
+
+logger = logging.getLogger(__name__)
+
+class AsyncMetabaseClient:
+    """Async client for the read calls of fetch_instance; use as `async with AsyncMetabaseClient(config)`"""
+
+    def __init__(self, config: MetabaseConfig, max_concurrency: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None, settings: Optional[Dict] = None):
+        self.config = config
+        self.max_concurrency = max_concurrency or MIGRATION_SETTINGS.get("async_max_concurrency", 100)
+        self.settings = {**HTTP_SETTINGS, **(settings or {})}
+        self.session_token = None
+        # Own rate setting for aiohttp: the threaded requests_per_second would cap the requests in flight
+        requests_per_second = MIGRATION_SETTINGS.get("async_requests_per_second")
+        if rate_limiter is None and requests_per_second:
+            rate_limiter = RateLimiter(requests_per_second, self.settings.get("burst", 1))
+        self.rate_limiter = rate_limiter
+        self.retries = 0
+        self.requests_sent = 0
+        # Requests actually allowed in flight once open: max_concurrency, or the fallback pool size
+        self.in_flight_limit = self.max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread_local = threading.local()
+        self._concurrency: Dict[str, AdaptiveConcurrency] = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if aiohttp is not None:
+            connect_timeout, read_timeout = self.settings["timeout"]
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            )
+        else:
+            # Blocking fallback: no more threads than kept-alive connections, the threaded rate
+            # limit unless one was given, and the AIMD in-flight limits of MetabaseTransport
+            if self.rate_limiter is None and self.settings.get("requests_per_second"):
+                self.rate_limiter = RateLimiter(self.settings["requests_per_second"], self.settings.get("burst", 1))
+            self._concurrency = {
+                name: AdaptiveConcurrency(name, **limits)
+                for name, limits in (self.settings.get("adaptive_concurrency") or {}).items()
+            }
+            self.in_flight_limit = max(1, min(self.max_concurrency, self.settings["pool_size"]))
+            self._executor = ThreadPoolExecutor(max_workers=self.in_flight_limit)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.session_token:
+            headers["X-Metabase-Session"] = self.session_token
+        return headers
+
+    def _blocking_request(self, method: str, url: str, payload: Optional[Dict]) -> Tuple[int, Any]:
+        """Fallback without aiohttp: the thread's MetabaseTransport paces, limits and retries each attempt"""
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = MetabaseTransport(rate_limiter=self.rate_limiter, settings=self.settings,
+                                        concurrency=self._concurrency)
+            self._thread_local.session = session
+        response = session.request(method, url, headers=self._headers(), json=payload)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, response.text
+
+    async def _aiohttp_request(self, method: str, url: str, payload: Optional[Dict]) -> Tuple[int, Any]:
+        attempt = 0
+        while True:
+            try:
+                async with self._session.request(method, url, headers=self._headers(), json=payload) as response:
+                    text = await response.text()
+                    status = response.status
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.settings["max_retries"]:
+                    raise
+                delay = self.settings["backoff_factor"] * (2 ** attempt)
+                logger.warning(f"{method} {url} failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                if status not in RETRY_STATUSES or attempt >= self.settings["max_retries"]:
+                    try:
+                        return status, json.loads(text)
+                    except ValueError:
+                        return status, text
+                if retry_after and retry_after.isdigit():
+                    delay = min(float(retry_after), self.settings.get("max_backoff", 30.0))
+                else:
+                    delay = self.settings["backoff_factor"] * (2 ** attempt)
+                logger.warning(f"{method} {url} returned {status}, retrying in {delay:.1f}s")
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+
+    async def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Tuple[int, Any]:
+        """Send one API request; returns (status code, parsed JSON or text body)"""
+        if self._semaphore is None:
+            raise RuntimeError("AsyncMetabaseClient is not open; use it as an async context manager")
+        url = urljoin(self.config.base_url, path)
+        async with self._semaphore:
+            self.requests_sent += 1
+            if self._session is not None:
+                if self.rate_limiter is not None:
+                    await asyncio.sleep(self.rate_limiter.reserve())
+                return await self._aiohttp_request(method, url, payload)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._blocking_request, method, url, payload)
+
+    async def _get_json(self, path: str, description: str) -> Optional[Any]:
+        try:
+            status, body = await self.request("GET", path)
+        except Exception as e:
+            logger.error(f"Error getting {description}: {str(e)}")
+            return None
+        if status == 200:
+            return body
+        logger.error(f"Failed to get {description}: {status}")
+        return None
+
+    async def authenticate(self) -> bool:
+        """Authenticate with Metabase and get session token"""
+        try:
+            status, body = await self.request("POST", "/api/session", {
+                "username": self.config.username,
+                "password": self.config.password
+            })
+        except Exception as e:
+            logger.error(f"Authentication error: {str(e)}")
+            return False
+        if status == 200 and isinstance(body, dict):
+            self.session_token = body.get("id")
+            logger.info("Successfully authenticated with Metabase")
+            return True
+        logger.error(f"Authentication failed: {status} - {body}")
+        return False
+
+    async def get_dashboards(self) -> List[Dict]:
+        """Get all dashboards from Metabase"""
+        return await self._get_json("/api/dashboard", "dashboards") or []
+
+    async def get_dashboard_details(self, dashboard_id: int) -> Optional[Dict]:
+        """Get detailed information about a specific dashboard"""
+        return await self._get_json(f"/api/dashboard/{dashboard_id}", f"dashboard {dashboard_id}")
+
+    async def get_question_details(self, question_id: int) -> Optional[Dict]:
+        """Get detailed information about a specific question"""
+        return await self._get_json(f"/api/card/{question_id}", f"question {question_id}")
+
+    async def get_question_details_many(self, question_ids: Iterable[int]) -> Dict[int, Optional[Dict]]:
+        """Fetch many questions at once, bounded only by the concurrency setting"""
+        question_ids = list(dict.fromkeys(question_ids))
+        cards = await asyncio.gather(*(self.get_question_details(question_id) for question_id in question_ids))
+        return dict(zip(question_ids, cards))
+
+async def fetch_instance(client: AsyncMetabaseClient) -> Tuple[Dict[int, Dict], Dict[int, Optional[Dict]]]:
+    """Fetch every dashboard and every card on it, keeping up to max_concurrency requests in flight"""
+    dashboards = await client.get_dashboards()
+    details = await asyncio.gather(*(client.get_dashboard_details(d.get('id')) for d in dashboards))
+    question_ids = [
+        dashcard['card']['id']
+        for dashboard in details if dashboard
+        for dashcard in dashboard.get('dashcards', [])
+        if (dashcard.get('card') or {}).get('id')
+    ]
+    cards = await client.get_question_details_many(question_ids)
+    return {dashboard['id']: dashboard for dashboard in details if dashboard}, cards
+
+async def async_main():
+    config = MetabaseConfig(
+        base_url=METABASE_CONFIG["base_url"],
+        username=METABASE_CONFIG["username"],
+        password=METABASE_CONFIG["password"]
+    )
+
+    print(f"🚀 Fetching the whole Metabase instance ({'aiohttp' if aiohttp else 'thread pool'} backend)")
+    print("=" * 60)
+
+    start = time.time()
+    async with AsyncMetabaseClient(config) as client:
+        if not await client.authenticate():
+            print("❌ Authentication failed")
+            return
+        dashboards, cards = await fetch_instance(client)
+        elapsed = time.time() - start
+        print(f"📊 Dashboards: {len(dashboards)}")
+        print(f"❓ Cards: {len(cards)} ({sum(1 for card in cards.values() if card is None)} failed)")
+        print(f"⏱️  {client.requests_sent} requests in {elapsed:.2f}s "
+              f"with up to {client.in_flight_limit} in flight")
+
+def main():
+    """Main function"""
+    asyncio.run(async_main())
+
+if __name__ == "__main__":
+    main()
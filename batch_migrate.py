@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Script to migrate many dashboards in one run
+Mappings are loaded and Metabase is authenticated once, every dashboard shares the
+card and conversion caches, and dashboards are migrated concurrently.
+
+Dashboards run on threads rather than processes: a migration spends its time waiting on
+Metabase, and threads share the migrator's session, card cache, rate limiter, adaptive
+concurrency limits and per-database query slots. Separate processes would each log in,
+refetch cards and apply their own limits, multiplying the load on Metabase and StarRocks.
+SQL conversion is a single cached pass per card; CPU-heavy compilation of many dashboards
+runs on a process pool in migration_plan.py instead.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from config import METABASE_CONFIG, MIGRATION_SETTINGS
+from conversion_cache import get_conversion_cache
+from metabase_migrator import MetabaseMigrator, MetabaseConfig
+from migrate_dashboard import (
+    load_migration_mapping, load_column_mapping_config, run_dashboard_migration, log_timing,
+    print_preflight_blockers
+)
+from preflight import preflight_inspections
+from sql_rewriter import get_table_matcher
+
+# Dashboards to migrate: a list or range of IDs, and/or every dashboard of a collection
+DASHBOARD_IDS = MIGRATION_SETTINGS.get("batch_dashboard_ids", [])
+COLLECTION_ID = MIGRATION_SETTINGS.get("batch_collection_id")
+# Dashboards migrated at the same time
+WORKERS = MIGRATION_SETTINGS.get("batch_workers", 4)
+SUMMARY_FILE = 'migrations/batch_migration_summary.json'
+
+def resolve_dashboard_ids(migrator: MetabaseMigrator, dashboard_ids: List[int],
+                          collection_id: Optional[int] = None) -> List[int]:
+    """Dashboard IDs to migrate, in order and without duplicates"""
+    ids = list(dashboard_ids)
+    if collection_id is not None:
+        collection_dashboards = migrator.get_collection_dashboards(collection_id)
+        print(f"📁 Collection {collection_id}: {len(collection_dashboards)} dashboards")
+        ids.extend(dashboard['id'] for dashboard in collection_dashboards)
+    return list(dict.fromkeys(ids))
+
+def migrate_dashboards(dashboard_ids: List[int], migrator: MetabaseMigrator, migration_mapping: Dict,
+                       column_config: Dict, workers: int = WORKERS) -> List[Dict]:
+    """Migrate dashboards concurrently; returns one summary per dashboard, in input order"""
+    results = {}
+
+    def migrate(dashboard_id):
+        try:
+            result = run_dashboard_migration(dashboard_id, migrator, migration_mapping, column_config)
+        except Exception as e:
+            return {"dashboard_id": dashboard_id, "success": False, "error": str(e)}
+        if result is None:
+            return {"dashboard_id": dashboard_id, "success": False, "error": "Could not load dashboard"}
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(migrate, dashboard_id): dashboard_id for dashboard_id in dashboard_ids}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = "✅" if result["success"] else "❌"
+            print(f"\n{status} Dashboard {result['dashboard_id']} finished ({len(results)}/{len(dashboard_ids)})")
+
+    return [results[dashboard_id] for dashboard_id in dashboard_ids]
+
+def print_summary(results: List[Dict], migrator: MetabaseMigrator, elapsed: float):
+    """Print one consolidated summary for the whole batch"""
+    print(f"\n" + "=" * 60)
+    print(f"📊 BATCH MIGRATION SUMMARY")
+    print("=" * 60)
+    print(f"  {'dashboard':>9}  {'native':>6}  {'migrated':>8}  {'validated':>9}  {'time':>7}  name")
+    for result in results:
+        if "error" in result:
+            print(f"  {result['dashboard_id']:>9}  ❌ {result['error']}")
+            continue
+        print(f"  {result['dashboard_id']:>9}  {result['native']:>6}  {result['migrated']:>8}  "
+              f"{result['validated']:>9}  {result['seconds']:>6.1f}s  {result['dashboard_name']}")
+
+    succeeded = [result for result in results if result["success"]]
+    native = sum(result.get("native", 0) for result in results)
+    migrated = sum(result.get("migrated", 0) for result in results)
+    validated = sum(result.get("validated", 0) for result in results)
+    print(f"\n✅ Dashboards passing validation: {len(succeeded)}/{len(results)}")
+    print(f"📝 Questions migrated: {migrated}/{native}, validated: {validated}")
+    conversion_cache = get_conversion_cache()
+    if conversion_cache is not None:
+        print(f"♻️  Conversion cache: {conversion_cache.summary()}")
+    print(f"♻️  Card requests avoided by the card cache: {migrator.avoided_card_requests}")
+    for line in migrator.concurrency_summary():
+        print(f"🎚️  Adaptive concurrency: {line}")
+    print(f"⏱️  Total time: {elapsed:.1f}s")
+
+def main():
+    """Main function"""
+    overall_start = time.time()
+
+    print(f"🚀 Starting batch migration")
+    print("=" * 60)
+
+    # Everything below is done once for the whole batch
+    step_start = time.time()
+    migration_mapping = load_migration_mapping()
+    if not migration_mapping:
+        return
+    get_table_matcher(migration_mapping['table_mapping'])
+    column_config = load_column_mapping_config()
+    step_start = log_timing(step_start, "Load mappings")
+
+    migrator = MetabaseMigrator(MetabaseConfig(
+        base_url=METABASE_CONFIG["base_url"],
+        username=METABASE_CONFIG["username"],
+        password=METABASE_CONFIG["password"]
+    ))
+    if not migrator.authenticate():
+        print("❌ Authentication failed")
+        return
+    step_start = log_timing(step_start, "Authentication")
+
+    dashboard_ids = resolve_dashboard_ids(migrator, DASHBOARD_IDS, COLLECTION_ID)
+    if not dashboard_ids:
+        print("❌ No dashboards to migrate")
+        return
+    # Report every dashboard that cannot complete before the first API write; blocked
+    # dashboards are left out of the run instead of failing halfway through it
+    blocked = {}
+    if MIGRATION_SETTINGS.get("preflight", True):
+        step_start = time.time()
+        for dashboard_id, blockers in preflight_inspections(dashboard_ids, migration_mapping).items():
+            if blockers:
+                print_preflight_blockers(dashboard_id, blockers)
+                blocked[dashboard_id] = {"dashboard_id": dashboard_id, "success": False,
+                                         "error": f"{len(blockers)} preflight blockers", "blockers": blockers}
+        step_start = log_timing(step_start, f"Preflight ({len(blocked)} dashboards blocked)")
+
+    ready_ids = [dashboard_id for dashboard_id in dashboard_ids if dashboard_id not in blocked]
+    print(f"📋 Migrating {len(ready_ids)} dashboards with {WORKERS} workers")
+
+    migrated = migrate_dashboards(ready_ids, migrator, migration_mapping, column_config, WORKERS)
+    results_by_id = {**blocked, **{result["dashboard_id"]: result for result in migrated}}
+    results = [results_by_id[dashboard_id] for dashboard_id in dashboard_ids]
+
+    with open(SUMMARY_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print_summary(results, migrator, time.time() - overall_start)
+    print(f"\n📄 Summary saved to {SUMMARY_FILE}")
+
+if __name__ == "__main__":
+    main()
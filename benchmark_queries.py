@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Benchmark migrated cards on StarRocks against their Exasol originals
+Runs every native card of each dashboard RUNS times on both engines through
+/api/dataset, after WARMUP discarded runs, alternating engines so both see the
+same conditions. Reports p50/p95 of the latency Metabase reports (running_time)
+and of the client-observed latency, the speedup per card and per dashboard, and
+flags cards that got slower on StarRocks.
+"""
+
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from config import METABASE_CONFIG
+from metabase_migrator import MetabaseMigrator, MetabaseConfig, QueryRun
+from migrate_dashboard import load_migration_mapping, log_timing
+from performance_ledger import PerformanceLedger, get_performance_ledger
+from result_parity import dashboard_source_cards, migrated_card
+
+# Dashboards to benchmark
+DASHBOARD_IDS = [421]
+# Measured runs per card and engine, after WARMUP discarded runs
+RUNS = 5
+WARMUP = 1
+REPORT_FILE = 'migrations/benchmark_report.json'
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """q-th percentile (0-100) with linear interpolation; None for no values"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def summarize_runs(runs: List[QueryRun]) -> Dict:
+    """p50/p95 of Metabase running_time (ms) and client latency (ms) over successful runs"""
+    ok = [run for run in runs if run.ok]
+    running = [run.running_time for run in ok if run.running_time is not None]
+    client = [run.client_time * 1000 for run in ok]
+    return {
+        "runs": len(runs),
+        "errors": len(runs) - len(ok),
+        "rows": ok[-1].row_count if ok else None,
+        "running_p50": percentile(running, 50),
+        "running_p95": percentile(running, 95),
+        "client_p50": percentile(client, 50),
+        "client_p95": percentile(client, 95),
+        "error": next((run.error for run in runs if not run.ok), None),
+    }
+
+def speedup(exasol: Dict, starrocks: Dict) -> Optional[float]:
+    """Exasol p50 over StarRocks p50, by running_time when both engines report it"""
+    for key in ("running_p50", "client_p50"):
+        if exasol.get(key) and starrocks.get(key):
+            return exasol[key] / starrocks[key]
+    return None
+
+def benchmark_card(question_id: int, question_name: str, source_card: Dict, migrator: MetabaseMigrator,
+                   migration_mapping: Dict, runs: int = RUNS, warmup: int = WARMUP,
+                   ledger: Optional[PerformanceLedger] = None, dashboard_id: Optional[int] = None) -> Dict:
+    """
+    Benchmark one card on both engines; the two queries alternate so load changes hit both.
+    Measured executions of both engines are recorded in the ledger when one is given.
+    """
+    result = {"question_id": question_id, "question_name": question_name}
+    card, reason = migrated_card(question_id, source_card, migrator, migration_mapping)
+    if card is None:
+        return {**result, "status": "skipped", "reason": reason}
+    queries = {"exasol": source_card['dataset_query'], "starrocks": card['dataset_query']}
+    measured = {engine: [] for engine in queries}
+    for iteration in range(warmup + runs):
+        for engine, dataset_query in queries.items():
+            with migrator.database_slot(dataset_query.get('database')):
+                run = migrator.run_query(dataset_query)
+            if iteration >= warmup:
+                measured[engine].append(run)
+    if ledger is not None:
+        ledger.record_many(((question_id, run) for engine_runs in measured.values() for run in engine_runs),
+                           "benchmark", dashboard_id)
+    stats = {engine: summarize_runs(engine_runs) for engine, engine_runs in measured.items()}
+    result.update(stats)
+    result["runs"] = measured
+    if stats["exasol"]["errors"] or stats["starrocks"]["errors"]:
+        return {**result, "status": "error"}
+    result["speedup"] = speedup(stats["exasol"], stats["starrocks"])
+    slower = result["speedup"] is not None and result["speedup"] < 1
+    return {**result, "status": "slower" if slower else "ok"}
+
+def summarize_dashboard(results: List[Dict]) -> Dict:
+    """Sum of card p50s on each engine (a sequential dashboard load), overall speedup and slower cards"""
+    measured = [result for result in results if result["status"] in ("ok", "slower")]
+    totals = {}
+    for engine in ("exasol", "starrocks"):
+        key = "running_p50" if all(result[engine]["running_p50"] is not None for result in measured) else "client_p50"
+        totals[engine] = sum(result[engine][key] for result in measured)
+    speedups = [result["speedup"] for result in measured if result["speedup"] is not None]
+    return {
+        "cards": len(results),
+        "measured": len(measured),
+        "exasol_total_p50": totals["exasol"],
+        "starrocks_total_p50": totals["starrocks"],
+        "speedup": totals["exasol"] / totals["starrocks"] if totals["starrocks"] else None,
+        "median_card_speedup": statistics.median(speedups) if speedups else None,
+        "slower_cards": [result["question_id"] for result in measured if result["status"] == "slower"],
+    }
+
+def benchmark_dashboard(dashboard_id: int, migrator: MetabaseMigrator, migration_mapping: Dict,
+                        runs: int = RUNS, warmup: int = WARMUP,
+                        ledger: Optional[PerformanceLedger] = None) -> Optional[Dict]:
+    """Benchmark every native card of a dashboard one after the other; None without a cached inspection"""
+    try:
+        with open(f'inspections/dashboard_{dashboard_id}_inspection.json', 'r') as f:
+            dashboard_data = json.load(f)
+    except FileNotFoundError:
+        return None
+    results = [
+        benchmark_card(card['id'], card.get('name', 'Unknown'), card, migrator, migration_mapping, runs, warmup,
+                       ledger, dashboard_id)
+        for card in dashboard_source_cards(dashboard_data).values()
+    ]
+    return {"dashboard_id": dashboard_id, "cards": results, "summary": summarize_dashboard(results)}
+
+def format_ms(value: Optional[float]) -> str:
+    """Milliseconds for the report, n/a when missing"""
+    return f"{value:.0f}ms" if value is not None else "n/a"
+
+def print_benchmark_report(report: Dict):
+    print(f"\n📊 Dashboard {report['dashboard_id']}")
+    for result in report["cards"]:
+        label = f"Question {result['question_id']} ({result['question_name']})"
+        if result["status"] == "skipped":
+            print(f"  ⏭️  {label}: {result['reason']}")
+            continue
+        if result["status"] == "error":
+            error = result["exasol"]["error"] or result["starrocks"]["error"]
+            print(f"  ⚠️  {label}: failed runs ({error})")
+            continue
+        exasol, starrocks = result["exasol"], result["starrocks"]
+        icon = "🐢" if result["status"] == "slower" else "🚀"
+        ratio = f"{result['speedup']:.1f}x" if result["speedup"] is not None else "n/a"
+        print(f"  {icon} {label}: {ratio}")
+        for engine, stats in (("Exasol", exasol), ("StarRocks", starrocks)):
+            print(f"    {engine:<9} running p50 {format_ms(stats['running_p50'])}, p95 {format_ms(stats['running_p95'])}"
+                  f" | client p50 {format_ms(stats['client_p50'])}, p95 {format_ms(stats['client_p95'])}")
+
+    summary = report["summary"]
+    print(f"  📈 {summary['measured']}/{summary['cards']} cards measured: "
+          f"Exasol {format_ms(summary['exasol_total_p50'])} vs StarRocks {format_ms(summary['starrocks_total_p50'])} in total")
+    if summary["speedup"]:
+        print(f"  ⚡ Speedup {summary['speedup']:.1f}x overall, {summary['median_card_speedup']:.1f}x median per card")
+    if summary["slower_cards"]:
+        print(f"  🐢 Slower on StarRocks: {summary['slower_cards']}")
+
+def write_report(reports: List[Dict], path: str = REPORT_FILE):
+    """Save the report without the individual runs' objects"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    serializable = [{
+        **report,
+        "cards": [{key: value for key, value in result.items() if key != "runs"} for result in report["cards"]]
+    } for report in reports]
+    with open(path, 'w') as f:
+        json.dump(serializable, f, indent=2)
+
+def main():
+    """Main function"""
+    start = time.time()
+
+    print(f"⏱️  Benchmarking Exasol against StarRocks ({WARMUP} warm-up + {RUNS} measured runs per card)")
+    print("=" * 60)
+
+    migration_mapping = load_migration_mapping()
+    if not migration_mapping:
+        return
+
+    migrator = MetabaseMigrator(MetabaseConfig(
+        base_url=METABASE_CONFIG["base_url"],
+        username=METABASE_CONFIG["username"],
+        password=METABASE_CONFIG["password"]
+    ))
+    if not migrator.authenticate():
+        print("❌ Authentication failed")
+        return
+
+    reports = []
+    for dashboard_id in DASHBOARD_IDS:
+        report = benchmark_dashboard(dashboard_id, migrator, migration_mapping, ledger=get_performance_ledger())
+        if report is None:
+            print(f"\n⚠️  Dashboard {dashboard_id}: no cached inspection with the Exasol originals")
+            continue
+        print_benchmark_report(report)
+        reports.append(report)
+
+    write_report(reports)
+    print(f"\n💾 Report saved to {REPORT_FILE}")
+    log_timing(start, "Benchmark")
+
+if __name__ == "__main__":
+    main()
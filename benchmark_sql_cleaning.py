@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Benchmark StarRocks SQL cleaning on the native queries cached in inspections/*.json
+Compares the single-pass rewrite engine with the previous sequential regex implementation
+"""
+
+import glob
+import io
+import json
+import re
+import statistics
+import time
+from contextlib import redirect_stdout
+
+from migrate_dashboard import get_visualization_columns, load_migration_mapping
+from sql_rewriter import TableMatcher, rewrite_sql_for_starrocks
+
+# Timed runs per query; the fastest run is reported
+REPEAT = 5
+# Number of slowest queries listed individually
+TOP_QUERIES = 15
+
+def legacy_clean_sql_for_starrocks(sql, visualization_columns, table_mapping):
+    """The sequential re.sub/str.replace implementation, kept verbatim (minus logging) as the baseline"""
+    
+    # First pass: Replace schema.table patterns (longer patterns first)
+    for exasol_table, starrocks_table in table_mapping.items():
+        if '.' in exasol_table:
+            exasol_schema, exasol_name = exasol_table.split('.', 1)
+            
+            # Replace full schema.table format (e.g., mart.transactions)
+            if exasol_table in sql:
+                sql = sql.replace(exasol_table, starrocks_table)
+            
+            # Replace uppercase schema.table format (e.g., MART.TRANSACTIONS)
+            uppercase_pattern = f"{exasol_schema.upper()}.{exasol_name.upper()}"
+            if uppercase_pattern in sql:
+                sql = sql.replace(uppercase_pattern, starrocks_table)
+            
+            # Replace mixed case schema.table format (e.g., MART.transactions)
+            mixed_pattern1 = f"{exasol_schema.upper()}.{exasol_name.lower()}"
+            if mixed_pattern1 in sql:
+                sql = sql.replace(mixed_pattern1, starrocks_table)
+            
+            mixed_pattern2 = f"{exasol_schema.lower()}.{exasol_name.upper()}"
+            if mixed_pattern2 in sql:
+                sql = sql.replace(mixed_pattern2, starrocks_table)
+    
+    # Second pass: Contextual replacement - find which StarRocks tables are actually used
+    # and only replace standalone references to those specific table names
+    used_starrocks_tables = set()
+    
+    # Find all StarRocks table names that are actually used in the SQL
+    for starrocks_table in table_mapping.values():
+        if starrocks_table in sql:
+            used_starrocks_tables.add(starrocks_table)
+    
+    # For each used StarRocks table, find the corresponding Exasol table name
+    # and replace standalone references to that table name
+    for exasol_table, starrocks_table in table_mapping.items():
+        if starrocks_table in used_starrocks_tables:
+            if '.' in exasol_table:
+                _, exasol_name = exasol_table.split('.', 1)
+            else:
+                exasol_name = exasol_table
+            
+            # Replace standalone references to this table name
+            if re.search(rf'\b{re.escape(exasol_name.upper())}\b', sql):
+                sql = re.sub(rf'\b{re.escape(exasol_name.upper())}\b', starrocks_table, sql)
+            
+            if re.search(rf'\b{re.escape(exasol_name.lower())}\b', sql):
+                sql = re.sub(rf'\b{re.escape(exasol_name.lower())}\b', starrocks_table, sql)
+    
+    # Fix StarRocks window function syntax
+    sql = re.sub(r'PARTITION BY 1', '', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'OVER \(\)', 'OVER ()', sql, flags=re.IGNORECASE)
+    
+    # Replace Exasol-specific functions with StarRocks equivalents
+    # NULLIFZERO(value) -> NULLIF(value, 0)
+    sql = re.sub(r'NULLIFZERO\s*\(\s*([^)]+)\s*\)', r'NULLIF(\1, 0)', sql, flags=re.IGNORECASE)
+    
+    # zeroifnull -> ifnull(, 0)
+    sql = re.sub(r'zeroifnull\s*\(\s*([^)]+)\s*\)', r'ifnull(\1, 0)', sql, flags=re.IGNORECASE)
+    
+    # Fix nullif(bigint(20)) compatibility issue
+    # Replace nullif(bigint(20)) with ifnull(bigint(20), 0)
+    sql = re.sub(r'nullif\s*\(\s*bigint\s*\(\s*20\s*\)\s*\)', r'ifnull(bigint(20), 0)', sql, flags=re.IGNORECASE)
+    
+    # Fix NULLIF compatibility - cast value to float
+    # NULLIF(value, 0) -> NULLIF(cast(value as float), 0)
+    # But avoid double-casting if already cast
+    sql = re.sub(
+        r'NULLIF\s*\(\s*(?!cast\()([^,]+)\s*,\s*0\s*\)',
+        r'NULLIF(cast(\1 as float), 0)',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # convert -> cast
+    sql = re.sub(r'convert\s*\(\s*([^)]+)\s*\)', r'cast(\1)', sql, flags=re.IGNORECASE)
+    
+    # to_char -> char
+    sql = re.sub(r'to_char\s*\(\s*([^)]+)\s*\)', r'char(\1)', sql, flags=re.IGNORECASE)
+    
+    # to_date -> date
+    sql = re.sub(r'to_date\s*\(\s*([^)]+)\s*\)', r'date(\1)', sql, flags=re.IGNORECASE)
+    
+    # Fix json_value patterns
+    # json_value(t.FEE_PARAMETERS, '$.profit_fx_markup') -> parse_json(t.FEE_PARAMETERS)->'profit_fx_markup'
+    sql = re.sub(
+        r'json_value\s*\(\s*([^,]+)\s*,\s*[\'"]([^\'"]+)[\'"]\s*\)',
+        r'parse_json(\1)->\'\2\'',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # json_value with complex path -> CAST(JSON_QUERY(...))
+    sql = re.sub(
+        r'json_value\s*\(\s*([^,]+)\s*,\s*[\'"]([^\'"]+)[\'"]\s*\)',
+        r'CAST(JSON_QUERY(parse_json(\1), \'\2\') AS VARCHAR(128))',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Fix sum()/sum() division patterns
+    # sum(revenue_EUR)/sum(Turnover_EUR) -> sum(revenue_EUR)/cast(sum(Turnover_EUR) as float)
+    sql = re.sub(
+        r'sum\s*\(\s*([^)]+)\s*\)\s*/\s*sum\s*\(\s*([^)]+)\s*\)',
+        r'sum(\1)/cast(sum(\2) as float)',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Add table aliases to subqueries without names
+    # select * from (select * from table) -> select * from (select * from table) as subquery
+    sql = re.sub(
+        r'from\s*\(\s*select\s+\*\s+from\s+([^)]+)\s*\)\s*(?=\s|$)',
+        r'from (select * from \1) as subquery',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Convert granularity field reference to template tag parameter
+    # date_trunc(gran.granularity, fatpay.PAYMENT_AT) -> date_trunc({{granularity}}, fatpay.PAYMENT_AT)
+    # Handle any table alias: fg.granularity, gran.granularity, etc.
+    sql = re.sub(
+        r'date_trunc\s*\(\s*[a-zA-Z_]+\.granularity\s*,\s*([^)]+)\s*\)',
+        r'date_trunc({{granularity}}, \1)',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Change "grouping" to "grouped" everywhere except in template variables
+    # This handles cases like "as grouping" -> "as grouped"
+    sql = re.sub(
+        r'\bgrouping\b(?!\})',  # Negative lookahead to avoid matching {{grouping}}
+        r'grouped',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Convert listagg to group_concat for StarRocks compatibility
+    # listagg(column, ',') -> group_concat(column, ',')
+    sql = re.sub(
+        r'listagg\s*\(\s*([^)]+)\s*\)',
+        r'group_concat(\1)',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Fix median function - StarRocks doesn't have PERCENTILE_CONT, use a different approach
+    # Replace PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY column) with a window function approach
+    sql = re.sub(
+        r'PERCENTILE_CONT\(0\.5\)\s+WITHIN\s+GROUP\s*\(\s*ORDER\s+BY\s+([^)]+)\s*\)',
+        r'PERCENTILE_CONT(\1, 0.5)',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Also handle direct median() function calls - use correct StarRocks syntax
+    sql = re.sub(
+        r'median\s*\(\s*([^)]+)\s*\)',
+        r'PERCENTILE_CONT(\1, 0.5)',
+        sql,
+        flags=re.IGNORECASE
+    )
+    
+    # Fix column aliases based on visualization settings
+    for col in visualization_columns:
+        if col:
+            # Handle subquery aliases (as column_name)
+            pattern = rf'as\s+{re.escape(col.lower())}\b'
+            replacement = f'as {col}'
+            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
+            
+            # Handle main query references (tr.column_name)
+            pattern = rf'tr\.{re.escape(col.lower())}\b'
+            replacement = f'tr.{col}'
+            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
+            
+            # Handle other table references (table.column_name)
+            pattern = rf'\b{re.escape(col.lower())}\b'
+            replacement = col
+            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
+    
+    return sql
+
+
+def load_inspection_queries():
+    """Collect every native query from the cached dashboard inspections"""
+    queries = []
+    for filename in sorted(glob.glob('inspections/dashboard_*_inspection.json')):
+        with open(filename, 'r') as f:
+            dashboard_data = json.load(f)
+        for dashcard in dashboard_data.get('dashcards', []):
+            card = dashcard.get('card') or {}
+            dataset_query = card.get('dataset_query', {})
+            if dataset_query.get('type') != 'native':
+                continue
+            sql = dataset_query.get('native', {}).get('query', '')
+            if not sql:
+                continue
+            with redirect_stdout(io.StringIO()):
+                visualization_columns = get_visualization_columns(dashboard_data, card.get('id'))
+            queries.append({
+                "dashboard_id": dashboard_data.get('id'),
+                "question_id": card.get('id'),
+                "sql": sql,
+                "visualization_columns": visualization_columns
+            })
+    return queries
+
+def time_function(function, query, table_mapping):
+    """Return the best wall time in seconds over REPEAT runs"""
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(query["sql"], query["visualization_columns"], table_mapping)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def describe(label, timings):
+    """Print total/median/p95 per-query timings in milliseconds"""
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"  {label:<10} total {sum(ordered) * 1000:9.1f} ms | "
+          f"median {statistics.median(ordered) * 1000:7.3f} ms | "
+          f"p95 {p95 * 1000:7.3f} ms | max {ordered[-1] * 1000:7.3f} ms")
+
+def main():
+    """Main function"""
+    migration_mapping = load_migration_mapping()
+    if not migration_mapping:
+        return
+    table_mapping = migration_mapping['table_mapping']
+    
+    start = time.perf_counter()
+    TableMatcher(table_mapping)
+    print(f"🔤 Table matcher for {len(table_mapping)} tables built in "
+          f"{(time.perf_counter() - start) * 1000:.3f} ms (once per run)")
+    
+    queries = load_inspection_queries()
+    print(f"📊 Benchmarking {len(queries)} native queries ({REPEAT} runs each, best run reported)")
+    
+    results = []
+    differing = 0
+    for query in queries:
+        legacy_time = time_function(legacy_clean_sql_for_starrocks, query, table_mapping)
+        engine_time = time_function(rewrite_sql_for_starrocks, query, table_mapping)
+        
+        legacy_sql = legacy_clean_sql_for_starrocks(query["sql"], query["visualization_columns"], table_mapping)
+        engine_sql, _ = rewrite_sql_for_starrocks(query["sql"], query["visualization_columns"], table_mapping)
+        if legacy_sql != engine_sql:
+            differing += 1
+        
+        results.append((query, legacy_time, engine_time))
+    
+    print(f"\n🐢 Slowest {TOP_QUERIES} queries (by regex-pass time):")
+    print(f"  {'dashboard':>9} {'question':>8} {'chars':>7} {'regex ms':>9} {'engine ms':>9} {'speedup':>8}")
+    for query, legacy_time, engine_time in sorted(results, key=lambda r: r[1], reverse=True)[:TOP_QUERIES]:
+        print(f"  {query['dashboard_id']:>9} {query['question_id']:>8} {len(query['sql']):>7} "
+              f"{legacy_time * 1000:9.3f} {engine_time * 1000:9.3f} {legacy_time / engine_time:7.1f}x")
+    
+    legacy_times = [r[1] for r in results]
+    engine_times = [r[2] for r in results]
+    print(f"\n⏱️  Per-query time:")
+    describe("regex", legacy_times)
+    describe("engine", engine_times)
+    print(f"🚀 Overall speedup: {sum(legacy_times) / sum(engine_times):.1f}x")
+    print(f"🔍 Queries whose output differs from the regex passes: {differing}/{len(results)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of SQLConverter.convert_sql throughput (queries/sec)
+Compares the precompiled rule table with the previous per-call f-string regexes
+"""
+
+import glob
+import json
+import os
+import re
+import time
+
+from config import DatabaseMapping
+from sql_converter import SQLConverter
+
+# Seconds spent converting per scenario and implementation
+DURATION = 2.0
+# Synthetic table mappings used to show the effect of a large mapping set
+SYNTHETIC_TABLES = 400
+# Copies of the inspection queries in the convert_many batch
+BATCH_REPEAT = 10
+
+class LegacySQLConverter(SQLConverter):
+    """SQLConverter with the previous implementation: regexes built and compiled on every call"""
+
+    def _convert_table_references(self, sql: str) -> str:
+        converted_sql = sql
+        for mapping in self.database_mappings:
+            exasol_patterns = [
+                rf'\b{mapping.exasol_schema}\.{mapping.exasol_table}\b',
+                rf'\b{mapping.exasol_db}\.{mapping.exasol_schema}\.{mapping.exasol_table}\b'
+            ]
+            for pattern in exasol_patterns:
+                converted_sql = re.sub(
+                    pattern,
+                    f"{mapping.starrocks_db}.{mapping.starrocks_table}",
+                    converted_sql,
+                    flags=re.IGNORECASE
+                )
+        return converted_sql
+
+    def _convert_functions(self, sql: str) -> str:
+        converted_sql = sql
+        for exasol_func, starrocks_func in self.function_mappings.items():
+            if exasol_func == "MEDIAN":
+                converted_sql = self._convert_median_function(converted_sql)
+            else:
+                pattern = rf'\b{re.escape(exasol_func)}\s*\('
+                converted_sql = re.sub(pattern, f"{starrocks_func}(", converted_sql, flags=re.IGNORECASE)
+        return converted_sql
+
+    def _convert_median_function(self, sql: str) -> str:
+        median_pattern = r'\bMEDIAN\s*\(\s*([^)]+)\s*\)'
+
+        def replace_median(match):
+            column_expr = match.group(1).strip()
+            return f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY {column_expr})"
+
+        return re.sub(median_pattern, replace_median, sql, flags=re.IGNORECASE)
+
+    def validate_conversion(self, original_sql: str, converted_sql: str):
+        validation_result = super().validate_conversion(original_sql, converted_sql)
+        validation_result["tables_converted"] = 0
+        validation_result["functions_converted"] = 0
+        for mapping in self.database_mappings:
+            validation_result["tables_converted"] += len(re.findall(
+                rf'\b{mapping.exasol_schema}\.{mapping.exasol_table}\b',
+                original_sql,
+                flags=re.IGNORECASE
+            ))
+        for exasol_func in self.function_mappings.keys():
+            if exasol_func != "MEDIAN":
+                validation_result["functions_converted"] += len(re.findall(
+                    rf'\b{re.escape(exasol_func)}\s*\(',
+                    original_sql,
+                    flags=re.IGNORECASE
+                ))
+        return validation_result
+
+def load_inspection_sql():
+    """Collect every native query from the cached dashboard inspections"""
+    queries = []
+    for filename in sorted(glob.glob('inspections/dashboard_*_inspection.json')):
+        with open(filename, 'r') as f:
+            dashboard_data = json.load(f)
+        for dashcard in dashboard_data.get('dashcards', []):
+            dataset_query = (dashcard.get('card') or {}).get('dataset_query', {})
+            if dataset_query.get('type') == 'native':
+                sql = dataset_query.get('native', {}).get('query', '')
+                if sql:
+                    queries.append(sql)
+    return queries
+
+def load_table_mappings():
+    """DatabaseMapping entries for every table in migrations/migration_mapping.json"""
+    with open('migrations/migration_mapping.json', 'r') as f:
+        table_mapping = json.load(f)['table_mapping']
+    mappings = []
+    for exasol_table, starrocks_table in table_mapping.items():
+        schema, table = exasol_table.split('.', 1)
+        mappings.append(DatabaseMapping("exasol", schema, table, "default_catalog", starrocks_table))
+    return mappings
+
+def measure(converter, queries, validate):
+    """Convert queries round-robin for DURATION seconds; return queries/sec"""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        for sql in queries:
+            converted = converter.convert_sql(sql)
+            if validate:
+                converter.validate_conversion(sql, converted)
+        count += len(queries)
+    return count / (time.perf_counter() - start)
+
+def main():
+    """Main function"""
+    queries = load_inspection_sql()
+    table_mappings = load_table_mappings()
+    synthetic = [
+        DatabaseMapping("exasol", f"schema_{i}", f"table_{i}", "default_catalog", f"SCHEMA_{i}__TABLE_{i}")
+        for i in range(SYNTHETIC_TABLES)
+    ]
+    scenarios = [
+        ("config.py mappings", None),
+        (f"migration_mapping.json ({len(table_mappings)} tables)", table_mappings),
+        (f"{len(table_mappings) + SYNTHETIC_TABLES} tables", table_mappings + synthetic),
+    ]
+
+    print(f"📊 convert_sql throughput on {len(queries)} inspection queries ({DURATION:.0f}s per measurement)")
+    print(f"  {'scenario':<38} {'mode':<18} {'before q/s':>11} {'after q/s':>11} {'speedup':>8}")
+    for label, database_mappings in scenarios:
+        converters = []
+        for converter_class in (LegacySQLConverter, SQLConverter):
+            converter = converter_class()
+            if database_mappings is not None:
+                converter.database_mappings = database_mappings
+                converter.rebuild()
+            converters.append(converter)
+
+        for mode, validate in (("convert", False), ("convert+validate", True)):
+            before = measure(converters[0], queries, validate)
+            after = measure(converters[1], queries, validate)
+            print(f"  {label:<38} {mode:<18} {before:11.0f} {after:11.0f} {after / before:7.1f}x")
+    
+    # Batch dry-run: the same work through convert_many, serially and on every core
+    converter = SQLConverter()
+    converter.database_mappings = table_mappings
+    converter.rebuild()
+    batch = queries * BATCH_REPEAT
+    workers = os.cpu_count() or 1
+    print(f"\n📦 convert_many on {len(batch)} queries")
+    for label, worker_count in (("1 process", 1), (f"{workers} processes", workers)):
+        start = time.perf_counter()
+        converter.convert_many(batch, workers=worker_count)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<38} {elapsed:7.2f}s {len(batch) / elapsed:9.0f} q/s")
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ Script to check Metabase questions and verify their responses after migration
 
 import json
 import requests
-import time
 from metabase_migrator import MetabaseMigrator, MetabaseConfig
 from config import METABASE_CONFIG
 
@@ -128,11 +127,9 @@ def check_dashboard_questions(dashboard_id, migrator):
         print(f"\n📝 Question {total_count}/{len(questions)}")
         print("-" * 50)
         
+        # Request pacing is handled by the migrator's rate-limited transport
         if check_question_response(question_id, question_name, migrator):
             success_count += 1
-        
-        # Add a small delay to avoid overwhelming the server
-        time.sleep(1)
     
     print(f"\n🎉 Check Summary:")
     print(f"✅ Successfully checked: {success_count}/{total_count} questions")
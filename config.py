@@ -68,6 +68,91 @@ MIGRATION_SETTINGS = {
     "backup_original_sql": True,
     "output_format": "json",  # json, csv, sql
     "include_metadata": True,
+    # Persistent SQL conversion cache (SQLite); set to None to disable
+    "conversion_cache_path": "migrations/conversion_cache.sqlite",
+    # Maximum concurrent Metabase API requests when prefetching cards
+    "max_in_flight_requests": 8,
+    # Treat the body of a successful PUT /api/card/{id} as the card's verified state
+    # instead of reading the card back from Metabase
+    "reuse_put_response": True,
+    # Build migration input from the cards embedded in the dashboard payload;
+    # only cards changed since that snapshot are fetched individually
+    "use_embedded_cards": True,
+    # Requests in flight at once for the asyncio client (async_metabase_client.py)
+    "async_max_concurrency": 100,
+    # Rate limit for the asyncio client alone; None leaves it bounded only by the concurrency above
+    "async_requests_per_second": None,
+    # Worker threads per stage of the migrate_dashboard.py pipeline, and the size of
+    # the bounded queue in front of each stage (validate defaults to validation_workers)
+    "pipeline_workers": {"fetch": 8, "convert": 2, "update": 4},
+    "pipeline_queue_size": 16,
+    # Checkpoint journal (JSONL) used to resume interrupted runs; set to None to disable
+    "journal_path": "migrations/migration_journal.jsonl",
+    "journal_fsync_batch": 50,       # fsync after this many records...
+    "journal_fsync_interval": 2.0,   # ...or this many seconds, whichever comes first
+    # Delta sync: only migrate cards edited since their last migration (per the journal)
+    # and dashcards added since; unchanged cards are not fetched at all
+    "delta_sync": False,
+    # "full" runs each migrated question and reads back its whole result; "schema" runs it
+    # with at most validation_row_limit rows and compares the columns with result_metadata
+    "validation_mode": "full",
+    "validation_row_limit": 1,
+    # Questions validated at once by validate_migration, and the cap on queries running
+    # at the same time on one database (protects the StarRocks FE), across all dashboards
+    "validation_workers": 8,
+    "validation_max_per_database": 4,
+    # Check the inspection for unmapped fields and tables before migrating a dashboard,
+    # and skip dashboards that would fail (see preflight.py for a report of all of them)
+    "preflight": True,
+    # Batch runs (batch_migrate.py): dashboards to migrate (IDs and/or every dashboard of a
+    # collection) and how many are migrated at once
+    "batch_dashboard_ids": list(range(393, 422)),
+    "batch_collection_id": None,
+    "batch_workers": 4,
+    # Two-phase mode (migration_plan.py): plan file, processes compiling it (None: one per CPU)
+    # and PUT requests in flight while applying it
+    "plan_path": "migrations/migration_plan.json",
+    "plan_workers": None,
+    "apply_workers": 16,
+    # Result parity (result_parity.py): cards checked at once, decimal places numbers are
+    # rounded to before hashing, and the largest result whose rows are diffed on a mismatch
+    "parity_workers": 4,
+    "parity_decimal_places": 6,
+    "parity_diff_max_rows": 100000,
+    "parity_diff_sample": 10,
+    # Numeric tolerances used when digests disagree: |a - b| <= abs + rel * max(|a|, |b|)
+    # absorbs the float noise of the cast(... as float) rewrites
+    "parity_rel_tolerance": 1e-6,
+    "parity_abs_tolerance": 1e-6,
+    # Relative tolerances of the fingerprint probe; distinct counts are HyperLogLog estimates
+    # on both engines, so they only agree to within a few percent
+    "parity_tolerances": {"row_count": 0.0, "sum": 1e-6, "min": 1e-9, "max": 1e-9, "distinct": 0.05},
+    # Performance ledger (SQLite) of every validation and benchmark execution; None disables it.
+    # A card regressed when its latest run is threshold (0.5 = 50%) and min_regression_ms slower
+    # than the median of its last baseline_runs executions, given at least min_baseline_runs
+    "performance_ledger_path": "migrations/performance_ledger.sqlite",
+    "ledger_regression_threshold": 0.5,
+    "ledger_baseline_runs": 20,
+    "ledger_min_baseline_runs": 3,
+    "ledger_min_regression_ms": 100.0,
+}
+
+# HTTP transport used for every Metabase API call
+HTTP_SETTINGS = {
+    "pool_size": 16,               # keep-alive connections kept per host
+    "timeout": (10, 300),          # (connect, read) seconds; /api/dataset can run long queries
+    "max_retries": 4,              # retries on connection errors, 429 and 5xx
+    "backoff_factor": 0.5,         # sleep backoff_factor * 2**attempt seconds between retries
+    "max_backoff": 30.0,           # longest sleep between retries, including a server's Retry-After
+    "requests_per_second": 5.0,    # token-bucket rate limit shared by all threads; None disables
+    "burst": 10,                   # requests allowed at once after an idle period
+    # AIMD limit on requests in flight, adapted to the observed p95 latency (seconds) and cut
+    # on 429/5xx; "api" covers card and dashboard calls, "dataset" the /api/dataset queries.
+    # Optional keys: minimum, window (responses per decision), decrease. None disables.
+    "adaptive_concurrency": {
+        "api": {"initial": 4, "maximum": 32, "target_p95": 1.0},
+        "dataset": {"initial": 2, "maximum": 16, "target_p95": 30.0},
+    },
 }
 
 # Exasol-specific patterns to handle
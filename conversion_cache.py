@@ -0,0 +1,170 @@
+"""
+Persistent, content-addressed cache for SQL conversions
+Entries are keyed by a hash of the source SQL plus a fingerprint of the mapping
+files and the conversion rules, so any mapping or rule change invalidates them.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import MIGRATION_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Files whose content is part of every fingerprint, resolved against the repository so
+# the fingerprint does not depend on the directory a script is started from
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+MAPPING_FILES = [
+    os.path.join(_REPO_DIR, 'migrations', 'migration_mapping.json'),
+    os.path.join(_REPO_DIR, 'column_mapping_config.json'),
+]
+
+# Path -> (mtime, size, digest) of every file fingerprinted so far
+_file_fingerprints: Dict[str, Tuple[float, int, str]] = {}
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize line endings so the same query saved on different platforms shares an entry.
+    Callers convert the normalized SQL, so a cached output is what a fresh conversion returns.
+    """
+    return sql.replace('\r\n', '\n')
+
+def file_fingerprint(path: str) -> str:
+    """Content hash of a file (empty if missing); re-read only when mtime or size change"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ''
+    memo = _file_fingerprints.get(path)
+    if memo and memo[0] == stat.st_mtime and memo[1] == stat.st_size:
+        return memo[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _file_fingerprints[path] = (stat.st_mtime, stat.st_size, digest)
+    return digest
+
+def module_fingerprint(module) -> str:
+    """Hash of a module's source, so editing a rewrite rule invalidates its entries"""
+    return file_fingerprint(module.__file__)
+
+def fingerprint(*parts: str) -> str:
+    """Fingerprint of the mapping files plus any rule set versions passed in"""
+    digest = hashlib.sha256()
+    for part in [file_fingerprint(path) for path in MAPPING_FILES] + list(parts):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+class ConversionCache:
+    """SQLite-backed conversion cache with hit/miss counters"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Fingerprint each namespace was last purged for, so a run purges once per namespace
+        self._purged: Dict[str, str] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversions ("
+            " key TEXT PRIMARY KEY,"
+            " namespace TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " output TEXT NOT NULL,"
+            " messages TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(namespace: str, rules_fingerprint: str, sql: str, context: str = '') -> str:
+        digest = hashlib.sha256()
+        for part in (namespace, rules_fingerprint, context, sql):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, namespace: str, rules_fingerprint: str, sql: str,
+            context: str = '') -> Optional[Tuple[str, List[str]]]:
+        """Return (output, messages) for a cached conversion, or None on a miss"""
+        key = self.make_key(namespace, rules_fingerprint, sql, context)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT output, messages FROM conversions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, namespace: str, rules_fingerprint: str, sql: str, output: str,
+            messages: Optional[List[str]] = None, context: str = ''):
+        """Store a conversion result"""
+        key = self.make_key(namespace, rules_fingerprint, sql, context)
+        with self._lock:
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, namespace, rules_fingerprint, output, json.dumps(messages or []), time.time())
+                )
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not write conversion cache entry: {str(e)}")
+
+    def purge_stale(self, namespace: str, rules_fingerprint: str) -> int:
+        """
+        Delete entries of a namespace produced under any other fingerprint; they can never be
+        read again. Runs once per namespace and fingerprint for the life of this cache.
+        """
+        with self._lock:
+            if self._purged.get(namespace) == rules_fingerprint:
+                return 0
+            try:
+                cursor = self._connection.execute(
+                    "DELETE FROM conversions WHERE namespace = ? AND fingerprint != ?",
+                    (namespace, rules_fingerprint)
+                )
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not purge stale conversion cache entries: {str(e)}")
+                return 0
+            self._purged[namespace] = rules_fingerprint
+        if cursor.rowcount:
+            logger.info(f"Purged {cursor.rowcount} stale {namespace} conversions")
+        return cursor.rowcount
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = (self.hits / lookups * 100) if lookups else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)"
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+_caches: Dict[str, ConversionCache] = {}
+
+def get_conversion_cache(path: Optional[str] = None) -> Optional[ConversionCache]:
+    """
+    Shared cache for this process; path defaults to MIGRATION_SETTINGS["conversion_cache_path"].
+    Returns None when caching is disabled.
+    """
+    if path is None:
+        path = MIGRATION_SETTINGS.get("conversion_cache_path")
+    if not path:
+        return None
+    if path not in _caches:
+        _caches[path] = ConversionCache(path)
+    return _caches[path]
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Dashboard load simulation
+Opens a dashboard the way a browser does, firing the queries of every dashcard on the
+first tab at once with the dashboard's default filter values, for USERS simulated users
+LOADS_PER_USER times each. Reports time-to-last-card (how long until the dashboard is
+fully drawn), the per-card latency distribution and error rates under that contention.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmark_queries import percentile, format_ms
+from config import METABASE_CONFIG, HTTP_SETTINGS
+from metabase_migrator import MetabaseMigrator, MetabaseConfig, QueryRun
+from migrate_dashboard import log_timing
+from performance_ledger import PerformanceLedger, get_performance_ledger
+
+DASHBOARD_ID = 421
+# Simulated users opening the dashboard at the same time, and how often each opens it
+USERS = 4
+LOADS_PER_USER = 3
+# Seconds a user waits between two loads
+THINK_TIME = 1.0
+# "dashcard" runs cards through /api/dashboard/{id}/dashcard/{dc}/card/{c}/query like the
+# frontend does, "dataset" sends each card's query to /api/dataset
+ENDPOINT = "dashcard"
+# A browser only loads the cards of the tab it shows; True fires every tab's cards
+ALL_TABS = False
+REPORT_FILE = 'migrations/load_test_report.json'
+
+def default_parameters(dashboard: Dict, dashcard: Dict, card_id: int) -> List[Dict]:
+    """Dashboard filters with a default value, targeted at one card of a dashcard"""
+    parameters = {parameter['id']: parameter for parameter in dashboard.get('parameters') or []}
+    values = []
+    for mapping in dashcard.get('parameter_mappings') or []:
+        parameter = parameters.get(mapping.get('parameter_id'))
+        if mapping.get('card_id') != card_id or parameter is None or parameter.get('default') is None:
+            continue
+        values.append({
+            "id": parameter['id'],
+            "type": parameter.get('type'),
+            "value": parameter['default'],
+            "target": mapping.get('target')
+        })
+    return values
+
+def dashcard_queries(dashboard: Dict, endpoint: str = ENDPOINT, all_tabs: bool = ALL_TABS) -> List[Dict]:
+    """One request per card a dashboard open runs: each dashcard's card and its series cards"""
+    dashcards = dashboard.get('dashcards') or dashboard.get('ordered_cards') or []
+    tabs = sorted(dashboard.get('tabs') or [], key=lambda tab: tab.get('position', 0))
+    if tabs and not all_tabs:
+        dashcards = [dashcard for dashcard in dashcards if dashcard.get('dashboard_tab_id') == tabs[0]['id']]
+    queries = []
+    for dashcard in dashcards:
+        # Text and heading dashcards have no card
+        if dashcard.get('card_id') is None:
+            continue
+        for card in [dashcard.get('card') or {'id': dashcard['card_id']}] + list(dashcard.get('series') or []):
+            parameters = default_parameters(dashboard, dashcard, card['id'])
+            if endpoint == "dataset":
+                path, body = "/api/dataset", {**card.get('dataset_query', {}), "parameters": parameters}
+            else:
+                path = f"/api/dashboard/{dashboard['id']}/dashcard/{dashcard['id']}/card/{card['id']}/query"
+                body = {"parameters": parameters}
+            queries.append({
+                "card_id": card['id'],
+                "dashcard_id": dashcard['id'],
+                "name": card.get('name', 'Unknown'),
+                "dataset_query": card.get('dataset_query'),
+                "path": path,
+                "body": body,
+            })
+    return queries
+
+class LoadRunner:
+    """
+    Fires dashboard loads without the migrator's rate limiter, adaptive concurrency or
+    retries: a browser sends every card query at once and shows errors as they come.
+    """
+
+    def __init__(self, base_url: str, session_token: str, queries: List[Dict]):
+        self.base_url = base_url.rstrip('/')
+        self.session_token = session_token
+        self.queries = queries
+        self.timeout = HTTP_SETTINGS.get("timeout", (10, 300))
+        self._thread_local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._thread_local.session = session
+        return session
+
+    def run_card(self, query: Dict) -> QueryRun:
+        started_at, started = time.time(), time.monotonic()
+        try:
+            response = self._session().post(
+                self.base_url + query['path'],
+                headers={"X-Metabase-Session": self.session_token, "Content-Type": "application/json"},
+                json=query['body'],
+                timeout=self.timeout
+            )
+        except requests.exceptions.RequestException as e:
+            return QueryRun(None, time.monotonic() - started, None, None, str(e), started_at,
+                            *QueryRun.identify(query['dataset_query']))
+        return QueryRun.from_response(response, started_at, time.monotonic() - started, query['dataset_query'])
+
+    def open_dashboard(self, executor: ThreadPoolExecutor, user: int, load: int) -> Dict:
+        """One dashboard open: every card query at once, done when the last card arrives"""
+        started = time.monotonic()
+        futures = [(query, executor.submit(self.run_card, query)) for query in self.queries]
+        runs = [(query['card_id'], future.result()) for query, future in futures]
+        return {"user": user, "load": load, "time_to_last_card": time.monotonic() - started, "runs": runs}
+
+    def run(self, users: int = USERS, loads_per_user: int = LOADS_PER_USER, think_time: float = THINK_TIME) -> List[Dict]:
+        """Every user opens the dashboard loads_per_user times; users start together"""
+        loads = []
+        loads_lock = threading.Lock()
+
+        def user_session(executor, user):
+            for load in range(loads_per_user):
+                if load:
+                    time.sleep(think_time)
+                result = self.open_dashboard(executor, user, load)
+                with loads_lock:
+                    loads.append(result)
+
+        # Enough threads for every user's cards to be in flight at the same time
+        with ThreadPoolExecutor(max_workers=max(1, users * len(self.queries))) as executor:
+            threads = [threading.Thread(target=user_session, args=(executor, user)) for user in range(users)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return loads
+
+def summarize_load(loads: List[Dict], queries: List[Dict]) -> Dict:
+    """Time-to-last-card percentiles, error rate and the latency distribution of every card (ms)"""
+    times = [load["time_to_last_card"] * 1000 for load in loads]
+    runs = [(card_id, run) for load in loads for card_id, run in load["runs"]]
+    errors = sum(1 for _, run in runs if not run.ok)
+    cards = {}
+    # A card shown in several dashcards is one entry with all its requests
+    names = {}
+    for query in queries:
+        names.setdefault(query['card_id'], query['name'])
+    for card, name in names.items():
+        card_runs = [run for card_id, run in runs if card_id == card]
+        latencies = [run.client_time * 1000 for run in card_runs if run.ok]
+        failed = [run for run in card_runs if not run.ok]
+        cards[card] = {
+            "name": name,
+            "requests": len(card_runs),
+            "errors": len(failed),
+            "error_rate": len(failed) / len(card_runs) if card_runs else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies) if latencies else None,
+            "error": failed[0].error if failed else None,
+        }
+    return {
+        "loads": len(loads),
+        "time_to_last_card_p50": percentile(times, 50),
+        "time_to_last_card_p95": percentile(times, 95),
+        "time_to_last_card_max": max(times) if times else None,
+        "requests": len(runs),
+        "errors": errors,
+        "error_rate": errors / len(runs) if runs else 0.0,
+        "cards": cards,
+    }
+
+def print_load_report(dashboard_id: int, users: int, summary: Dict):
+    print(f"\n📊 Dashboard {dashboard_id}: {summary['loads']} loads by {users} concurrent users")
+    print(f"  ⏱️  Time to last card: p50 {format_ms(summary['time_to_last_card_p50'])}, "
+          f"p95 {format_ms(summary['time_to_last_card_p95'])}, max {format_ms(summary['time_to_last_card_max'])}")
+    print(f"  {'❌' if summary['errors'] else '✅'} {summary['errors']}/{summary['requests']} card requests failed "
+          f"({summary['error_rate']:.1%})")
+    print(f"\n  Card latency, slowest first:")
+    by_p95 = sorted(summary["cards"].items(), key=lambda item: item[1]["p95"] or 0, reverse=True)
+    for card_id, card in by_p95:
+        errors = f", {card['errors']} errors ({card['error']})" if card["errors"] else ""
+        print(f"    {card_id} ({card['name']}): p50 {format_ms(card['p50'])}, p95 {format_ms(card['p95'])}, "
+              f"max {format_ms(card['max'])}{errors}")
+
+def write_report(dashboard_id: int, users: int, summary: Dict, path: str = REPORT_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"dashboard_id": dashboard_id, "users": users, "endpoint": ENDPOINT, **summary}, f, indent=2)
+
+def record_loads(ledger: Optional[PerformanceLedger], dashboard_id: int, loads: List[Dict]):
+    """Keep the card latencies under load in the performance ledger"""
+    if ledger is not None:
+        ledger.record_many((run for load in loads for run in load["runs"]), "load_test", dashboard_id)
+
+def main():
+    """Main function"""
+    start = time.time()
+
+    print(f"🚦 Load test of dashboard {DASHBOARD_ID}: {USERS} users x {LOADS_PER_USER} loads ({ENDPOINT} endpoint)")
+    print("=" * 60)
+
+    migrator = MetabaseMigrator(MetabaseConfig(
+        base_url=METABASE_CONFIG["base_url"],
+        username=METABASE_CONFIG["username"],
+        password=METABASE_CONFIG["password"]
+    ))
+    if not migrator.authenticate():
+        print("❌ Authentication failed")
+        return
+
+    dashboard = migrator.get_dashboard_details(DASHBOARD_ID)
+    if dashboard is None:
+        print(f"❌ Could not fetch dashboard {DASHBOARD_ID}")
+        return
+    queries = dashcard_queries(dashboard)
+    print(f"📋 {len(queries)} card queries per dashboard load")
+    if not queries:
+        return
+
+    runner = LoadRunner(migrator.config.base_url, migrator.session_token, queries)
+    loads = runner.run(USERS, LOADS_PER_USER, THINK_TIME)
+    record_loads(get_performance_ledger(), DASHBOARD_ID, loads)
+    summary = summarize_load(loads, queries)
+    print_load_report(DASHBOARD_ID, USERS, summary)
+
+    write_report(DASHBOARD_ID, USERS, summary)
+    print(f"\n💾 Report saved to {REPORT_FILE}")
+    log_timing(start, "Load test")
+
+if __name__ == "__main__":
+    main()
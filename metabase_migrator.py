@@ -5,15 +5,21 @@ Migrates dashboards from Exasol to StarRocks while preserving filters and variab
 """
 
 import requests
+import urllib3
 import json
 import re
 import logging
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
+from datetime import datetime
 from urllib.parse import urljoin
 
-from config import METABASE_CONFIG, DATABASE_MAPPINGS, MIGRATION_SETTINGS
+from config import METABASE_CONFIG, DATABASE_MAPPINGS, MIGRATION_SETTINGS, HTTP_SETTINGS
 from sql_converter import SQLConverter
+from conversion_cache import get_conversion_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,13 +32,292 @@ class MetabaseConfig:
     username: str
     password: str
 
+@dataclass
+class QueryRun:
+    """Timing and outcome of one POST /api/dataset execution"""
+    status_code: Optional[int]
+    client_time: float               # seconds from sending the request to the response, seen by this client
+    running_time: Optional[float]    # milliseconds, as reported by Metabase
+    row_count: Optional[int]
+    error: Optional[str] = None
+    started_at: float = 0.0          # epoch seconds
+    database_id: Optional[int] = None
+    sql: Optional[str] = None        # native SQL of the query, None for MBQL
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @classmethod
+    def from_response(cls, response: requests.Response, started_at: float, client_time: float,
+                      dataset_query: Optional[Dict] = None) -> 'QueryRun':
+        try:
+            result = response.json()
+        except ValueError:
+            result = None
+        data = (result.get('data') or {}) if isinstance(result, dict) else {}
+        if response.status_code not in [200, 202]:
+            error = f"HTTP {response.status_code}: {response.text[:300]}"
+        elif not isinstance(result, dict):
+            error = "response is not JSON"
+        else:
+            error = result.get('error') or data.get('error')
+            if error is None and result.get('status') == 'failed':
+                error = "query failed"
+        row_count = (result or {}).get('row_count') if isinstance(result, dict) else None
+        if row_count is None and 'rows' in data:
+            row_count = len(data['rows'])
+        running_time = result.get('running_time') if isinstance(result, dict) else None
+        return cls(response.status_code, client_time, running_time, row_count,
+                   str(error) if error is not None else None, started_at, *cls.identify(dataset_query))
+
+    @staticmethod
+    def identify(dataset_query: Optional[Dict]) -> Tuple[Optional[int], Optional[str]]:
+        """(database, native SQL) of the query a run executed"""
+        dataset_query = dataset_query or {}
+        return dataset_query.get('database'), (dataset_query.get('native') or {}).get('query')
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Methods whose request must not be repeated once it may have reached the server
+NON_IDEMPOTENT_METHODS = frozenset(['POST', 'PUT', 'PATCH'])
+
+def connect_failed(error: requests.exceptions.RequestException) -> bool:
+    """True if the request never reached the server: the connection could not be opened"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.Timeout) or not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `burst`"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """Take a token now and return how many seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on requests in flight, shared by every session of a migrator.
+    After every `window` responses the limit grows by one if their p95 latency stayed
+    under `target_p95` and the limit was reached; it is multiplied by `decrease` when the
+    p95 is above target, or at once on a 429, a 5xx or a connection error. Responses to
+    requests sent before the last decrease do not cut the limit again.
+    """
+
+    def __init__(self, name: str, initial: int, maximum: int, target_p95: float,
+                 minimum: int = 1, window: int = 20, decrease: float = 0.5):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_p95 = target_p95
+        self.window = window
+        self.decrease = decrease
+        self.in_flight = 0
+        self.saturated = False
+        self.latencies: List[float] = []
+        self.last_decrease = 0.0
+        # (seconds since start, action, new limit, reason) of every change of the limit
+        self.decisions: List[Tuple[float, str, int, str]] = []
+        self.started = time.monotonic()
+        self.condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns its start time for release()"""
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+            if self.in_flight >= int(self.limit):
+                self.saturated = True
+            return time.monotonic()
+
+    def release(self, started: float, status: Optional[int]):
+        """Record the outcome of a request; status None means a connection error or timeout"""
+        with self.condition:
+            self.in_flight -= 1
+            if status is None or status == 429 or status >= 500:
+                if started >= self.last_decrease:
+                    self._cut(f"HTTP {status}" if status else "connection error")
+            else:
+                self.latencies.append(time.monotonic() - started)
+                if len(self.latencies) >= self.window:
+                    latencies = sorted(self.latencies)
+                    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                    if p95 > self.target_p95:
+                        self._cut(f"p95 {p95:.2f}s > {self.target_p95:.2f}s")
+                    elif self.saturated and self.limit < self.maximum:
+                        self.limit = min(self.maximum, self.limit + 1)
+                        self._decide("increase", f"p95 {p95:.2f}s")
+                    self.latencies = []
+                    self.saturated = False
+            self.condition.notify_all()
+
+    def _cut(self, reason: str):
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self.last_decrease = time.monotonic()
+        self.latencies = []
+        self.saturated = False
+        self._decide("decrease", reason)
+
+    def _decide(self, action: str, reason: str):
+        self.decisions.append((round(time.monotonic() - self.started, 3), action, int(self.limit), reason))
+        logger.info(f"Adaptive concurrency ({self.name}): {action} to {int(self.limit)} in flight ({reason})")
+
+    def summary(self) -> str:
+        increases = sum(1 for decision in self.decisions if decision[1] == "increase")
+        return (f"{self.name} limit {int(self.limit)} "
+                f"({increases} increases, {len(self.decisions) - increases} decreases)")
+
+class MetabaseTransport(requests.Session):
+    """
+    requests.Session with a sized keep-alive pool, default timeouts, exponential
+    backoff on connection errors, 429 and 5xx, and an optional shared rate limiter
+    """
+    
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, settings: Optional[Dict] = None,
+                 concurrency: Optional[Dict[str, AdaptiveConcurrency]] = None):
+        super().__init__()
+        settings = {**HTTP_SETTINGS, **(settings or {})}
+        self.timeout = settings["timeout"]
+        self.max_retries = settings["max_retries"]
+        self.backoff_factor = settings["backoff_factor"]
+        self.max_backoff = settings.get("max_backoff", 30.0)
+        self.rate_limiter = rate_limiter
+        # Adaptive in-flight limits by kind of traffic: "dataset" for queries, "api" for the rest
+        self.concurrency = concurrency or {}
+        self.retries = 0
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=settings["pool_size"],
+            pool_maxsize=settings["pool_size"]
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+    
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Seconds to wait before the next attempt; honours Retry-After on 429/503 up to max_backoff"""
+        delay = self.backoff_factor * (2 ** attempt)
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+        return min(delay, self.max_backoff)
+    
+    @staticmethod
+    def _retryable(method: str, url: str, error: requests.exceptions.RequestException) -> bool:
+        """
+        Connection errors are retried when the request cannot have been processed: always if it
+        never reached the server, otherwise only for idempotent methods. A read timeout on
+        /api/dataset means the query ran for the whole timeout, so it is never run again.
+        """
+        if connect_failed(error):
+            return True
+        if method.upper() in NON_IDEMPOTENT_METHODS:
+            return False
+        return not (isinstance(error, requests.exceptions.ReadTimeout) and "/api/dataset" in url)
+    
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        controller = self.concurrency.get("dataset" if "/api/dataset" in url else "api")
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = controller.acquire() if controller is not None else None
+            status = None
+            try:
+                response = super().request(method, url, **kwargs)
+                status = response.status_code
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries or not self._retryable(method, url, e):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            finally:
+                if controller is not None:
+                    controller.release(started, status)
+            attempt += 1
+            self.retries += 1
+            time.sleep(delay)
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Metabase ISO-8601 timestamp such as 2025-06-23T10:26:20.290859Z"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
 class MetabaseMigrator:
     def __init__(self, config: MetabaseConfig):
         self.config = config
-        self.session = requests.Session()
+        # One rate limiter for the main session and every fetch thread's session
+        requests_per_second = HTTP_SETTINGS.get("requests_per_second")
+        self.rate_limiter = RateLimiter(requests_per_second, HTTP_SETTINGS.get("burst", 1)) if requests_per_second else None
+        # Shared AIMD in-flight limits, so worker counts are only upper bounds
+        self.concurrency = {
+            name: AdaptiveConcurrency(name, **settings)
+            for name, settings in (HTTP_SETTINGS.get("adaptive_concurrency") or {}).items()
+        }
+        self.session = self._new_session()
         self.session_token = None
-        self.sql_converter = SQLConverter()
+        self.conversion_cache = get_conversion_cache()
+        self.sql_converter = SQLConverter(cache=self.conversion_cache)
+        # requests.Session is not thread-safe, so fetch threads each get their own
+        self._thread_local = threading.local()
+        self._owner_thread = threading.get_ident()
+        # Per-run card cache: each card is read from Metabase at most once, until it is updated
+        self._card_cache: Dict[int, Dict] = {}
+        self._card_cache_lock = threading.Lock()
+        self.avoided_card_requests = 0
+        self.reuse_put_response = MIGRATION_SETTINGS.get("reuse_put_response", True)
+        # Queries in flight per database, shared by every dashboard this migrator validates
+        self.max_queries_per_database = MIGRATION_SETTINGS.get("validation_max_per_database", 4)
+        self._database_slots: Dict[int, threading.BoundedSemaphore] = {}
+        self._database_slots_lock = threading.Lock()
+        # Latest validation query of each card, kept for its latency and row count
+        self.query_runs: Dict[int, QueryRun] = {}
         
+    def concurrency_summary(self) -> List[str]:
+        """Current adaptive limit and number of decisions for each kind of traffic"""
+        return [controller.summary() for controller in self.concurrency.values()]
+    
+    def database_slot(self, database_id: Optional[int]) -> threading.BoundedSemaphore:
+        """Semaphore to hold while running a query on database_id, capping its concurrent queries"""
+        with self._database_slots_lock:
+            slot = self._database_slots.get(database_id)
+            if slot is None:
+                slot = threading.BoundedSemaphore(max(1, self.max_queries_per_database))
+                self._database_slots[database_id] = slot
+            return slot
+    
     def authenticate(self) -> bool:
         """Authenticate with Metabase and get session token"""
         try:
@@ -62,7 +347,7 @@ class MetabaseMigrator:
     def get_dashboards(self) -> List[Dict]:
         """Get all dashboards from Metabase"""
         try:
-            response = self.session.get(
+            response = self.thread_session().get(
                 urljoin(self.config.base_url, "/api/dashboard"),
                 headers={"X-Metabase-Session": self.session_token}
             )
@@ -82,7 +367,7 @@ class MetabaseMigrator:
     def get_dashboard_details(self, dashboard_id: int) -> Optional[Dict]:
         """Get detailed information about a specific dashboard"""
         try:
-            response = self.session.get(
+            response = self.thread_session().get(
                 urljoin(self.config.base_url, f"/api/dashboard/{dashboard_id}"),
                 headers={"X-Metabase-Session": self.session_token}
             )
@@ -97,10 +382,46 @@ class MetabaseMigrator:
             logger.error(f"Error getting dashboard details: {str(e)}")
             return None
     
-    def get_question_details(self, question_id: int) -> Optional[Dict]:
+    def _new_session(self) -> MetabaseTransport:
+        return MetabaseTransport(rate_limiter=self.rate_limiter, concurrency=self.concurrency)
+    
+    def thread_session(self) -> requests.Session:
+        """Session owned by the calling thread; the creating thread uses self.session"""
+        if threading.get_ident() == self._owner_thread:
+            return self.session
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = self._new_session()
+            self._thread_local.session = session
+        return session
+    
+    def get_collection_dashboards(self, collection_id: int) -> List[Dict]:
+        """Get the dashboards stored in a collection"""
+        try:
+            response = self.thread_session().get(
+                urljoin(self.config.base_url, f"/api/collection/{collection_id}/items"),
+                params={"models": "dashboard"},
+                headers={"X-Metabase-Session": self.session_token}
+            )
+            
+            if response.status_code == 200:
+                items = response.json()
+                # Newer Metabase versions wrap the items in {"data": [...]}
+                if isinstance(items, dict):
+                    items = items.get("data", [])
+                return [item for item in items if item.get("model", "dashboard") == "dashboard"]
+            else:
+                logger.error(f"Failed to get collection {collection_id}: {response.status_code}")
+                return []
+                
+        except Exception as e:
+            logger.error(f"Error getting collection items: {str(e)}")
+            return []
+    
+    def get_question_details(self, question_id: int, session: Optional[requests.Session] = None) -> Optional[Dict]:
         """Get detailed information about a specific question"""
         try:
-            response = self.session.get(
+            response = (session or self.thread_session()).get(
                 urljoin(self.config.base_url, f"/api/card/{question_id}"),
                 headers={"X-Metabase-Session": self.session_token}
             )
@@ -115,11 +436,128 @@ class MetabaseMigrator:
             logger.error(f"Error getting question details: {str(e)}")
             return None
     
-    def migrate_native_question(self, question: Dict) -> Dict:
+    def get_card(self, question_id: int, session: Optional[requests.Session] = None) -> Optional[Dict]:
+        """
+        Card from the per-run cache, fetched from Metabase on first use.
+        The returned dict is shared with the cache and must not be modified.
+        """
+        with self._card_cache_lock:
+            card = self._card_cache.get(question_id)
+            if card is not None:
+                self.avoided_card_requests += 1
+                return card
+        card = self.get_question_details(question_id, session=session)
+        if card is not None:
+            with self._card_cache_lock:
+                self._card_cache[question_id] = card
+        return card
+    
+    def seed_cards_from_dashboard(self, dashboard: Dict, current_dashboard: Optional[Dict] = None) -> List[int]:
+        """
+        Put the cards embedded in a dashboard payload into the card cache.
+        current_dashboard is a fresher payload of the same dashboard: cards whose updated_at
+        is newer there are left out of the cache and returned, so they are refetched on use.
+        """
+        current_updated_at = {}
+        if current_dashboard:
+            for dashcard in current_dashboard.get('dashcards', []):
+                card = dashcard.get('card') or {}
+                if card.get('id'):
+                    current_updated_at[card['id']] = parse_timestamp(card.get('updated_at'))
+        
+        stale = []
+        with self._card_cache_lock:
+            for dashcard in dashboard.get('dashcards', []):
+                card = dashcard.get('card') or {}
+                question_id = card.get('id')
+                if not question_id or not card.get('dataset_query') or question_id in self._card_cache:
+                    continue
+                snapshot_updated_at = parse_timestamp(card.get('updated_at'))
+                if current_dashboard is not None:
+                    updated_at = current_updated_at.get(question_id)
+                    if updated_at is None or snapshot_updated_at is None or updated_at > snapshot_updated_at:
+                        if question_id not in stale:
+                            stale.append(question_id)
+                        continue
+                self._card_cache[question_id] = card
+        return stale
+    
+    def invalidate_card(self, question_id: int):
+        """Drop a card from the per-run cache so the next read goes to Metabase"""
+        with self._card_cache_lock:
+            self._card_cache.pop(question_id, None)
+    
+    def update_card(self, question_id: int, update_data: Dict) -> requests.Response:
+        """
+        PUT /api/card/{id}; the cached copy is invalidated, and replaced by the
+        response body when reuse_put_response is enabled
+        """
+        self.invalidate_card(question_id)
+        response = self.thread_session().put(
+            urljoin(self.config.base_url, f"/api/card/{question_id}"),
+            headers={
+                "X-Metabase-Session": self.session_token,
+                "Content-Type": "application/json"
+            },
+            json=update_data
+        )
+        if response.status_code == 200 and self.reuse_put_response:
+            try:
+                card = response.json()
+            except ValueError:
+                card = None
+            if isinstance(card, dict) and card.get('id') == question_id:
+                with self._card_cache_lock:
+                    self._card_cache[question_id] = card
+        return response
+    
+    def run_query(self, dataset_query: Dict) -> QueryRun:
+        """Execute a query through POST /api/dataset, timing it; connection errors are returned as failed runs"""
+        started_at, started = time.time(), time.monotonic()
+        try:
+            response = self.thread_session().post(
+                urljoin(self.config.base_url, "/api/dataset"),
+                headers={
+                    "X-Metabase-Session": self.session_token,
+                    "Content-Type": "application/json"
+                },
+                json=dataset_query
+            )
+        except requests.exceptions.RequestException as e:
+            return QueryRun(None, time.monotonic() - started, None, None, str(e), started_at,
+                            *QueryRun.identify(dataset_query))
+        return QueryRun.from_response(response, started_at, time.monotonic() - started, dataset_query)
+    
+    def iter_question_details(self, question_ids: Iterable[int],
+                              max_in_flight: Optional[int] = None) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """
+        Fetch questions concurrently, at most max_in_flight requests at a time,
+        yielding (question_id, details) as each response arrives; details is None on failure
+        """
+        question_ids = list(dict.fromkeys(question_ids))
+        if not question_ids:
+            return
+        max_in_flight = max_in_flight or MIGRATION_SETTINGS.get("max_in_flight_requests", 8)
+        
+        def fetch(question_id):
+            return self.get_card(question_id, session=self.thread_session())
+        
+        with ThreadPoolExecutor(max_workers=min(max_in_flight, len(question_ids))) as executor:
+            futures = {executor.submit(fetch, question_id): question_id for question_id in question_ids}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    
+    def prefetch_question_details(self, question_ids: Iterable[int],
+                                  max_in_flight: Optional[int] = None) -> Dict[int, Optional[Dict]]:
+        """Fetch all questions concurrently and return them keyed by id"""
+        return dict(self.iter_question_details(question_ids, max_in_flight))
+    
+    def migrate_native_question(self, question: Dict, question_details: Optional[Dict] = None) -> Dict:
         """Migrate a native SQL question from Exasol to StarRocks"""
         try:
             question_id = question.get('id')
-            question_details = self.get_question_details(question_id)
+            if question_details is None:
+                question_details = self.get_card(question_id)
             
             if not question_details:
                 return {"error": f"Could not get details for question {question_id}"}
@@ -152,11 +590,12 @@ class MetabaseMigrator:
             logger.error(f"Error migrating native question {question.get('id')}: {str(e)}")
             return {"error": str(e)}
     
-    def migrate_mbql_question(self, question: Dict) -> Dict:
+    def migrate_mbql_question(self, question: Dict, question_details: Optional[Dict] = None) -> Dict:
         """Migrate an MBQL question from Exasol to StarRocks"""
         try:
             question_id = question.get('id')
-            question_details = self.get_question_details(question_id)
+            if question_details is None:
+                question_details = self.get_card(question_id)
             
             if not question_details:
                 return {"error": f"Could not get details for question {question_id}"}
@@ -198,15 +637,26 @@ class MetabaseMigrator:
             if card_details:
                 questions.append(card_details)
         
+        # The dashboard payload already embeds every card; only missing ones are fetched below
+        if MIGRATION_SETTINGS.get("use_embedded_cards", True):
+            self.seed_cards_from_dashboard(dashboard_details)
+        
+        # Fetch every question of the dashboard at once instead of one round trip after another
+        question_details = self.prefetch_question_details(
+            question.get('id') for question in questions
+            if question.get('dataset_query', {}).get('type') in ('native', 'query')
+        )
+        
         # Migrate each question
         migrated_questions = []
         for question in questions:
             question_type = question.get('dataset_query', {}).get('type', 'unknown')
+            details = question_details.get(question.get('id'))
             
             if question_type == 'native':
-                migrated_question = self.migrate_native_question(question)
+                migrated_question = self.migrate_native_question(question, details)
             elif question_type == 'query':
-                migrated_question = self.migrate_mbql_question(question)
+                migrated_question = self.migrate_mbql_question(question, details)
             else:
                 migrated_question = {
                     "question_id": question.get('id'),
@@ -343,6 +793,10 @@ def main():
         if len(summary["errors"]) > 5:
             print(f"   ... and {len(summary['errors']) - 5} more")
     
+    if migrator.conversion_cache is not None:
+        print(f"\n♻️  Conversion cache: {migrator.conversion_cache.summary()}")
+    print(f"♻️  Card requests avoided by the card cache: {migrator.avoided_card_requests}")
+    
     print(f"\n📄 Detailed results saved to migration_results.json")
     print("🎉 Migration completed!")
 
@@ -3,13 +3,21 @@
 Script to migrate all questions in a dashboard from Exasol to StarRocks
 """
 
+import contextlib
+import io
 import json
 import requests
-import re
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from metabase_migrator import MetabaseMigrator, MetabaseConfig
-from config import METABASE_CONFIG
+from metabase_migrator import MetabaseMigrator, MetabaseConfig, QueryRun, parse_timestamp
+from config import METABASE_CONFIG, MIGRATION_SETTINGS
+import sql_rewriter
+from sql_rewriter import rewrite_sql_for_starrocks, get_table_matcher, referenced_tables, TableMatcher
+from conversion_cache import get_conversion_cache, fingerprint, module_fingerprint, normalize_sql
+from migration_pipeline import Pipeline, Stage
+from migration_journal import get_migration_journal, sql_hash
+from performance_ledger import get_performance_ledger
 
 # Configuration for specific dashboards
 DASHBOARD_CONFIG = {
@@ -245,7 +253,7 @@ def fetch_dashboard_inspection(dashboard_id, migrator):
     print(f"🔍 Fetching dashboard inspection data for Dashboard {dashboard_id}")
     
     # Fetch dashboard details
-    response = migrator.session.get(
+    response = migrator.thread_session().get(
         f"{migrator.config.base_url}/api/dashboard/{dashboard_id}",
         headers={"X-Metabase-Session": migrator.session_token}
     )
@@ -476,13 +484,9 @@ def get_current_visualization_columns(question_id, migrator):
     columns = set()
     
     # Fetch the current question to get its visualization settings
-    response = migrator.session.get(
-        f"{migrator.config.base_url}/api/card/{question_id}",
-        headers={"X-Metabase-Session": migrator.session_token}
-    )
+    question = migrator.get_card(question_id)
     
-    if response.status_code == 200:
-        question = response.json()
+    if question is not None:
         viz_settings = question.get('visualization_settings', {})
         print(f"    📊 Current visualization settings: {viz_settings}")
         
@@ -516,217 +520,41 @@ def log_timing(start_time, step_name):
     print(f"⏱️  [{timestamp}] {step_name}: {elapsed:.2f}s")
     return time.time()
 
+def conversion_fingerprint(migration_mapping):
+    """Fingerprint of the mappings and rewrite rules; a journaled update is only reused while it matches"""
+    return fingerprint(get_table_matcher(migration_mapping['table_mapping']).version, module_fingerprint(sql_rewriter))
+
 def clean_sql_for_starrocks(sql, visualization_columns, table_mapping):
     """Clean SQL for StarRocks compatibility"""
     start_time = time.time()
     print(f"  🔧 Applying StarRocks compatibility fixes...")
     
-    # First pass: Replace schema.table patterns (longer patterns first)
-    for exasol_table, starrocks_table in table_mapping.items():
-        if '.' in exasol_table:
-            exasol_schema, exasol_name = exasol_table.split('.', 1)
-            
-            # Replace full schema.table format (e.g., mart.transactions)
-            if exasol_table in sql:
-                sql = sql.replace(exasol_table, starrocks_table)
-                print(f"    🔄 Replaced '{exasol_table}' -> '{starrocks_table}'")
-            
-            # Replace uppercase schema.table format (e.g., MART.TRANSACTIONS)
-            uppercase_pattern = f"{exasol_schema.upper()}.{exasol_name.upper()}"
-            if uppercase_pattern in sql:
-                sql = sql.replace(uppercase_pattern, starrocks_table)
-                print(f"    🔄 Replaced '{uppercase_pattern}' -> '{starrocks_table}'")
-            
-            # Replace mixed case schema.table format (e.g., MART.transactions)
-            mixed_pattern1 = f"{exasol_schema.upper()}.{exasol_name.lower()}"
-            if mixed_pattern1 in sql:
-                sql = sql.replace(mixed_pattern1, starrocks_table)
-                print(f"    🔄 Replaced '{mixed_pattern1}' -> '{starrocks_table}'")
-            
-            mixed_pattern2 = f"{exasol_schema.lower()}.{exasol_name.upper()}"
-            if mixed_pattern2 in sql:
-                sql = sql.replace(mixed_pattern2, starrocks_table)
-                print(f"    🔄 Replaced '{mixed_pattern2}' -> '{starrocks_table}'")
-    
-    # Second pass: Contextual replacement - find which StarRocks tables are actually used
-    # and only replace standalone references to those specific table names
-    used_starrocks_tables = set()
-    
-    # Find all StarRocks table names that are actually used in the SQL
-    for starrocks_table in table_mapping.values():
-        if starrocks_table in sql:
-            used_starrocks_tables.add(starrocks_table)
-            print(f"    📋 Found StarRocks table in use: '{starrocks_table}'")
-    
-    # For each used StarRocks table, find the corresponding Exasol table name
-    # and replace standalone references to that table name
-    for exasol_table, starrocks_table in table_mapping.items():
-        if starrocks_table in used_starrocks_tables:
-            if '.' in exasol_table:
-                _, exasol_name = exasol_table.split('.', 1)
-            else:
-                exasol_name = exasol_table
-            
-            # Replace standalone references to this table name
-            if re.search(rf'\b{re.escape(exasol_name.upper())}\b', sql):
-                sql = re.sub(rf'\b{re.escape(exasol_name.upper())}\b', starrocks_table, sql)
-                print(f"    🔄 Contextual replacement: '{exasol_name.upper()}' -> '{starrocks_table}'")
-            
-            if re.search(rf'\b{re.escape(exasol_name.lower())}\b', sql):
-                sql = re.sub(rf'\b{re.escape(exasol_name.lower())}\b', starrocks_table, sql)
-                print(f"    🔄 Contextual replacement: '{exasol_name.lower()}' -> '{starrocks_table}'")
-    
-    # Fix StarRocks window function syntax
-    sql = re.sub(r'PARTITION BY 1', '', sql, flags=re.IGNORECASE)
-    sql = re.sub(r'OVER \(\)', 'OVER ()', sql, flags=re.IGNORECASE)
-    
-    # Replace Exasol-specific functions with StarRocks equivalents
-    # NULLIFZERO(value) -> NULLIF(value, 0)
-    sql = re.sub(r'NULLIFZERO\s*\(\s*([^)]+)\s*\)', r'NULLIF(\1, 0)', sql, flags=re.IGNORECASE)
-    
-    # zeroifnull -> ifnull(, 0)
-    sql = re.sub(r'zeroifnull\s*\(\s*([^)]+)\s*\)', r'ifnull(\1, 0)', sql, flags=re.IGNORECASE)
-    
-    # Fix nullif(bigint(20)) compatibility issue
-    # Replace nullif(bigint(20)) with ifnull(bigint(20), 0)
-    sql = re.sub(r'nullif\s*\(\s*bigint\s*\(\s*20\s*\)\s*\)', r'ifnull(bigint(20), 0)', sql, flags=re.IGNORECASE)
-    
-    # Fix NULLIF compatibility - cast value to float
-    # NULLIF(value, 0) -> NULLIF(cast(value as float), 0)
-    # But avoid double-casting if already cast
-    sql = re.sub(
-        r'NULLIF\s*\(\s*(?!cast\()([^,]+)\s*,\s*0\s*\)',
-        r'NULLIF(cast(\1 as float), 0)',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # convert -> cast
-    sql = re.sub(r'convert\s*\(\s*([^)]+)\s*\)', r'cast(\1)', sql, flags=re.IGNORECASE)
-    
-    # to_char -> char
-    original_sql = sql
-    sql = re.sub(r'to_char\s*\(\s*([^)]+)\s*\)', r'char(\1)', sql, flags=re.IGNORECASE)
-    if sql != original_sql:
-        print(f"    🔄 Replaced to_char() with char()")
-    
-    # to_date -> date
-    sql = re.sub(r'to_date\s*\(\s*([^)]+)\s*\)', r'date(\1)', sql, flags=re.IGNORECASE)
-    
-    # Fix json_value patterns
-    # json_value(t.FEE_PARAMETERS, '$.profit_fx_markup') -> parse_json(t.FEE_PARAMETERS)->'profit_fx_markup'
-    sql = re.sub(
-        r'json_value\s*\(\s*([^,]+)\s*,\s*[\'"]([^\'"]+)[\'"]\s*\)',
-        r'parse_json(\1)->\'\2\'',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # json_value with complex path -> CAST(JSON_QUERY(...))
-    sql = re.sub(
-        r'json_value\s*\(\s*([^,]+)\s*,\s*[\'"]([^\'"]+)[\'"]\s*\)',
-        r'CAST(JSON_QUERY(parse_json(\1), \'\2\') AS VARCHAR(128))',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Fix full outer join in CTEs - replace with left join + union
-    # This is a complex transformation that needs careful handling
-    # For now, we'll add a warning and suggest manual review
-    if re.search(r'FULL\s+OUTER\s+JOIN', sql, flags=re.IGNORECASE):
-        print(f"    ⚠️  WARNING: Found FULL OUTER JOIN - may need manual conversion")
-    
-    # Fix null handling in != comparisons
-    # In Exasol, != preserves nulls, in StarRocks it filters them out
-    # We need to explicitly handle nulls: column != value -> (column != value OR column IS NULL)
-    # This is complex and may need manual review for specific cases
-    
-    # Fix distinct in window functions
-    # count(distinct column) over (partition by ...) -> not supported in StarRocks
-    # We'll add a warning for this
-    if re.search(r'count\s*\(\s*distinct\s+[^)]+\)\s+over\s*\(', sql, flags=re.IGNORECASE):
-        print(f"    ⚠️  WARNING: Found DISTINCT in window function - not supported in StarRocks")
-    
-    # Fix sum()/sum() division patterns
-    # sum(revenue_EUR)/sum(Turnover_EUR) -> sum(revenue_EUR)/cast(sum(Turnover_EUR) as float)
-    sql = re.sub(
-        r'sum\s*\(\s*([^)]+)\s*\)\s*/\s*sum\s*\(\s*([^)]+)\s*\)',
-        r'sum(\1)/cast(sum(\2) as float)',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Add table aliases to subqueries without names
-    # select * from (select * from table) -> select * from (select * from table) as subquery
-    sql = re.sub(
-        r'from\s*\(\s*select\s+\*\s+from\s+([^)]+)\s*\)\s*(?=\s|$)',
-        r'from (select * from \1) as subquery',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Convert granularity field reference to template tag parameter
-    # date_trunc(gran.granularity, fatpay.PAYMENT_AT) -> date_trunc({{granularity}}, fatpay.PAYMENT_AT)
-    # Handle any table alias: fg.granularity, gran.granularity, etc.
-    sql = re.sub(
-        r'date_trunc\s*\(\s*[a-zA-Z_]+\.granularity\s*,\s*([^)]+)\s*\)',
-        r'date_trunc({{granularity}}, \1)',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Change "grouping" to "grouped" everywhere except in template variables
-    # This handles cases like "as grouping" -> "as grouped"
-    sql = re.sub(
-        r'\bgrouping\b(?!\})',  # Negative lookahead to avoid matching {{grouping}}
-        r'grouped',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Convert listagg to group_concat for StarRocks compatibility
-    # listagg(column, ',') -> group_concat(column, ',')
-    sql = re.sub(
-        r'listagg\s*\(\s*([^)]+)\s*\)',
-        r'group_concat(\1)',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Fix median function - StarRocks doesn't have PERCENTILE_CONT, use a different approach
-    # Replace PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY column) with a window function approach
-    sql = re.sub(
-        r'PERCENTILE_CONT\(0\.5\)\s+WITHIN\s+GROUP\s*\(\s*ORDER\s+BY\s+([^)]+)\s*\)',
-        r'PERCENTILE_CONT(\1, 0.5)',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Also handle direct median() function calls - use correct StarRocks syntax
-    sql = re.sub(
-        r'median\s*\(\s*([^)]+)\s*\)',
-        r'PERCENTILE_CONT(\1, 0.5)',
-        sql,
-        flags=re.IGNORECASE
-    )
-    
-    # Fix column aliases based on visualization settings
-    for col in visualization_columns:
-        if col:
-            # Handle subquery aliases (as column_name)
-            pattern = rf'as\s+{re.escape(col.lower())}\b'
-            replacement = f'as {col}'
-            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
-            
-            # Handle main query references (tr.column_name)
-            pattern = rf'tr\.{re.escape(col.lower())}\b'
-            replacement = f'tr.{col}'
-            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
-            
-            # Handle other table references (table.column_name)
-            pattern = rf'\b{re.escape(col.lower())}\b'
-            replacement = col
-            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
+    if not isinstance(table_mapping, TableMatcher):
+        table_mapping = get_table_matcher(table_mapping)
+    
+    # Same SQL, columns, mapping and rewrite rules always give the same result,
+    # so a cached conversion from an earlier question or run is reused as is
+    sql = normalize_sql(sql)
+    cache = get_conversion_cache()
+    cached = None
+    if cache is not None:
+        rules_fingerprint = fingerprint(table_mapping.version, module_fingerprint(sql_rewriter))
+        cache.purge_stale("starrocks_rewriter", rules_fingerprint)
+        context = json.dumps(sorted(visualization_columns))
+        cached = cache.get("starrocks_rewriter", rules_fingerprint, sql, context)
+    
+    if cached is not None:
+        sql, messages = cached
+        print(f"    ♻️  Reused cached conversion")
+    else:
+        # Tables, Exasol functions, window syntax, aliases and column casing are all
+        # rewritten in a single pass over the tokenized SQL (see sql_rewriter.py)
+        source_sql = sql
+        sql, messages = rewrite_sql_for_starrocks(sql, visualization_columns, table_mapping)
+        if cache is not None:
+            cache.put("starrocks_rewriter", rules_fingerprint, source_sql, sql, messages, context)
+    for message in messages:
+        print(f"    {message}")
     
     print(f"  ✅ StarRocks compatibility fixes applied")
     log_timing(start_time, "SQL cleaning")
@@ -767,6 +595,8 @@ def update_template_tags(template_tags, column_mapping):
     """Update template tags with new column IDs"""
     updated_tags = {}
     unmapped_fields = []
+    # Cards migrated before and edited since (delta sync) already use StarRocks fields
+    starrocks_field_ids = set(column_mapping.values())
     
     print(f"  🔍 Debug: Column mapping has {len(column_mapping)} entries")
     print(f"  🔍 Debug: Template tags: {list(template_tags.keys())}")
@@ -782,6 +612,8 @@ def update_template_tags(template_tags, column_mapping):
             if exasol_field_id_str in column_mapping:
                 updated_tag['field-id'] = column_mapping[exasol_field_id_str]
                 print(f"  🔄 Updated template tag '{tag_name}': field-id {exasol_field_id} -> {column_mapping[exasol_field_id_str]}")
+            elif exasol_field_id in starrocks_field_ids:
+                print(f"  ✅ Template tag '{tag_name}' already uses StarRocks field-id {exasol_field_id}")
             else:
                 print(f"  ⚠️  No mapping found for field-id {exasol_field_id} in '{tag_name}'")
                 unmapped_fields.append(f"{tag_name} (field-id: {exasol_field_id})")
@@ -797,6 +629,8 @@ def update_template_tags(template_tags, column_mapping):
                     dimension[1] = column_mapping[exasol_field_id_str]
                     updated_tag['dimension'] = dimension
                     print(f"  🔄 Updated template tag '{tag_name}': dimension field {exasol_field_id} -> {column_mapping[exasol_field_id_str]}")
+                elif exasol_field_id in starrocks_field_ids:
+                    print(f"  ✅ Template tag '{tag_name}' already uses StarRocks dimension field {exasol_field_id}")
                 else:
                     print(f"  ⚠️  No mapping found for dimension field {exasol_field_id} in '{tag_name}'")
                     unmapped_fields.append(f"{tag_name} (dimension field: {exasol_field_id})")
@@ -810,23 +644,108 @@ def update_template_tags(template_tags, column_mapping):
     
     return updated_tags
 
+_preflight_indexes = {}
+
+def get_preflight_index(migration_mapping):
+    """Field IDs and table matcher the preflight checks against, built once per mapping"""
+    index = _preflight_indexes.get(id(migration_mapping))
+    if index is None or index["mapping"] is not migration_mapping:
+        column_mapping = migration_mapping['column_mapping']
+        index = {
+            "mapping": migration_mapping,
+            # Exasol fields with a mapping, and StarRocks fields of already migrated cards
+            "fields": {int(field_id) for field_id in column_mapping} | set(column_mapping.values()),
+            "tables": get_table_matcher(migration_mapping['table_mapping'])
+        }
+        _preflight_indexes[id(migration_mapping)] = index
+    return index
+
+def preflight_dashboard(dashboard_id, dashboard_data, migration_mapping):
+    """
+    Find everything that would stop a dashboard's native questions from migrating, without
+    any API call: unmapped template tag fields, unmapped field targets in parameter_mappings
+    and tables after FROM/JOIN that table_mapping does not cover.
+    Returns one blocker dict per problem; an empty list means the dashboard can be migrated.
+    """
+    index = get_preflight_index(migration_mapping)
+    fields, tables = index["fields"], index["tables"]
+    blockers = []
+
+    def field_mapped(field_id):
+        try:
+            return int(field_id) in fields
+        except (TypeError, ValueError):
+            return False
+
+    seen = set()
+    for dashcard in dashboard_data.get('dashcards', []):
+        card = dashcard.get('card') or {}
+        question_id = card.get('id')
+        dataset_query = card.get('dataset_query', {})
+        if not question_id or dataset_query.get('type') != 'native':
+            continue
+
+        def block(kind, detail):
+            blockers.append({"question_id": question_id, "question_name": card.get('name', 'Unknown'),
+                             "kind": kind, "detail": detail})
+
+        # parameter_mappings belong to the dashcard, so every dashcard of a card is checked
+        for parameter_mapping in dashcard.get('parameter_mappings', []):
+            target = parameter_mapping.get('target') or []
+            if len(target) >= 2 and isinstance(target[1], list) and target[1][:1] == ['field']:
+                field_id = target[1][1] if len(target[1]) > 1 else None
+                if not field_mapped(field_id):
+                    block("parameter_mapping", f"parameter {parameter_mapping.get('parameter_id')} targets field {field_id}")
+
+        if question_id in seen:
+            continue
+        seen.add(question_id)
+        native_query = dataset_query.get('native', {})
+
+        # Tags that become static lists are not remapped, exactly as in prepare_question_update
+        with contextlib.redirect_stdout(io.StringIO()):
+            template_tags = convert_granularity_to_static_list(native_query.get('template-tags', {}), dashboard_id)
+        for tag_name, tag_config in template_tags.items():
+            if 'field-id' in tag_config and not field_mapped(tag_config['field-id']):
+                block("template_tag", f"{tag_name} (field-id: {tag_config['field-id']})")
+            dimension = tag_config.get('dimension')
+            if (isinstance(dimension, list) and len(dimension) >= 2 and dimension[0] == 'field'
+                    and isinstance(dimension[1], int) and not field_mapped(dimension[1])):
+                block("template_tag", f"{tag_name} (dimension field: {dimension[1]})")
+
+        for schema, table in referenced_tables(native_query.get('query', '')):
+            if tables.lookup(schema, table) is None:
+                block("table", f"{schema}.{table}")
+
+    return blockers
+
+def print_preflight_blockers(dashboard_id, blockers):
+    print(f"  ❌ Dashboard {dashboard_id}: {len(blockers)} preflight blockers")
+    for blocker in blockers:
+        print(f"    🚫 Question {blocker['question_id']} ({blocker['question_name']}): "
+              f"unmapped {blocker['kind'].replace('_', ' ')} {blocker['detail']}")
+
 def update_question(question_id, converted_sql, visualization_columns, migrator, migration_mapping, dashboard_id, dashboard_data=None, column_config=None):
     """Update a specific question in Metabase"""
     print(f"  🔄 Updating Question {question_id}")
     
-    # Fetch current question
-    response = migrator.session.get(
-        f"{migrator.config.base_url}/api/card/{question_id}",
-        headers={"X-Metabase-Session": migrator.session_token}
-    )
+    # Fetch current question (usually already in the migrator's card cache)
+    question = migrator.get_card(question_id)
     
-    if response.status_code != 200:
-        print(f"  ❌ Failed to fetch question: {response.status_code}")
+    if question is None:
+        print(f"  ❌ Failed to fetch question {question_id}")
         return False
     
-    question = response.json()
     print(f"  ✅ Found question: {question.get('name', 'Unknown')}")
     
+    update_data = prepare_question_update(question_id, question, converted_sql, visualization_columns, migration_mapping, dashboard_id, dashboard_data, column_config)
+    if update_data is None:
+        return False
+    
+    return send_question_update(question_id, update_data, migrator)
+
+def prepare_question_update(question_id, question, converted_sql, visualization_columns, migration_mapping, dashboard_id, dashboard_data=None, column_config=None):
+    """Build the StarRocks update payload for a question; None if it cannot be migrated"""
     # Get current SQL and database
     dataset_query = question.get('dataset_query', {})
     native_query = dataset_query.get('native', {})
@@ -864,7 +783,7 @@ def update_question(question_id, converted_sql, visualization_columns, migrator,
     # Check if template tag update failed due to unmapped fields
     if updated_template_tags is None:
         print(f"  ❌ Cannot migrate question due to unmapped template tag fields")
-        return False
+        return None
     
     # Use target database
     target_database_id = migration_mapping['database_mapping']['starrocks']
@@ -901,17 +820,14 @@ def update_question(question_id, converted_sql, visualization_columns, migrator,
         "visualization_settings": final_viz_settings
     }
     
+    return update_data
+
+def send_question_update(question_id, update_data, migrator):
+    """Send the update to Metabase and verify the stored question"""
     print(f"  📤 Sending update request to Metabase...")
     print(f"  📋 Update data preview: {str(update_data)[:200]}...")
     
-    response = migrator.session.put(
-        f"{migrator.config.base_url}/api/card/{question_id}",
-        headers={
-            "X-Metabase-Session": migrator.session_token,
-            "Content-Type": "application/json"
-        },
-        json=update_data
-    )
+    response = migrator.update_card(question_id, update_data)
     
     print(f"  📥 Response status: {response.status_code}")
     print(f"  📥 Response headers: {dict(response.headers)}")
@@ -920,14 +836,10 @@ def update_question(question_id, converted_sql, visualization_columns, migrator,
         print(f"  ✅ Question {question_id} updated successfully!")
         print(f"  📄 Response content: {response.text[:500]}...")
         
-        # Verify the update by fetching the question again
-        verify_response = migrator.session.get(
-            f"{migrator.config.base_url}/api/card/{question_id}",
-            headers={"X-Metabase-Session": migrator.session_token}
-        )
+        # Verify the update against the PUT response or, if it is not reused, a fresh read
+        updated_question = migrator.get_card(question_id)
         
-        if verify_response.status_code == 200:
-            updated_question = verify_response.json()
+        if updated_question is not None:
             updated_dataset_query = updated_question.get('dataset_query', {})
             updated_database_id = updated_dataset_query.get('database')
             print(f"  ✅ Verification: Question now uses database {updated_database_id}")
@@ -942,7 +854,7 @@ def update_question(question_id, converted_sql, visualization_columns, migrator,
             updated_viz_settings = updated_question.get('visualization_settings', {})
             print(f"  ✅ Verification: Visualization settings preserved ({len(updated_viz_settings)} keys)")
         else:
-            print(f"  ⚠️  Could not verify update: {verify_response.status_code}")
+            print(f"  ⚠️  Could not verify update of question {question_id}")
         
         return True
     else:
@@ -955,16 +867,12 @@ def validate_question_response(question_id, question_name, migrator, log_file=No
     log_and_print(f"  🔍 Validating Question {question_id}: {question_name}", log_file)
     
     # First, get the question details
-    response = migrator.session.get(
-        f"{migrator.config.base_url}/api/card/{question_id}",
-        headers={"X-Metabase-Session": migrator.session_token}
-    )
+    question = migrator.get_card(question_id)
     
-    if response.status_code != 200:
-        log_and_print(f"    ❌ Failed to fetch question: {response.status_code}", log_file)
+    if question is None:
+        log_and_print(f"    ❌ Failed to fetch question {question_id}", log_file)
         return False
     
-    question = response.json()
     dataset_query = question.get('dataset_query', {})
     database_id = dataset_query.get('database')
     query_type = dataset_query.get('type')
@@ -981,7 +889,8 @@ def validate_question_response(question_id, question_name, migrator, log_file=No
     # Try to execute the query
     try:
         # Use the query endpoint to get results
-        query_response = migrator.session.post(
+        started_at, started = time.time(), time.monotonic()
+        query_response = migrator.thread_session().post(
             f"{migrator.config.base_url}/api/dataset",
             headers={
                 "X-Metabase-Session": migrator.session_token,
@@ -989,6 +898,9 @@ def validate_question_response(question_id, question_name, migrator, log_file=No
             },
             json=dataset_query
         )
+        # Keep the latency Metabase reports (running_time) along with the client-side one
+        run = QueryRun.from_response(query_response, started_at, time.monotonic() - started, dataset_query)
+        migrator.query_runs[question_id] = run
         
         if query_response.status_code in [200, 202]:  # Both 200 and 202 indicate success
             result = query_response.json()
@@ -1016,6 +928,7 @@ def validate_question_response(question_id, question_name, migrator, log_file=No
             
             log_and_print(f"    ✅ Query executed successfully!", log_file)
             log_and_print(f"    📊 Rows returned: {len(rows)}", log_file)
+            log_and_print(f"    ⏱️  Running time: {run.running_time} ms in Metabase, {run.client_time:.2f}s seen by the client", log_file)
             log_and_print(f"    📋 Columns: {len(cols)}", log_file)
             
             # Show column names
@@ -1041,6 +954,119 @@ def validate_question_response(question_id, question_name, migrator, log_file=No
         log_and_print(f"    ❌ Exception during query execution: {str(e)}", log_file)
         return False
 
+# Metabase base types that Exasol and StarRocks may report differently for the same column
+TYPE_FAMILIES = {
+    "type/Integer": "number", "type/BigInteger": "number", "type/Decimal": "number",
+    "type/Float": "number", "type/Number": "number",
+    "type/Text": "text", "type/UUID": "text",
+    "type/Date": "temporal", "type/DateTime": "temporal", "type/DateTimeWithLocalTZ": "temporal",
+    "type/DateTimeWithTZ": "temporal", "type/Instant": "temporal", "type/Time": "temporal",
+    "type/Boolean": "boolean",
+}
+
+def compare_result_columns(cols, expected_metadata):
+    """Differences between the columns a query returned and the card's result_metadata; empty if they match"""
+    returned = {col.get('name', '').lower(): col for col in cols}
+    expected = {col.get('name', '').lower(): col for col in expected_metadata}
+    problems = []
+    for name, col in expected.items():
+        if name not in returned:
+            problems.append(f"missing column {col.get('name')}")
+            continue
+        expected_type, returned_type = col.get('base_type'), returned[name].get('base_type')
+        if (expected_type and returned_type
+                and TYPE_FAMILIES.get(expected_type, expected_type) != TYPE_FAMILIES.get(returned_type, returned_type)):
+            problems.append(f"column {col.get('name')} is {returned_type}, expected {expected_type}")
+    for name, col in returned.items():
+        if name not in expected:
+            problems.append(f"unexpected column {col.get('name')}")
+    return problems
+
+def validate_question_schema(question_id, question_name, migrator, log_file=None, expected_metadata=None):
+    """
+    Validate a migrated question by running it with a tiny row limit and comparing the
+    returned columns with expected_metadata (default: the card's result_metadata).
+    Checks syntax, column names and types without transferring the result set.
+    """
+    log_and_print(f"  🔍 Validating schema of Question {question_id}: {question_name}", log_file)
+
+    question = migrator.get_card(question_id)
+    if question is None:
+        log_and_print(f"    ❌ Failed to fetch question {question_id}", log_file)
+        return False
+    if expected_metadata is None:
+        expected_metadata = question.get('result_metadata')
+
+    # Metabase applies max-results to native queries too, so no LIMIT has to be spliced into the SQL
+    row_limit = MIGRATION_SETTINGS.get("validation_row_limit", 1)
+    query = dict(question.get('dataset_query', {}))
+    query["constraints"] = {"max-results": row_limit, "max-results-bare-rows": row_limit}
+
+    try:
+        started_at, started = time.time(), time.monotonic()
+        query_response = migrator.thread_session().post(
+            f"{migrator.config.base_url}/api/dataset",
+            headers={
+                "X-Metabase-Session": migrator.session_token,
+                "Content-Type": "application/json"
+            },
+            json=query
+        )
+    except Exception as e:
+        log_and_print(f"    ❌ Exception during query execution: {str(e)}", log_file)
+        return False
+    migrator.query_runs[question_id] = QueryRun.from_response(
+        query_response, started_at, time.monotonic() - started, query
+    )
+
+    if query_response.status_code not in [200, 202]:
+        log_and_print(f"    ❌ Query execution failed: {query_response.status_code}", log_file)
+        log_and_print(f"    📄 Error: {query_response.text[:500]}", log_file)
+        return False
+
+    result = query_response.json()
+    data = result.get('data') or {}
+    error = result.get('error') or data.get('error')
+    if error or result.get('status') == 'failed':
+        log_and_print(f"    ❌ SQL Error: {error}", log_file)
+        return False
+
+    cols = data.get('cols', [])
+    log_and_print(f"    📝 Column names: {[col.get('name', 'Unknown') for col in cols]}", log_file)
+    if not expected_metadata:
+        log_and_print(f"    ⚠️  No result_metadata to compare with, only the syntax was checked", log_file)
+        return True
+
+    problems = compare_result_columns(cols, expected_metadata)
+    for problem in problems:
+        log_and_print(f"    ❌ Schema mismatch: {problem}", log_file)
+    if problems:
+        return False
+    log_and_print(f"    ✅ Query runs and returns the expected {len(cols)} columns", log_file)
+    return True
+
+def validate_question(question_id, question_name, migrator, log_file=None, expected_metadata=None):
+    """
+    Validate a migrated question the way MIGRATION_SETTINGS["validation_mode"] asks: "full" or "schema".
+    At most MIGRATION_SETTINGS["validation_max_per_database"] queries run on a database at once.
+    """
+    question = migrator.get_card(question_id)
+    database_id = (question or {}).get('dataset_query', {}).get('database')
+    with migrator.database_slot(database_id):
+        if MIGRATION_SETTINGS.get("validation_mode", "full") == "schema":
+            return validate_question_schema(question_id, question_name, migrator, log_file, expected_metadata)
+        return validate_question_response(question_id, question_name, migrator, log_file)
+
+def record_query_runs(dashboard_id, questions, migrator):
+    """Move the validation executions of these questions from the migrator to the performance ledger"""
+    runs = [(question['question_id'], migrator.query_runs.pop(question['question_id'])) for question in questions
+            if question['question_id'] in migrator.query_runs]
+    ledger = get_performance_ledger()
+    if ledger is None or not runs:
+        return
+    kind = "validate_schema" if MIGRATION_SETTINGS.get("validation_mode", "full") == "schema" else "validate"
+    ledger.record_many(runs, kind, dashboard_id)
+
 def validate_migration(dashboard_migration, migrator):
     """Validate all migrated questions and write results to a file"""
     filename = f'migrations/validation_results_dashboard_{dashboard_migration["dashboard_id"]}.txt'
@@ -1049,6 +1075,27 @@ def validate_migration(dashboard_migration, migrator):
         log_and_print("=" * 60, log_file)
         questions = dashboard_migration.get('questions', [])
         log_and_print(f"📊 Validating {len(questions)} questions", log_file)
+        native = [question for question in questions if question.get('type') == 'native' and question.get('converted_sql')]
+
+        # Questions not validated by the migration pipeline run concurrently, each into its
+        # own buffer, so the results file keeps the question order whatever finishes first
+        pending = [question for question in native if 'validated' not in question]
+        outcomes = {}
+        if pending:
+            def validate(question):
+                buffer = io.StringIO()
+                valid = validate_question(question.get('question_id'), question.get('question_name'), migrator, buffer)
+                return valid, buffer.getvalue()
+
+            workers = MIGRATION_SETTINGS.get("validation_workers", 8)
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as executor:
+                futures = {executor.submit(validate, question): index for index, question in enumerate(pending)}
+                for future in as_completed(futures):
+                    try:
+                        outcomes[pending[futures[future]]['question_id']] = future.result()
+                    except Exception as e:
+                        outcomes[pending[futures[future]]['question_id']] = (False, f"    ❌ Exception during validation: {str(e)}\n")
+
         success_count = 0
         total_count = 0
         for question in questions:
@@ -1060,11 +1107,18 @@ def validate_migration(dashboard_migration, migrator):
                 log_and_print(f"⏭️  Skipping question {question_id} ({question_name}) - not a native SQL question", log_file)
                 continue
             total_count += 1
-            log_and_print(f"\n📝 Validating Question {total_count}/{len([q for q in questions if q.get('type') == 'native' and q.get('converted_sql')])}", log_file)
+            log_and_print(f"\n📝 Validating Question {total_count}/{len(native)}", log_file)
             log_and_print("-" * 50, log_file)
-            if validate_question_response(question_id, question_name, migrator, log_file):
+            if 'validated' in question:
+                # Already validated by the migration pipeline; record its output
+                valid, validation_log = question['validated'], question['validation_log']
+            else:
+                valid, validation_log = outcomes[question_id]
+                print(validation_log, end='')
+            log_file.write(validation_log)
+            if valid:
                 success_count += 1
-            time.sleep(1)
+        record_query_runs(dashboard_migration["dashboard_id"], native, migrator)
         log_and_print(f"\n🎉 Validation Summary:", log_file)
         log_and_print(f"✅ Successfully validated: {success_count}/{total_count} questions", log_file)
         if success_count == total_count:
@@ -1195,129 +1249,248 @@ def apply_display_name_mappings(viz_settings, display_name_mappings):
     
     return enhanced_settings
 
-def main():
-    """Main function"""
-    overall_start = time.time()
-    dashboard_id = 421
-    
-    print(f"🚀 Starting migration for Dashboard {dashboard_id}")
-    print("=" * 60)
-    
-    # Load required data
-    step_start = time.time()
-    migration_mapping = load_migration_mapping()
-    if not migration_mapping:
-        return
-    step_start = log_timing(step_start, "Load migration mapping")
-    
-    # Load column mapping configuration
-    step_start = time.time()
-    column_config = load_column_mapping_config()
-    step_start = log_timing(step_start, "Load column mapping config")
-    
-    migrator = MetabaseMigrator(MetabaseConfig(
-        base_url=METABASE_CONFIG["base_url"],
-        username=METABASE_CONFIG["username"],
-        password=METABASE_CONFIG["password"]
-    ))
-    
-    step_start = time.time()
-    if not migrator.authenticate():
-        print("❌ Authentication failed")
-        return
-    step_start = log_timing(step_start, "Authentication")
-    
-    print("✅ Authentication successful")
+def select_delta_cards(dashboard_id, question_names, source_hashes, live_dashboard, journal, conversion=None):
+    """
+    Narrow question_names (in place) to the cards a delta sync has to migrate.
+    Cards edited after their last journaled update are kept and returned as changed;
+    dashcards added since the snapshot are appended; cards no longer on the live
+    dashboard, and cards already migrated and validated with the same rules, are dropped.
+    Returns (changed, new, removed, unchanged) question ids.
+    """
+    live_cards = {}
+    for dashcard in live_dashboard.get('dashcards', []):
+        card = dashcard.get('card') or {}
+        if card.get('id'):
+            live_cards.setdefault(card['id'], card)
+    
+    new_cards = [question_id for question_id in live_cards if question_id not in question_names]
+    for question_id in new_cards:
+        card = live_cards[question_id]
+        question_names[question_id] = card.get('name', 'Unknown')
+        source_hashes[question_id] = sql_hash(card.get('dataset_query', {}).get('native', {}).get('query', ''))
+    
+    changed_cards, removed_cards, unchanged_cards = set(), [], []
+    for question_id in list(question_names):
+        card = live_cards.get(question_id)
+        if card is None:
+            removed_cards.append(question_id)
+            continue
+        migrated_at = journal.last_migrated(dashboard_id, question_id)
+        if migrated_at is None:
+            continue
+        updated_at = parse_timestamp(card.get('updated_at'))
+        if updated_at is None or updated_at > parse_timestamp(migrated_at):
+            changed_cards.add(question_id)
+        elif journal.completed(dashboard_id, question_id, "validate", source_hashes[question_id], conversion):
+            unchanged_cards.append(question_id)
+    for question_id in removed_cards + unchanged_cards:
+        del question_names[question_id]
+    return changed_cards, new_cards, removed_cards, unchanged_cards
+
+def resume_completed(journal, dashboard_id, question_id, stage, source_hash, conversion=None, changed_cards=()):
+    """True if a stage can be skipped on resume; cards changed since their last migration never are"""
+    if journal is None or question_id in changed_cards:
+        return False
+    return journal.completed(dashboard_id, question_id, stage, source_hash, conversion)
+
+def run_dashboard_migration(dashboard_id, migrator, migration_mapping, column_config):
+    """
+    Migrate and validate one dashboard with an authenticated migrator and loaded mappings.
+    Returns a summary dict, or None if the dashboard could not be loaded.
+    """
+    dashboard_start = time.time()
     
     # Get dashboard details
     step_start = time.time()
     dashboard_data = load_dashboard_inspection(dashboard_id, migrator)
     if not dashboard_data:
-        return
+        return None
     step_start = log_timing(step_start, "Load dashboard inspection")
     
-    # Process all questions in the dashboard
-    success_count = 0
-    total_count = 0
-    processed_count = 0
-    migrated_questions = []  # Track which questions were actually migrated
+    # Report every unmapped field and table before any API call, instead of abandoning
+    # the dashboard halfway through when update_template_tags hits the first one
+    if MIGRATION_SETTINGS.get("preflight", True):
+        blockers = preflight_dashboard(dashboard_id, dashboard_data, migration_mapping)
+        if blockers:
+            print_preflight_blockers(dashboard_id, blockers)
+            print(f"  ⚠️  Fix the mappings (or disable MIGRATION_SETTINGS['preflight']) and rerun")
+            return {
+                "dashboard_id": dashboard_id,
+                "dashboard_name": dashboard_data.get('name', 'Unknown'),
+                "success": False,
+                "error": f"{len(blockers)} preflight blockers",
+                "blockers": blockers,
+                "seconds": time.time() - dashboard_start
+            }
+        print(f"  ✅ Preflight passed: every field and table is mapped")
     
+    # Process all questions in the dashboard
     step_start = time.time()
+    question_names = {}
     for dashcard in dashboard_data.get('dashcards', []):
         card = dashcard.get('card', {})
-        question_id = card.get('id')
-        question_name = card.get('name', 'Unknown')
-        
-        if not question_id:
-            continue
-        
-        print(f"\n📝 Processing Question {question_id}: {question_name}")
-        print("-" * 50)
-        
-        processed_count += 1
-        
-        # Fetch the question details
-        question_start = time.time()
-        question_response = migrator.session.get(
-            f"{migrator.config.base_url}/api/card/{question_id}",
-            headers={"X-Metabase-Session": migrator.session_token}
+        if card.get('id'):
+            question_names.setdefault(card['id'], card.get('name', 'Unknown'))
+    
+    # One live dashboard request tells which embedded cards changed since the snapshot
+    # (only those are fetched again) and, in delta mode, which cards to migrate at all
+    delta_sync = MIGRATION_SETTINGS.get("delta_sync", False)
+    current_dashboard = None
+    if MIGRATION_SETTINGS.get("use_embedded_cards", True) or delta_sync:
+        step_start = time.time()
+        current_dashboard = migrator.get_dashboard_details(dashboard_id)
+        if current_dashboard is None:
+            print("  ⚠️  Could not fetch the live dashboard, fetching every card instead")
+        elif MIGRATION_SETTINGS.get("use_embedded_cards", True):
+            stale_cards = migrator.seed_cards_from_dashboard(dashboard_data, current_dashboard)
+            print(f"  ♻️  Reusing {len(question_names) - len(stale_cards)} embedded cards, "
+                  f"{len(stale_cards)} changed since the snapshot")
+        step_start = log_timing(step_start, "Fetch live dashboard")
+    
+    # Staged pipeline: fetch -> convert -> update -> validate, each stage with its own
+    # workers and a bounded queue in front of it, so network and CPU work overlap
+    native_questions = []
+    
+    # Checkpoint journal: stages that already succeeded for the same source SQL are skipped,
+    # so a rerun after a crash resumes where the previous run stopped
+    journal = get_migration_journal()
+    conversion = conversion_fingerprint(migration_mapping)
+    source_hashes = {}
+    for dashcard in dashboard_data.get('dashcards', []):
+        card = dashcard.get('card') or {}
+        if card.get('id'):
+            source_hashes.setdefault(card['id'], sql_hash(card.get('dataset_query', {}).get('native', {}).get('query', '')))
+    
+    # Delta sync: only cards edited after their last migration, plus dashcards added since
+    changed_cards = set()
+    if delta_sync and journal is not None and current_dashboard is not None:
+        changed_cards, new_cards, removed_cards, unchanged_cards = select_delta_cards(
+            dashboard_id, question_names, source_hashes, current_dashboard, journal, conversion
         )
-        log_timing(question_start, f"Fetch question {question_id}")
+        print(f"  🔁 Delta sync: {len(changed_cards)} changed, {len(new_cards)} new, "
+              f"{len(removed_cards)} removed, {len(unchanged_cards)} unchanged cards")
+    
+    dashcard_order = {question_id: position for position, question_id in enumerate(question_names)}
+    
+    def completed(job, stage):
+        return resume_completed(journal, dashboard_id, job["question_id"], stage, job["sql_hash"], conversion, changed_cards)
+    
+    def record(job, stage, ok, **details):
+        if journal is not None:
+            journal.record(dashboard_id, job["question_id"], stage, job["sql_hash"], "ok" if ok else "failed",
+                           conversion=conversion, **details)
+    
+    def fetch_stage(question_id):
+        job = {"question_id": question_id, "question_name": question_names[question_id], "sql_hash": source_hashes[question_id]}
+        if completed(job, "validate"):
+            print(f"  ⏭️  Question {question_id} already migrated and validated in a previous run")
+            job["resumed"] = True
+            return job
+        question = migrator.get_card(question_id)
+        if question is None:
+            print(f"  ❌ Failed to fetch question {question_id}")
+            return None
+        job["question"] = question
+        job["updated"] = completed(job, "update")
+        return job
+    
+    def convert_stage(job):
+        question_id, question_name = job["question_id"], job["question_name"]
+        if job.get("resumed") or job["updated"]:
+            native_questions.append(question_id)
+            return job
+        dataset_query = job["question"].get('dataset_query', {})
         
-        if question_response.status_code != 200:
-            print(f"  ❌ Failed to fetch question: {question_response.status_code}")
-            continue
-        
-        question = question_response.json()
-        dataset_query = question.get('dataset_query', {})
-        query_type = dataset_query.get('type')
-        
-        if query_type != 'native':
+        if dataset_query.get('type') != 'native':
             print(f"  ⏭️  Skipping question {question_id} ({question_name}) - not a native SQL question")
-            continue
+            return None
         
-        total_count += 1
-        
-        # Get current SQL
-        native_query = dataset_query.get('native', {})
-        current_sql = native_query.get('query', '')
+        native_questions.append(question_id)
+        current_sql = dataset_query.get('native', {}).get('query', '')
         
         if not current_sql:
             print(f"  ⚠️  No SQL found in question {question_id}")
-            continue
+            return None
         
+        print(f"\n📝 Converting Question {question_id}: {question_name}")
         print(f"  📄 Current SQL preview: {current_sql[:100]}...")
         
-        # Get visualization columns for this question
-        viz_start = time.time()
+        # Get visualization columns, falling back to the current ones from Metabase
         visualization_columns = get_visualization_columns(dashboard_data, question_id)
-        
-        # If no columns found in inspection, get current ones from Metabase
         if not visualization_columns:
             print(f"  🔄 No visualization columns found in inspection, fetching from Metabase...")
             visualization_columns = get_current_visualization_columns(question_id, migrator)
-        log_timing(viz_start, f"Get visualization columns for {question_id}")
-        
         print(f"  📊 Visualization columns: {list(visualization_columns)}")
         
-        # Update the question with the current SQL (it will be cleaned by clean_sql_for_starrocks)
-        update_start = time.time()
-        if update_question(question_id, current_sql, visualization_columns, migrator, migration_mapping, dashboard_id, dashboard_data, column_config):
-            success_count += 1
-            migrated_questions.append({
-                "question_id": question_id,
-                "question_name": question_name,
-                "type": "native",
-                "converted_sql": "migrated"
-            })
-        log_timing(update_start, f"Update question {question_id}")
+        job["update_data"] = prepare_question_update(
+            question_id, job["question"], current_sql, visualization_columns,
+            migration_mapping, dashboard_id, dashboard_data, column_config
+        )
+        return job if job["update_data"] is not None else None
+    
+    def update_stage(job):
+        if job.get("resumed") or job["updated"]:
+            return job
+        print(f"\n🔄 Updating Question {job['question_id']}: {job['question_name']}")
+        updated = send_question_update(job["question_id"], job["update_data"], migrator)
+        # updated_at of the migrated card is what delta sync compares against next time
+        migrated_card = migrator.get_card(job["question_id"]) if updated else None
+        record(job, "update", updated, updated_at=(migrated_card or {}).get('updated_at'))
+        return job if updated else None
+    
+    def validate_stage(job):
+        if job.get("resumed"):
+            job["validated"] = True
+            job["validation_log"] = f"  ⏭️  Question {job['question_id']} already validated in a previous run\n"
+            return job
+        # Buffer each question's validation output so the results file stays readable
+        validation_log = io.StringIO()
+        # Schema validation compares against the columns the Exasol query returned
+        source_metadata = job.get("question", {}).get('result_metadata')
+        job["validated"] = validate_question(job["question_id"], job["question_name"], migrator, validation_log, source_metadata)
+        job["validation_log"] = validation_log.getvalue()
+        record(job, "validate", job["validated"])
+        return job
+    
+    workers = MIGRATION_SETTINGS.get("pipeline_workers", {})
+    pipeline = Pipeline([
+        Stage("fetch", fetch_stage, workers.get("fetch", 8)),
+        Stage("convert", convert_stage, workers.get("convert", 2)),
+        Stage("update", update_stage, workers.get("update", 4)),
+        Stage("validate", validate_stage, workers.get("validate", MIGRATION_SETTINGS.get("validation_workers", 8))),
+    ], queue_size=MIGRATION_SETTINGS.get("pipeline_queue_size", 16))
+    
+    print(f"\n📥 Running the migration pipeline for {len(question_names)} questions")
+    completed_jobs = sorted(pipeline.run(question_names), key=lambda job: dashcard_order[job["question_id"]])
+    
+    processed_count = pipeline.metrics[0].processed
+    total_count = len(native_questions)
+    success_count = len(completed_jobs)
+    migrated_questions = [{
+        "question_id": job["question_id"],
+        "question_name": job["question_name"],
+        "type": "native",
+        "converted_sql": "migrated",
+        "validated": job["validated"],
+        "validation_log": job["validation_log"]
+    } for job in completed_jobs]
+    
+    print(f"\n📊 Pipeline stages:")
+    for line in pipeline.report():
+        print(f"  {line}")
     
     step_start = log_timing(step_start, f"Process {processed_count} questions")
     
     print(f"\n🎉 Migration Summary:")
-    print(f"📊 Total dashcards processed: {processed_count}")
+    print(f"📊 Total questions processed: {processed_count}")
     print(f"📝 Native SQL questions found: {total_count}")
     print(f"✅ Successfully migrated: {success_count}/{total_count} questions")
+    conversion_cache = get_conversion_cache()
+    if conversion_cache is not None:
+        print(f"♻️  Conversion cache: {conversion_cache.summary()}")
+    print(f"♻️  Card requests avoided by the card cache: {migrator.avoided_card_requests}")
+    for line in migrator.concurrency_summary():
+        print(f"🎚️  Adaptive concurrency: {line}")
     print(f"📊 Dashboard {dashboard_id} migration completed!")
     
     # Create a simple migration result for validation - only include migrated questions
@@ -1327,13 +1500,14 @@ def main():
         "questions": migrated_questions
     }
     
-    # Validate the migration
+    # Write the validation results collected by the pipeline's validate stage
     print(f"\n" + "=" * 60)
-    print(f"🔍 VALIDATION PHASE")
+    print(f"🔍 VALIDATION RESULTS")
     print("=" * 60)
     
     validation_start = time.time()
-    if validate_migration(migration_result, migrator):
+    validated = validate_migration(migration_result, migrator)
+    if validated:
         print(f"\n🎊 FINAL RESULT: Migration successful!")
         print(f"✅ All questions migrated and validated")
         print(f"✅ Dashboard {dashboard_id} is now operational with StarRocks")
@@ -1344,6 +1518,58 @@ def main():
         print(f"🔧 Please review the validation results and fix any remaining issues")
     
     log_timing(validation_start, "Validation phase")
+    
+    return {
+        "dashboard_id": dashboard_id,
+        "dashboard_name": dashboard_data.get('name', 'Unknown'),
+        "processed": processed_count,
+        "native": total_count,
+        "migrated": success_count,
+        "validated": sum(1 for question in migrated_questions if question["validated"]),
+        "success": validated,
+        "seconds": time.time() - dashboard_start
+    }
+
+def main():
+    """Main function"""
+    overall_start = time.time()
+    dashboard_id = 421
+    
+    print(f"🚀 Starting migration for Dashboard {dashboard_id}")
+    print("=" * 60)
+    
+    # Load required data
+    step_start = time.time()
+    migration_mapping = load_migration_mapping()
+    if not migration_mapping:
+        return
+    step_start = log_timing(step_start, "Load migration mapping")
+    
+    # Build the table matcher once; every question reuses it
+    step_start = time.time()
+    table_matcher = get_table_matcher(migration_mapping['table_mapping'])
+    step_start = log_timing(step_start, f"Build table matcher ({table_matcher.size} tables)")
+    
+    # Load column mapping configuration
+    step_start = time.time()
+    column_config = load_column_mapping_config()
+    step_start = log_timing(step_start, "Load column mapping config")
+    
+    migrator = MetabaseMigrator(MetabaseConfig(
+        base_url=METABASE_CONFIG["base_url"],
+        username=METABASE_CONFIG["username"],
+        password=METABASE_CONFIG["password"]
+    ))
+    
+    step_start = time.time()
+    if not migrator.authenticate():
+        print("❌ Authentication failed")
+        return
+    step_start = log_timing(step_start, "Authentication")
+    
+    print("✅ Authentication successful")
+    
+    run_dashboard_migration(dashboard_id, migrator, migration_mapping, column_config)
     log_timing(overall_start, "TOTAL MIGRATION TIME")
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+"""
+Append-only checkpoint journal for migration runs
+Every finished stage of a card is recorded as one JSON line with the hash of the
+card's source SQL and the fingerprint of the conversion rules, so a rerun can skip
+work that already completed with the same input and rules.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import MIGRATION_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+def sql_hash(sql: str) -> str:
+    return hashlib.sha256((sql or '').encode()).hexdigest()[:16]
+
+class MigrationJournal:
+    """
+    JSONL journal of (dashboard, card, stage) outcomes.
+    Each line is flushed to the OS as it is written, so Ctrl-C or a crash loses
+    nothing; fsync runs every `fsync_batch` records or `fsync_interval` seconds.
+    """
+
+    def __init__(self, path: str, fsync_batch: int = 50, fsync_interval: float = 2.0):
+        self.path = path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.time()
+        # (dashboard_id, question_id, stage) -> latest record
+        self.entries: Dict[Tuple[int, int, str], Dict] = {}
+        self._load()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    key = (record["dashboard_id"], record["question_id"], record["stage"])
+                except (ValueError, KeyError, TypeError):
+                    # A run killed mid-write leaves a partial last line
+                    continue
+                self.entries[key] = record
+        logger.info(f"Loaded {len(self.entries)} journal entries from {self.path}")
+
+    def record(self, dashboard_id: int, question_id: int, stage: str, source_hash: str, outcome: str, **details):
+        """Append the outcome ("ok" or "failed") of one stage for one card"""
+        record = {
+            "dashboard_id": dashboard_id,
+            "question_id": question_id,
+            "stage": stage,
+            "sql_hash": source_hash,
+            "outcome": outcome,
+            "time": time.time(),
+            **details
+        }
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self.entries[(dashboard_id, question_id, stage)] = record
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_batch or time.time() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def completed(self, dashboard_id: int, question_id: int, stage: str, source_hash: str,
+                  conversion: Optional[str] = None) -> bool:
+        """
+        True if this stage already succeeded for the same source SQL and, when given,
+        the same conversion fingerprint; a mapping or rewrite rule fix migrates the card again
+        """
+        record = self.entries.get((dashboard_id, question_id, stage))
+        if not record or record["outcome"] != "ok" or record["sql_hash"] != source_hash:
+            return False
+        return conversion is None or record.get("conversion") == conversion
+
+    def last_migrated(self, dashboard_id: int, question_id: int) -> Optional[str]:
+        """Card updated_at recorded by its last successful update, if any"""
+        record = self.entries.get((dashboard_id, question_id, "update"))
+        if record and record["outcome"] == "ok":
+            return record.get("updated_at")
+        return None
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._unsynced:
+                self._sync()
+            self._file.close()
+
+_journals: Dict[str, MigrationJournal] = {}
+_journals_lock = threading.Lock()
+
+def get_migration_journal(path: Optional[str] = None) -> Optional[MigrationJournal]:
+    """
+    Shared journal for this process; path defaults to MIGRATION_SETTINGS["journal_path"].
+    Returns None when journaling is disabled. The journal is synced and closed at exit.
+    """
+    if path is None:
+        path = MIGRATION_SETTINGS.get("journal_path")
+    if not path:
+        return None
+    # Batch threads ask for the journal at once; two instances would each append to the file
+    with _journals_lock:
+        if path not in _journals:
+            journal = MigrationJournal(
+                path,
+                fsync_batch=MIGRATION_SETTINGS.get("journal_fsync_batch", 50),
+                fsync_interval=MIGRATION_SETTINGS.get("journal_fsync_interval", 2.0)
+            )
+            atexit.register(journal.close)
+            _journals[path] = journal
+        return _journals[path]
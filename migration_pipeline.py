@@ -0,0 +1,194 @@
+"""
+Staged producer/consumer pipeline for migrations
+Each stage has its own worker threads and reads from a bounded queue, so a slow
+stage applies backpressure to the ones before it instead of letting work pile up.
+"""
+
+import io
+import logging
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Queue marker telling a worker that no more items will arrive
+_DONE = object()
+
+@dataclass
+class Stage:
+    """
+    A pipeline stage; func returns the item for the next stage, or None to drop it.
+    With buffer_output, what func prints for an item is written in one piece once it is done,
+    so the output of workers running at the same time does not interleave.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    buffer_output: bool = True
+
+    def __post_init__(self):
+        # A stage without workers never drains its queue and the run would hang
+        if not isinstance(self.workers, int) or self.workers < 1:
+            raise ValueError(f"Pipeline stage {self.name} needs at least one worker, got {self.workers!r}")
+
+class _ThreadOutput(io.TextIOBase):
+    """stdout replacement sending each thread's writes to that thread's buffer, if it has one"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+@dataclass
+class StageMetrics:
+    """Throughput and input-queue depth of one stage"""
+    name: str
+    workers: int
+    processed: int = 0
+    dropped: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    first_start: Optional[float] = None
+    last_end: Optional[float] = None
+    depth_samples: int = 0
+    depth_total: int = 0
+    max_depth: int = 0
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    @property
+    def throughput(self) -> float:
+        """Items per second while the stage was active"""
+        return self.processed / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Share of the workers' active time spent working; the busiest stage limits the run"""
+        capacity = self.wall_seconds * self.workers
+        return self.busy_seconds / capacity if capacity else 0.0
+
+    @property
+    def average_depth(self) -> float:
+        return self.depth_total / self.depth_samples if self.depth_samples else 0.0
+
+class Pipeline:
+    """Run items through stages connected by bounded queues"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 16):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = [StageMetrics(stage.name, stage.workers) for stage in stages]
+        self._lock = threading.Lock()
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Feed items through every stage; returns what the last stage produced, in completion order"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        remaining = [stage.workers for stage in self.stages]
+        results = []
+        output = _ThreadOutput(sys.stdout) if any(stage.buffer_output for stage in self.stages) else None
+        output_lock = threading.Lock()
+
+        def work(index: int):
+            stage, metrics = self.stages[index], self.metrics[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            while True:
+                depth = inbox.qsize()
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                start = time.time()
+                if stage.buffer_output:
+                    output.local.buffer = io.StringIO()
+                try:
+                    produced = stage.func(item)
+                    failed = False
+                except Exception as e:
+                    logger.error(f"Pipeline stage {stage.name} failed: {str(e)}")
+                    produced, failed = None, True
+                finally:
+                    if stage.buffer_output:
+                        text, output.local.buffer = output.local.buffer.getvalue(), None
+                        if text:
+                            with output_lock:
+                                output.stream.write(text)
+                                output.stream.flush()
+                end = time.time()
+                with self._lock:
+                    metrics.processed += 1
+                    metrics.busy_seconds += end - start
+                    metrics.depth_samples += 1
+                    metrics.depth_total += depth
+                    metrics.max_depth = max(metrics.max_depth, depth)
+                    if metrics.first_start is None:
+                        metrics.first_start = start
+                    metrics.last_end = end
+                    if failed:
+                        metrics.errors += 1
+                    elif produced is None:
+                        metrics.dropped += 1
+                if produced is None:
+                    continue
+                if outbox is not None:
+                    outbox.put(produced)
+                else:
+                    with self._lock:
+                        results.append(produced)
+            # The last worker of a stage to finish closes the next stage
+            with self._lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    outbox.put(_DONE)
+
+        threads = [
+            threading.Thread(target=work, args=(index,), name=f"{stage.name}-{worker}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for worker in range(stage.workers)
+        ]
+        if output is not None:
+            sys.stdout = output
+        try:
+            for thread in threads:
+                thread.start()
+            # put() blocks while the first queue is full: backpressure reaches the producer too
+            for item in items:
+                queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+        finally:
+            if output is not None:
+                sys.stdout = output.stream
+        return results
+
+    def report(self) -> List[str]:
+        """One line per stage: workers, items, throughput, utilization and queue depth"""
+        lines = [f"{'stage':<10} {'workers':>7} {'items':>6} {'items/s':>8} {'busy':>6} {'queue avg/max':>14}"]
+        for metrics in self.metrics:
+            lines.append(
+                f"{metrics.name:<10} {metrics.workers:>7} {metrics.processed:>6} "
+                f"{metrics.throughput:>8.2f} {metrics.utilization:>5.0%} "
+                f"{metrics.average_depth:>9.1f}/{metrics.max_depth:<4}"
+            )
+        if any(metrics.processed for metrics in self.metrics):
+            bottleneck = max(self.metrics, key=lambda metrics: metrics.utilization)
+            lines.append(f"Limiting stage: {bottleneck.name}")
+        return lines
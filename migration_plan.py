@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Two-phase migration: compile a plan offline, then apply it
+`plan` builds every card's update payload from the cached inspections and the mappings,
+without contacting Metabase, and writes them with a per-card diff to a plan file that can
+be reviewed. `apply` pushes a plan file with many PUTs in flight and no per-card computation.
+"""
+
+import contextlib
+import difflib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import migrate_dashboard
+import sql_rewriter
+from config import METABASE_CONFIG, MIGRATION_SETTINGS
+from conversion_cache import fingerprint, module_fingerprint
+from metabase_migrator import MetabaseMigrator, MetabaseConfig
+from migrate_dashboard import (
+    load_migration_mapping, load_column_mapping_config, get_visualization_columns,
+    prepare_question_update, conversion_fingerprint, log_timing
+)
+from migration_journal import get_migration_journal, sql_hash
+from sql_rewriter import get_table_matcher
+
+# "plan" compiles PLAN_FILE from the inspections, "apply" pushes it to Metabase
+MODE = "plan"
+DASHBOARD_IDS = [421]
+PLAN_FILE = MIGRATION_SETTINGS.get("plan_path", "migrations/migration_plan.json")
+
+def rules_fingerprint() -> str:
+    """Changes whenever the mappings or the rewrite rules change, making older plans stale"""
+    return fingerprint(module_fingerprint(sql_rewriter), module_fingerprint(migrate_dashboard))
+
+def card_diff(question: Dict, update_data: Dict) -> Dict:
+    """What applying update_data changes on the card: database, SQL, template tags, visualization settings"""
+    dataset_query = question.get('dataset_query', {})
+    native_query = dataset_query.get('native', {})
+    new_query = update_data['dataset_query']
+
+    sql_diff = list(difflib.unified_diff(
+        native_query.get('query', '').splitlines(),
+        new_query['native']['query'].splitlines(),
+        'exasol', 'starrocks', lineterm=''
+    ))
+
+    old_tags = native_query.get('template-tags', {})
+    new_tags = new_query['native']['template-tags']
+    template_tags = {
+        tag_name: {"from": old_tags.get(tag_name), "to": tag}
+        for tag_name, tag in new_tags.items() if old_tags.get(tag_name) != tag
+    }
+
+    old_settings = question.get('visualization_settings', {})
+    new_settings = update_data['visualization_settings']
+    changed_settings = sorted(
+        key for key in set(old_settings) | set(new_settings)
+        if old_settings.get(key) != new_settings.get(key)
+    )
+
+    return {
+        "database": {"from": dataset_query.get('database'), "to": new_query['database']},
+        "sql": sql_diff,
+        "template_tags": template_tags,
+        "visualization_settings": changed_settings
+    }
+
+def plan_dashboard(dashboard_id: int, migration_mapping: Dict, column_config: Dict) -> Dict:
+    """
+    Compile the update payloads of one dashboard from its inspection file; never contacts Metabase.
+    The verbose conversion output is kept only for cards that cannot be migrated.
+    """
+    filename = f'inspections/dashboard_{dashboard_id}_inspection.json'
+    try:
+        with open(filename, 'r') as f:
+            dashboard_data = json.load(f)
+    except FileNotFoundError:
+        return {"dashboard_id": dashboard_id, "error": f"{filename} not found, run migrate_dashboard.py once to fetch it"}
+
+    plan = {
+        "dashboard_id": dashboard_id,
+        "dashboard_name": dashboard_data.get('name', 'Unknown'),
+        "cards": [],
+        "skipped": []
+    }
+    seen = set()
+    for dashcard in dashboard_data.get('dashcards', []):
+        question = dashcard.get('card') or {}
+        question_id = question.get('id')
+        if not question_id or question_id in seen:
+            continue
+        seen.add(question_id)
+        question_name = question.get('name', 'Unknown')
+        dataset_query = question.get('dataset_query', {})
+        current_sql = dataset_query.get('native', {}).get('query', '')
+        if dataset_query.get('type') != 'native' or not current_sql:
+            plan["skipped"].append({"question_id": question_id, "question_name": question_name,
+                                    "reason": "not a native SQL question"})
+            continue
+
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                visualization_columns = get_visualization_columns(dashboard_data, question_id)
+                update_data = prepare_question_update(
+                    question_id, question, current_sql, visualization_columns,
+                    migration_mapping, dashboard_id, dashboard_data, column_config
+                )
+        except Exception as e:
+            plan["skipped"].append({"question_id": question_id, "question_name": question_name,
+                                    "reason": f"conversion failed: {str(e)}", "log": output.getvalue()})
+            continue
+        if update_data is None:
+            plan["skipped"].append({"question_id": question_id, "question_name": question_name,
+                                    "reason": "unmapped template tag fields", "log": output.getvalue()})
+            continue
+
+        plan["cards"].append({
+            "question_id": question_id,
+            "question_name": question_name,
+            "sql_hash": sql_hash(current_sql),
+            "updated_at": question.get('updated_at'),
+            "update_data": update_data,
+            "diff": card_diff(question, update_data)
+        })
+    return plan
+
+# Mappings shared by every compile_plan worker process
+_worker_args = None
+
+def _init_worker(migration_mapping, column_config):
+    global _worker_args
+    _worker_args = (migration_mapping, column_config)
+
+def _plan_in_worker(dashboard_id):
+    return plan_dashboard(dashboard_id, *_worker_args)
+
+def compile_plan(dashboard_ids: List[int], migration_mapping: Dict, column_config: Dict,
+                 workers: Optional[int] = None) -> Dict:
+    """Plan every dashboard, one dashboard per worker process; dashboards stay in input order"""
+    dashboard_ids = list(dict.fromkeys(dashboard_ids))
+    workers = workers or MIGRATION_SETTINGS.get("plan_workers") or os.cpu_count() or 1
+    if workers > 1 and len(dashboard_ids) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(dashboard_ids)),
+            initializer=_init_worker,
+            initargs=(migration_mapping, column_config)
+        ) as executor:
+            dashboards = list(executor.map(_plan_in_worker, dashboard_ids))
+    else:
+        get_table_matcher(migration_mapping['table_mapping'])
+        dashboards = [plan_dashboard(dashboard_id, migration_mapping, column_config) for dashboard_id in dashboard_ids]
+
+    return {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "fingerprint": rules_fingerprint(),
+        "conversion": conversion_fingerprint(migration_mapping),
+        "target_database": migration_mapping['database_mapping']['starrocks'],
+        "dashboards": dashboards
+    }
+
+def write_plan(plan: Dict, path: str = PLAN_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(plan, f, indent=2)
+
+def load_plan(path: str = PLAN_FILE) -> Optional[Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"❌ Plan file {path} not found. Run with MODE = \"plan\" first.")
+        return None
+
+def print_plan(plan: Dict):
+    """One line per dashboard and per card, followed by the totals"""
+    cards = skipped = 0
+    for dashboard in plan["dashboards"]:
+        if "error" in dashboard:
+            print(f"  ❌ Dashboard {dashboard['dashboard_id']}: {dashboard['error']}")
+            continue
+        print(f"\n📊 Dashboard {dashboard['dashboard_id']}: {dashboard['dashboard_name']} "
+              f"({len(dashboard['cards'])} cards, {len(dashboard['skipped'])} skipped)")
+        for card in dashboard["cards"]:
+            diff = card["diff"]
+            changed_lines = sum(1 for line in diff["sql"] if line[:1] in "+-" and line[:3] not in ("+++", "---"))
+            print(f"  📝 {card['question_id']}: {card['question_name']} - {changed_lines} SQL lines, "
+                  f"{len(diff['template_tags'])} template tags, "
+                  f"{len(diff['visualization_settings'])} visualization settings changed")
+        for card in dashboard["skipped"]:
+            print(f"  ⏭️  {card['question_id']}: {card['question_name']} - {card['reason']}")
+        cards += len(dashboard["cards"])
+        skipped += len(dashboard["skipped"])
+    print(f"\n✅ Planned {cards} card updates, {skipped} cards skipped")
+
+def live_card_versions(dashboard_ids: List[int], migrator: MetabaseMigrator, workers: int) -> Dict[int, Optional[Dict[int, str]]]:
+    """updated_at of every card on each live dashboard; None for dashboards that could not be fetched"""
+    versions = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(dashboard_ids)))) as executor:
+        futures = {executor.submit(migrator.get_dashboard_details, dashboard_id): dashboard_id for dashboard_id in dashboard_ids}
+        for future in as_completed(futures):
+            dashboard = future.result()
+            versions[futures[future]] = None if dashboard is None else {
+                (dashcard.get('card') or {}).get('id'): (dashcard.get('card') or {}).get('updated_at')
+                for dashcard in dashboard.get('dashcards', [])
+            }
+    return versions
+
+def apply_plan(plan: Dict, migrator: MetabaseMigrator, workers: Optional[int] = None,
+               check_drift: bool = True) -> List[Dict]:
+    """
+    PUT every planned card, with up to `workers` requests in flight.
+    With check_drift, cards edited in Metabase after the plan's snapshot are left alone.
+    Successful updates are written to the checkpoint journal like pipeline updates.
+    Returns one result per planned card, in plan order.
+    """
+    workers = workers or MIGRATION_SETTINGS.get("apply_workers", 16)
+    journal = get_migration_journal()
+    jobs = [(dashboard["dashboard_id"], card) for dashboard in plan["dashboards"] for card in dashboard.get("cards", [])]
+
+    versions = {}
+    if check_drift and jobs:
+        versions = live_card_versions(list(dict.fromkeys(dashboard_id for dashboard_id, _ in jobs)), migrator, workers)
+
+    def apply(dashboard_id, card):
+        result = {"dashboard_id": dashboard_id, "question_id": card["question_id"], "question_name": card["question_name"]}
+        live = versions.get(dashboard_id)
+        if live is not None:
+            if card["question_id"] not in live:
+                return {**result, "status": "skipped", "reason": "no longer on the dashboard"}
+            if live[card["question_id"]] != card["updated_at"]:
+                return {**result, "status": "skipped", "reason": "edited since the plan was compiled"}
+        try:
+            response = migrator.update_card(card["question_id"], card["update_data"])
+        except Exception as e:
+            return {**result, "status": "failed", "reason": str(e)}
+        ok = response.status_code == 200
+        if journal is not None:
+            # The PUT response is cached by update_card, so this is usually not another request
+            migrated_card = migrator.get_card(card["question_id"]) if ok else None
+            journal.record(dashboard_id, card["question_id"], "update", card["sql_hash"],
+                           "ok" if ok else "failed", conversion=plan.get("conversion"),
+                           updated_at=(migrated_card or {}).get('updated_at'))
+        if ok:
+            return {**result, "status": "updated"}
+        return {**result, "status": "failed", "reason": f"{response.status_code} {response.text[:200]}"}
+
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(apply, *job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = {"updated": "✅", "skipped": "⏭️ ", "failed": "❌"}[result["status"]]
+            reason = f" - {result['reason']}" if "reason" in result else ""
+            print(f"  {status} {result['question_id']}: {result['question_name']}{reason}")
+    return results
+
+def main():
+    """Main function"""
+    overall_start = time.time()
+
+    if MODE == "plan":
+        print(f"🗺️  Compiling migration plan for {len(DASHBOARD_IDS)} dashboards")
+        print("=" * 60)
+        step_start = time.time()
+        migration_mapping = load_migration_mapping()
+        if not migration_mapping:
+            return
+        column_config = load_column_mapping_config()
+        step_start = log_timing(step_start, "Load mappings")
+
+        plan = compile_plan(DASHBOARD_IDS, migration_mapping, column_config)
+        write_plan(plan, PLAN_FILE)
+        step_start = log_timing(step_start, "Compile plan")
+        print_plan(plan)
+        print(f"\n📄 Plan saved to {PLAN_FILE}, review it and rerun with MODE = \"apply\"")
+
+    elif MODE == "apply":
+        plan = load_plan(PLAN_FILE)
+        if plan is None:
+            return
+        if plan.get("fingerprint") != rules_fingerprint():
+            print("❌ The mappings or rewrite rules changed since the plan was compiled. Compile it again.")
+            return
+
+        migrator = MetabaseMigrator(MetabaseConfig(
+            base_url=METABASE_CONFIG["base_url"],
+            username=METABASE_CONFIG["username"],
+            password=METABASE_CONFIG["password"]
+        ))
+        step_start = time.time()
+        if not migrator.authenticate():
+            print("❌ Authentication failed")
+            return
+        step_start = log_timing(step_start, "Authentication")
+
+        print(f"🚀 Applying plan compiled at {plan['created_at']}")
+        print("=" * 60)
+        results = apply_plan(plan, migrator)
+        step_start = log_timing(step_start, f"Apply {len(results)} card updates")
+
+        counts = {status: sum(1 for result in results if result["status"] == status)
+                  for status in ("updated", "skipped", "failed")}
+        print(f"\n✅ Updated: {counts['updated']}, ⏭️  skipped: {counts['skipped']}, ❌ failed: {counts['failed']}")
+        print(f"🔍 Run migrate_dashboard.py to validate; already applied updates are not sent again")
+
+    else:
+        print(f"❌ Unknown MODE {MODE!r}, expected \"plan\" or \"apply\"")
+        return
+
+    log_timing(overall_start, "TOTAL TIME")
+
+if __name__ == "__main__":
+    main()
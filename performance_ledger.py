@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Historical per-card query performance ledger
+Every validation and benchmark execution is stored in a local SQLite file with the
+card, the hash of its SQL, the database, the row count and the latency. Run this
+module to list cards whose latest latency regressed against their rolling baseline,
+e.g. after a StarRocks schema change or a converter change.
+"""
+
+import logging
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import MIGRATION_SETTINGS
+from metabase_migrator import QueryRun
+from migration_journal import sql_hash
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Regression:
+    """A card whose latest executions are slower than its baseline on the same database and kind"""
+    card_id: int
+    database_id: Optional[int]
+    kind: str
+    baseline_ms: float            # median latency of the baseline executions
+    latest_ms: float              # median latency of the latest run's executions
+    baseline_runs: int
+    latest_runs: int
+    sql_changed: bool             # the latest run executed SQL never seen in the baseline
+    dashboard_id: Optional[int] = None
+
+    @property
+    def ratio(self) -> float:
+        return self.latest_ms / self.baseline_ms if self.baseline_ms else float('inf')
+
+class PerformanceLedger:
+    """
+    SQLite-backed ledger of query executions.
+    Executions recorded through one instance share a run_id, so the several executions
+    of a benchmark count as one observation when looking for regressions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS executions ("
+            " card_id INTEGER NOT NULL,"
+            " dashboard_id INTEGER,"
+            " database_id INTEGER,"
+            " kind TEXT NOT NULL,"
+            " sql_hash TEXT,"
+            " row_count INTEGER,"
+            " running_time REAL,"
+            " client_time REAL NOT NULL,"
+            " error TEXT,"
+            " started_at REAL NOT NULL,"
+            " run_id TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS executions_card ON executions (card_id, database_id, kind, started_at)"
+        )
+        self._connection.commit()
+
+    def record_many(self, executions: Iterable[Tuple[int, QueryRun]], kind: str,
+                    dashboard_id: Optional[int] = None) -> int:
+        """Store (card_id, run) executions of one kind ("validate", "validate_schema", "benchmark")"""
+        rows = [
+            (card_id, dashboard_id, run.database_id, kind, sql_hash(run.sql) if run.sql is not None else None,
+             run.row_count, run.running_time, run.client_time, run.error, run.started_at or time.time(), self.run_id)
+            for card_id, run in executions
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            try:
+                self._connection.executemany("INSERT INTO executions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._connection.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not write performance ledger entries: {str(e)}")
+                return 0
+        return len(rows)
+
+    def record(self, card_id: int, run: QueryRun, kind: str, dashboard_id: Optional[int] = None) -> int:
+        return self.record_many([(card_id, run)], kind, dashboard_id)
+
+    def regressions(self, threshold: float = 0.5, window: int = 20, min_runs: int = 3,
+                    min_delta_ms: float = 100.0) -> List[Regression]:
+        """
+        Cards whose latest run is more than `threshold` (0.5 = 50%) and `min_delta_ms` slower
+        than the median of their previous `window` successful executions. Latency is Metabase's
+        running_time, or the client latency when Metabase did not report it. Cards with fewer
+        than `min_runs` baseline executions are not judged.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT card_id, database_id, kind, run_id, sql_hash, COALESCE(running_time, client_time * 1000),"
+                " dashboard_id FROM executions WHERE error IS NULL"
+                " ORDER BY card_id, database_id, kind, started_at"
+            ).fetchall()
+        found = []
+        for (card_id, database_id, kind), executions in groupby(rows, key=lambda row: row[:3]):
+            executions = list(executions)
+            latest_run = executions[-1][3]
+            latest = [row for row in executions if row[3] == latest_run]
+            baseline = [row for row in executions if row[3] != latest_run][-window:]
+            if len(baseline) < min_runs:
+                continue
+            baseline_ms = statistics.median(row[5] for row in baseline)
+            latest_ms = statistics.median(row[5] for row in latest)
+            if latest_ms > baseline_ms * (1 + threshold) and latest_ms - baseline_ms >= min_delta_ms:
+                found.append(Regression(
+                    card_id, database_id, kind, baseline_ms, latest_ms, len(baseline), len(latest),
+                    sql_changed=latest[-1][4] not in {row[4] for row in baseline},
+                    dashboard_id=latest[-1][6]
+                ))
+        return sorted(found, key=lambda regression: regression.ratio, reverse=True)
+
+    def summary(self) -> str:
+        with self._lock:
+            executions, cards = self._connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT card_id) FROM executions"
+            ).fetchone()
+        return f"{executions} executions of {cards} cards"
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+_ledgers: Dict[str, PerformanceLedger] = {}
+_ledgers_lock = threading.Lock()
+
+def get_performance_ledger(path: Optional[str] = None) -> Optional[PerformanceLedger]:
+    """
+    Shared ledger for this process; path defaults to MIGRATION_SETTINGS["performance_ledger_path"].
+    Returns None when the ledger is disabled.
+    """
+    if path is None:
+        path = MIGRATION_SETTINGS.get("performance_ledger_path")
+    if not path:
+        return None
+    with _ledgers_lock:
+        if path not in _ledgers:
+            _ledgers[path] = PerformanceLedger(path)
+        return _ledgers[path]
+
+def main():
+    """List the cards whose latency regressed, worst first"""
+    ledger = get_performance_ledger()
+    if ledger is None or not os.path.exists(ledger.path):
+        print("⚠️  The performance ledger is disabled or empty")
+        return
+
+    threshold = MIGRATION_SETTINGS.get("ledger_regression_threshold", 0.5)
+    print(f"📒 Performance ledger: {ledger.summary()}")
+    print(f"🔍 Cards more than {threshold:.0%} slower than their baseline")
+    print("=" * 60)
+    regressions = ledger.regressions(
+        threshold=threshold,
+        window=MIGRATION_SETTINGS.get("ledger_baseline_runs", 20),
+        min_runs=MIGRATION_SETTINGS.get("ledger_min_baseline_runs", 3),
+        min_delta_ms=MIGRATION_SETTINGS.get("ledger_min_regression_ms", 100.0)
+    )
+    for regression in regressions:
+        dashboard = f", dashboard {regression.dashboard_id}" if regression.dashboard_id else ""
+        note = " (SQL changed)" if regression.sql_changed else ""
+        print(f"  🐢 Card {regression.card_id} on database {regression.database_id} ({regression.kind}{dashboard}): "
+              f"{regression.baseline_ms:.0f}ms → {regression.latest_ms:.0f}ms, {regression.ratio:.1f}x{note}")
+    if not regressions:
+        print("  ✅ No regressions")
+
+if __name__ == "__main__":
+    main()
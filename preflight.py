@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Script to find everything that blocks dashboards from migrating, before any API call
+Sweeps the cached inspections once and reports every unmapped template tag field,
+parameter_mappings field target and table, grouped by dashboard.
+"""
+
+import glob
+import json
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from migrate_dashboard import (
+    load_migration_mapping, preflight_dashboard, print_preflight_blockers, get_preflight_index, log_timing
+)
+
+# Dashboards to check; None checks every dashboard in inspections/
+DASHBOARD_IDS = None
+INSPECTION_PATTERN = re.compile(r'dashboard_(\d+)_inspection\.json$')
+
+def inspection_dashboard_ids() -> List[int]:
+    """IDs of all dashboards with a cached inspection"""
+    ids = []
+    for path in glob.glob('inspections/dashboard_*_inspection.json'):
+        match = INSPECTION_PATTERN.search(os.path.basename(path))
+        if match:
+            ids.append(int(match.group(1)))
+    return sorted(ids)
+
+def preflight_inspections(dashboard_ids: List[int], migration_mapping: Dict) -> Dict[int, Optional[List[Dict]]]:
+    """Blockers per dashboard, in input order; None for dashboards without a cached inspection"""
+    results = {}
+    for dashboard_id in dashboard_ids:
+        try:
+            with open(f'inspections/dashboard_{dashboard_id}_inspection.json', 'r') as f:
+                dashboard_data = json.load(f)
+        except FileNotFoundError:
+            results[dashboard_id] = None
+            continue
+        results[dashboard_id] = preflight_dashboard(dashboard_id, dashboard_data, migration_mapping)
+    return results
+
+def main():
+    """Main function"""
+    start = time.time()
+
+    print(f"🛫 Preflight check of cached inspections")
+    print("=" * 60)
+
+    migration_mapping = load_migration_mapping()
+    if not migration_mapping:
+        return
+    get_preflight_index(migration_mapping)
+
+    dashboard_ids = DASHBOARD_IDS if DASHBOARD_IDS is not None else inspection_dashboard_ids()
+    results = preflight_inspections(dashboard_ids, migration_mapping)
+
+    kinds = Counter()
+    for dashboard_id, blockers in results.items():
+        if blockers is None:
+            print(f"  ⚠️  Dashboard {dashboard_id}: no cached inspection, not checked")
+        elif blockers:
+            print_preflight_blockers(dashboard_id, blockers)
+            kinds.update(blocker["kind"] for blocker in blockers)
+        else:
+            print(f"  ✅ Dashboard {dashboard_id}: ready to migrate")
+
+    blocked = [dashboard_id for dashboard_id, blockers in results.items() if blockers]
+    print(f"\n📊 {len(results) - len(blocked)}/{len(results)} dashboards ready, {len(blocked)} blocked")
+    for kind, count in kinds.most_common():
+        print(f"  🚫 Unmapped {kind.replace('_', ' ')}: {count}")
+    log_timing(start, "Preflight")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Column-wise comparison of two query results with numeric tolerances
+Each result is loaded into one typed array per column (NumPy when it is installed,
+the array module otherwise), both are sorted on their key columns, and numeric
+columns are compared with absolute and relative tolerances a whole column at a time.
+"""
+
+import math
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def column_order(header: List[str]) -> Tuple[List[str], List[int]]:
+    """Lowercased column names in sorted order and the positions to read them from, so both engines line up"""
+    positions = sorted(range(len(header)), key=lambda i: header[i].strip().lower())
+    return [header[i].strip().lower() for i in positions], positions
+
+def _float_column(values: Iterable[str]):
+    """float64 column with NaN for NULL, or None if a value is not a number"""
+    try:
+        if numpy is not None:
+            return numpy.array([value or 'nan' for value in values], dtype=numpy.float64)
+        return array('d', [float(value) if value else math.nan for value in values])
+    except ValueError:
+        return None
+
+class ColumnarResult:
+    """A query result held column by column: numeric columns as float64 arrays (NaN for NULL), others as text"""
+
+    def __init__(self, columns: List[str], data: Dict[str, object], rows: int):
+        self.columns = columns
+        self.data = data
+        self.rows = rows
+
+    def is_numeric(self, column: str) -> bool:
+        return not isinstance(self.data[column], list)
+
+    def row_source(self) -> Tuple[List[str], Iterable[List[str]]]:
+        """(header, rows) of the result as text, NULL numbers as empty strings"""
+        def text(column):
+            if not self.is_numeric(column):
+                return self.data[column]
+            return ['' if math.isnan(value) else repr(float(value)) for value in self.data[column]]
+        return self.columns, (list(row) for row in zip(*(text(column) for column in self.columns)))
+
+def load_columns(header: List[str], rows: Iterable[List[str]],
+                 normalize: Optional[Callable[[str], str]] = None) -> ColumnarResult:
+    """Read a (header, rows) result column-wise; text values go through normalize"""
+    columns, positions = column_order(header)
+    rows = list(rows)
+    # Transposing in C is much faster than appending value by value
+    values = list(zip(*rows)) if rows else [() for _ in header]
+    data = {}
+    for column, position in zip(columns, positions):
+        column_values = values[position]
+        numeric = _float_column(column_values)
+        if numeric is None:
+            numeric = [normalize(value) for value in column_values] if normalize else list(column_values)
+        data[column] = numeric
+    return ColumnarResult(columns, data, len(rows))
+
+def _sort_order(result: ColumnarResult, keys: List[str]) -> List[int]:
+    """Row order sorted on the key columns, then on every other column to break ties"""
+    columns = keys + [column for column in result.columns if column not in keys]
+    if numpy is not None:
+        # lexsort takes the primary key last; text columns are sorted through their ranks
+        sort_keys = [
+            result.data[column] if result.is_numeric(column) else numpy.unique(result.data[column], return_inverse=True)[1]
+            for column in reversed(columns)
+        ]
+        return numpy.lexsort(sort_keys) if sort_keys else numpy.arange(result.rows)
+    # NaN never compares equal, so NULL numbers sort first as -inf
+    sort_columns = [
+        [-math.inf if math.isnan(value) else value for value in result.data[column]] if result.is_numeric(column)
+        else result.data[column]
+        for column in columns
+    ]
+    rows = list(zip(*sort_columns)) if sort_columns else [()] * result.rows
+    return sorted(range(result.rows), key=rows.__getitem__)
+
+def _is_integral(values) -> bool:
+    """True if every non-NULL value of a float column is a whole number"""
+    if numpy is not None:
+        return bool(numpy.all(numpy.isnan(values) | (values == numpy.floor(values))))
+    return all(math.isnan(value) or value.is_integer() for value in values)
+
+def _plain(value):
+    """Python value of a NumPy scalar, for reports"""
+    return value.item() if hasattr(value, 'item') else value
+
+def _take(values, order):
+    if numpy is not None:
+        return numpy.asarray(values)[order]
+    if isinstance(values, list):
+        return [values[i] for i in order]
+    return array('d', (values[i] for i in order))
+
+def _outside_tolerance(left, right, rel_tol: float, abs_tol: float) -> List[int]:
+    """Positions where two float columns differ by more than abs_tol + rel_tol * max(|left|, |right|)"""
+    if numpy is not None:
+        both_null = numpy.isnan(left) & numpy.isnan(right)
+        with numpy.errstate(invalid='ignore'):
+            close = numpy.abs(left - right) <= abs_tol + rel_tol * numpy.maximum(numpy.abs(left), numpy.abs(right))
+        return numpy.flatnonzero(~(close | both_null)).tolist()
+    outside = []
+    for i, (a, b) in enumerate(zip(left, right)):
+        if math.isnan(a) or math.isnan(b):
+            if not (math.isnan(a) and math.isnan(b)):
+                outside.append(i)
+        elif abs(a - b) > abs_tol + rel_tol * max(abs(a), abs(b)):
+            outside.append(i)
+    return outside
+
+def _max_difference(left, right) -> float:
+    """Largest absolute difference between two float columns, ignoring NULLs"""
+    if numpy is not None:
+        differences = numpy.abs(left - right)
+        differences = differences[~numpy.isnan(differences)]
+        return float(differences.max()) if differences.size else 0.0
+    return max((abs(a - b) for a, b in zip(left, right) if not (math.isnan(a) or math.isnan(b))), default=0.0)
+
+@dataclass
+class ResultComparison:
+    """Outcome of compare_results"""
+    matches: bool
+    rows: Tuple[int, int]
+    reason: Optional[str] = None
+    # Column -> number of rows outside tolerance (numeric) or different (text)
+    mismatched: Dict[str, int] = field(default_factory=dict)
+    # Column -> largest absolute difference seen in a numeric column
+    max_difference: Dict[str, float] = field(default_factory=dict)
+    # (sorted row position, column, left value, right value) of the first differences
+    examples: List[Tuple[int, str, object, object]] = field(default_factory=list)
+
+def compare_results(left: ColumnarResult, right: ColumnarResult, key_columns: Optional[List[str]] = None,
+                    rel_tol: float = 1e-6, abs_tol: float = 1e-6, sample: int = 10) -> ResultComparison:
+    """
+    Compare two results as multisets of rows: both are sorted on key_columns (default: every
+    text or whole-number column), text columns must be equal and numeric columns within
+    tolerance. A column numeric on one side only is compared as text.
+    """
+    rows = (left.rows, right.rows)
+    if left.columns != right.columns:
+        return ResultComparison(False, rows, f"columns differ: {left.columns} vs {right.columns}")
+    if left.rows != right.rows:
+        return ResultComparison(False, rows, f"row counts differ: {left.rows} vs {right.rows}")
+
+    numeric = [column for column in left.columns if left.is_numeric(column) and right.is_numeric(column)]
+    # Columns are retyped on shallow copies; the caller's results keep their data
+    left, right = (ColumnarResult(result.columns, dict(result.data), result.rows) for result in (left, right))
+    for result in (left, right):
+        for column in left.columns:
+            if column not in numeric and result.is_numeric(column):
+                result.data[column] = ['' if math.isnan(value) else repr(float(value)) for value in result.data[column]]
+    if key_columns is None:
+        # Text and whole-number columns (ids, years, counts) identify rows; they carry no float noise
+        key_columns = [column for column in left.columns if column not in numeric
+                       or (_is_integral(left.data[column]) and _is_integral(right.data[column]))]
+    keys = key_columns
+    left_order, right_order = _sort_order(left, keys), _sort_order(right, keys)
+
+    comparison = ResultComparison(True, rows)
+    for column in left.columns:
+        left_values, right_values = _take(left.data[column], left_order), _take(right.data[column], right_order)
+        if column in numeric:
+            outside = _outside_tolerance(left_values, right_values, rel_tol, abs_tol)
+            comparison.max_difference[column] = _max_difference(left_values, right_values)
+        elif numpy is not None:
+            outside = numpy.flatnonzero(left_values != right_values).tolist()
+        else:
+            outside = [i for i, (a, b) in enumerate(zip(left_values, right_values)) if a != b]
+        if outside:
+            comparison.matches = False
+            comparison.mismatched[column] = len(outside)
+            for i in outside[:max(0, sample - len(comparison.examples))]:
+                comparison.examples.append((i, column, _plain(left_values[i]), _plain(right_values[i])))
+    return comparison
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Script to check that migrated cards return the same rows on StarRocks as on Exasol
+"digest" mode runs the original Exasol query of each card (from the cached inspection)
+and the migrated StarRocks query through Metabase's CSV export. Rows are hashed as they
+stream in and folded into order-insensitive multiset digests, so neither result set
+is held in memory. Only for cards whose digests disagree are both results loaded into
+typed columns and compared with numeric tolerances, then diffed row by row.
+"fingerprint" mode wraps both queries in one aggregate probe each (row count and
+SUM/MIN/MAX/approximate distinct count of every numeric column), so only two rows
+leave the databases; the aggregates are compared with relative tolerances.
+"""
+
+import contextlib
+import csv
+import hashlib
+import json
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import METABASE_CONFIG, MIGRATION_SETTINGS
+from metabase_migrator import MetabaseMigrator, MetabaseConfig
+from migrate_dashboard import load_migration_mapping, log_timing, TYPE_FAMILIES
+from result_compare import column_order, load_columns, compare_results
+
+# "digest" compares full results, "fingerprint" only aggregate probes
+MODE = "digest"
+# Dashboards to check
+DASHBOARD_IDS = [421]
+
+# Row hashes are 128-bit and summed modulo 2**128: the sum does not depend on row order
+DIGEST_MODULUS = 2 ** 128
+TIMESTAMP_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}(?::\d{2})?)(\.\d+)?(?:Z|[+-]00:?00)?$')
+
+# (header, rows) of one query result, rows being lists of CSV values
+RowSource = Tuple[List[str], Iterable[List[str]]]
+
+def normalize_value(value: str, decimal_places: int = 6) -> str:
+    """Engine-neutral text of one CSV value: numbers rounded, timestamps without T/Z, booleans lowercased"""
+    value = value.strip()
+    if not value:
+        return value
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is not None and number.is_finite():
+        try:
+            number = round(number, decimal_places)
+        except InvalidOperation:
+            pass
+        number = number.normalize()
+        return '0' if number.is_zero() else format(number, 'f')
+    match = TIMESTAMP_PATTERN.match(value)
+    if match:
+        date, time_of_day, fraction = match.groups()
+        fraction = (fraction or '').rstrip('0').rstrip('.')
+        return f"{date} {time_of_day}{fraction}"
+    if value.lower() in ('true', 'false'):
+        return value.lower()
+    return value
+
+def row_hash(values: Iterable[str]) -> int:
+    return int.from_bytes(hashlib.blake2b('\x1f'.join(values).encode(), digest_size=16).digest(), 'big')
+
+class MultisetDigest:
+    """Order-insensitive digest of a multiset of rows: the row count and the sum of the row hashes"""
+
+    def __init__(self):
+        self.rows = 0
+        self.total = 0
+
+    def add(self, row_digest: int):
+        self.rows += 1
+        self.total = (self.total + row_digest) % DIGEST_MODULUS
+
+    def __eq__(self, other):
+        return isinstance(other, MultisetDigest) and (self.rows, self.total) == (other.rows, other.total)
+
+    def hexdigest(self) -> str:
+        return f"{self.total:032x}"
+
+def fold_rows(header: List[str], rows: Iterable[List[str]], decimal_places: int = 6) -> Tuple[List[str], MultisetDigest]:
+    """Column names and multiset digest of a result, reading the rows once"""
+    columns, positions = column_order(header)
+    digest = MultisetDigest()
+    for row in rows:
+        digest.add(row_hash(normalize_value(row[i], decimal_places) for i in positions))
+    return columns, digest
+
+def iter_text_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Lines of streamed text with their line endings, which csv.reader needs for quoted newlines"""
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if pending:
+        yield pending
+
+@contextlib.contextmanager
+def export_rows(migrator: MetabaseMigrator, dataset_query: Dict) -> Iterator[RowSource]:
+    """
+    Stream a query result from POST /api/dataset/csv as (header, row iterator), holding the
+    query's database slot meanwhile. Raises RuntimeError when the query fails.
+    """
+    with migrator.database_slot(dataset_query.get('database')):
+        response = migrator.thread_session().post(
+            f"{migrator.config.base_url}/api/dataset/csv",
+            headers={"X-Metabase-Session": migrator.session_token},
+            data={"query": json.dumps(dataset_query), "format_rows": "false"},
+            stream=True
+        )
+        try:
+            # Failed exports come back as JSON instead of CSV
+            if response.status_code not in [200, 202] or 'json' in response.headers.get('Content-Type', ''):
+                raise RuntimeError(f"query failed: {response.status_code} {response.text[:300]}")
+            response.encoding = 'utf-8-sig'
+            reader = csv.reader(iter_text_lines(response.iter_content(chunk_size=65536, decode_unicode=True)))
+            yield next(reader, []), reader
+        finally:
+            response.close()
+
+def diff_rows(source: Callable[[], ContextManager[RowSource]], target: Callable[[], ContextManager[RowSource]],
+              decimal_places: int = 6, max_rows: int = 100000, sample: int = 10) -> Optional[Dict[str, Dict]]:
+    """
+    Rows returned by only one side, as {"exasol": {...}, "starrocks": {...}} with the number
+    of extra rows and up to `sample` examples each, plus the (sorted) column names of the
+    examples; None when a side has more than max_rows rows.
+    source and target open the two results one after the other.
+    """
+    counts = Counter()
+    examples = {}
+    columns = None
+    for sign, open_rows in ((1, source), (-1, target)):
+        with open_rows() as (header, rows):
+            side_columns, positions = column_order(header)
+            columns = columns or side_columns
+            for index, row in enumerate(rows):
+                if index >= max_rows:
+                    return None
+                values = tuple(normalize_value(row[i], decimal_places) for i in positions)
+                key = row_hash(values)
+                counts[key] += sign
+                examples.setdefault(key, values)
+    diff = {"columns": columns}
+    for side, sign in (("exasol", 1), ("starrocks", -1)):
+        extra = [(key, count * sign) for key, count in counts.items() if count * sign > 0]
+        diff[side] = {
+            "rows": sum(count for _, count in extra),
+            "examples": [examples[key] for key, _ in extra[:sample]]
+        }
+    return diff
+
+def migrated_card(question_id: int, source_card: Dict, migrator: MetabaseMigrator,
+                  migration_mapping: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """The live migrated card to compare source_card with, or None and the reason to skip it"""
+    databases = migration_mapping['database_mapping']
+    source_database = source_card.get('dataset_query', {}).get('database')
+    if source_database != databases['exasol']:
+        return None, f"inspection query runs on database {source_database}, not Exasol"
+    card = migrator.get_card(question_id)
+    if (card or {}).get('dataset_query', {}).get('database') != databases['starrocks']:
+        return None, "card is not migrated to StarRocks"
+    return card, None
+
+def check_card_parity(question_id: int, question_name: str, source_card: Dict,
+                      migrator: MetabaseMigrator, migration_mapping: Dict) -> Dict:
+    """Compare the Exasol original of one card with its migrated StarRocks query"""
+    result = {"question_id": question_id, "question_name": question_name}
+    card, reason = migrated_card(question_id, source_card, migrator, migration_mapping)
+    if card is None:
+        return {**result, "status": "skipped", "reason": reason}
+    source_query, target_query = source_card['dataset_query'], card['dataset_query']
+
+    decimal_places = MIGRATION_SETTINGS.get("parity_decimal_places", 6)
+    try:
+        with export_rows(migrator, source_query) as (header, rows):
+            source_columns, source_digest = fold_rows(header, rows, decimal_places)
+        with export_rows(migrator, target_query) as (header, rows):
+            target_columns, target_digest = fold_rows(header, rows, decimal_places)
+    except Exception as e:
+        return {**result, "status": "error", "reason": str(e)}
+    result["rows"] = {"exasol": source_digest.rows, "starrocks": target_digest.rows}
+
+    if source_columns != target_columns:
+        return {**result, "status": "column_mismatch",
+                "reason": f"Exasol returns {source_columns}, StarRocks {target_columns}"}
+    if source_digest == target_digest:
+        return {**result, "status": "match"}
+
+    # Digests disagree, often only by float noise from the cast(... as float) rewrites: read
+    # both results again into typed columns and compare them with numeric tolerances
+    max_rows = MIGRATION_SETTINGS.get("parity_diff_max_rows", 100000)
+    sample = MIGRATION_SETTINGS.get("parity_diff_sample", 10)
+    if max(source_digest.rows, target_digest.rows) > max_rows:
+        return {**result, "status": "mismatch", "diff": None, "reason": f"more than {max_rows} rows, not diffed"}
+    try:
+        with export_rows(migrator, source_query) as (header, rows):
+            source_result = load_columns(header, rows, lambda value: normalize_value(value, decimal_places))
+        with export_rows(migrator, target_query) as (header, rows):
+            target_result = load_columns(header, rows, lambda value: normalize_value(value, decimal_places))
+    except Exception as e:
+        return {**result, "status": "mismatch", "diff": None, "reason": f"could not diff rows: {str(e)}"}
+    comparison = compare_results(
+        source_result, target_result,
+        rel_tol=MIGRATION_SETTINGS.get("parity_rel_tolerance", 1e-6),
+        abs_tol=MIGRATION_SETTINGS.get("parity_abs_tolerance", 1e-6),
+        sample=sample
+    )
+    result["comparison"] = comparison
+    if comparison.matches:
+        return {**result, "status": "match"}
+    result["diff"] = diff_rows(
+        lambda: contextlib.nullcontext(source_result.row_source()),
+        lambda: contextlib.nullcontext(target_result.row_source()),
+        decimal_places, max_rows, sample
+    )
+    return {**result, "status": "mismatch"}
+
+# Aggregates of the probe per numeric column, by dialect; distinct counts are approximate
+FINGERPRINT_AGGREGATES = {
+    "exasol": {"sum": "SUM({})", "min": "MIN({})", "max": "MAX({})", "distinct": "APPROXIMATE_COUNT_DISTINCT({})"},
+    "starrocks": {"sum": "SUM({})", "min": "MIN({})", "max": "MAX({})", "distinct": "APPROX_COUNT_DISTINCT({})"},
+}
+IDENTIFIER_QUOTES = {"exasol": '"{}"', "starrocks": '`{}`'}
+
+def numeric_columns(source_metadata: List[Dict], target_metadata: List[Dict]) -> List[Tuple[str, str]]:
+    """(Exasol name, StarRocks name) of the columns both result_metadata report as numeric"""
+    def numeric(metadata):
+        return {col.get('name', '').lower(): col.get('name') for col in metadata or []
+                if TYPE_FAMILIES.get(col.get('base_type')) == "number"}
+    source, target = numeric(source_metadata), numeric(target_metadata)
+    return [(source[name], target[name]) for name in sorted(source) if name in target]
+
+def fingerprint_query(dataset_query: Dict, columns: List[str], dialect: str) -> Dict:
+    """
+    dataset_query with its SQL wrapped in one aggregate probe: the row count, then
+    sum, min, max and distinct for each column, in that order. Template tags are kept.
+    """
+    quote, aggregates = IDENTIFIER_QUOTES[dialect], FINGERPRINT_AGGREGATES[dialect]
+    expressions = ["COUNT(*)"] + [
+        template.format(quote.format(column)) for column in columns for template in aggregates.values()
+    ]
+    sql = dataset_query.get('native', {}).get('query', '').strip().rstrip(';')
+    # The newline keeps a trailing -- comment from swallowing the closing parenthesis
+    probe = f"SELECT {', '.join(expressions)} FROM (\n{sql}\n) fingerprint_source"
+    return {**dataset_query, "native": {**dataset_query.get('native', {}), "query": probe}}
+
+def run_probe(migrator: MetabaseMigrator, dataset_query: Dict) -> List:
+    """The single row a fingerprint probe returns; raises RuntimeError when the query fails"""
+    with migrator.database_slot(dataset_query.get('database')):
+        response = migrator.thread_session().post(
+            f"{migrator.config.base_url}/api/dataset",
+            headers={"X-Metabase-Session": migrator.session_token, "Content-Type": "application/json"},
+            json=dataset_query
+        )
+    if response.status_code not in [200, 202]:
+        raise RuntimeError(f"probe failed: {response.status_code} {response.text[:300]}")
+    result = response.json()
+    data = result.get('data') or {}
+    error = result.get('error') or data.get('error')
+    if error or not data.get('rows'):
+        raise RuntimeError(f"probe failed: {error or 'no rows returned'}")
+    return data['rows'][0]
+
+def within_tolerance(expected, actual, tolerance: float, abs_tolerance: float = 0.0) -> bool:
+    """Equal NULLs, or numbers within max(abs_tolerance, tolerance * max(|expected|, |actual|))"""
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    try:
+        expected, actual = float(expected), float(actual)
+    except (TypeError, ValueError):
+        return expected == actual
+    return abs(expected - actual) <= max(abs_tolerance, tolerance * max(abs(expected), abs(actual)))
+
+def compare_fingerprints(columns: List[str], source: List, target: List,
+                         tolerances: Optional[Dict[str, float]] = None,
+                         abs_tolerance: Optional[float] = None) -> List[str]:
+    """
+    Aggregates of two probe rows that differ by more than their relative tolerance, or than
+    abs_tolerance near zero; empty if none. Rows of the wrong length are a mismatch.
+    """
+    tolerances = tolerances or MIGRATION_SETTINGS.get("parity_tolerances", {})
+    if abs_tolerance is None:
+        abs_tolerance = MIGRATION_SETTINGS.get("parity_abs_tolerance", 1e-6)
+    labels = [("row count", "row_count")] + [
+        (f"{aggregate.upper()}({column})", aggregate)
+        for column in columns for aggregate in FINGERPRINT_AGGREGATES["exasol"]
+    ]
+    if not len(source) == len(target) == len(labels):
+        return [f"probe returned {len(source)} values on Exasol and {len(target)} on StarRocks, "
+                f"expected {len(labels)}"]
+    problems = []
+    for (label, aggregate), expected, actual in zip(labels, source, target):
+        if not within_tolerance(expected, actual, tolerances.get(aggregate, 0.0), abs_tolerance):
+            problems.append(f"{label}: Exasol {expected}, StarRocks {actual}")
+    return problems
+
+def check_card_fingerprint(question_id: int, question_name: str, source_card: Dict,
+                           migrator: MetabaseMigrator, migration_mapping: Dict) -> Dict:
+    """Compare aggregate probes of the Exasol original and the migrated StarRocks query of one card"""
+    result = {"question_id": question_id, "question_name": question_name}
+    card, reason = migrated_card(question_id, source_card, migrator, migration_mapping)
+    if card is None:
+        return {**result, "status": "skipped", "reason": reason}
+    columns = numeric_columns(source_card.get('result_metadata'), card.get('result_metadata'))
+    try:
+        source = run_probe(migrator, fingerprint_query(
+            source_card['dataset_query'], [exasol for exasol, _ in columns], "exasol"))
+        target = run_probe(migrator, fingerprint_query(
+            card['dataset_query'], [starrocks for _, starrocks in columns], "starrocks"))
+    except Exception as e:
+        return {**result, "status": "error", "reason": str(e)}
+    result["rows"] = {"exasol": source[0], "starrocks": target[0]}
+    result["columns"] = [exasol.lower() for exasol, _ in columns]
+    problems = compare_fingerprints(result["columns"], source, target)
+    if problems:
+        return {**result, "status": "mismatch", "differences": problems}
+    return {**result, "status": "match"}
+
+def dashboard_source_cards(dashboard_data: Dict) -> Dict[int, Dict]:
+    """Native cards of a dashboard inspection by id, in dashcard order"""
+    cards = {}
+    for dashcard in dashboard_data.get('dashcards', []):
+        card = dashcard.get('card') or {}
+        if card.get('id') and card.get('dataset_query', {}).get('type') == 'native':
+            cards.setdefault(card['id'], card)
+    return cards
+
+def check_dashboard_parity(dashboard_id: int, migrator: MetabaseMigrator, migration_mapping: Dict,
+                           workers: Optional[int] = None, mode: str = "digest") -> Optional[List[Dict]]:
+    """
+    Parity result of every native card, in dashcard order, by full-result digests or, with
+    mode "fingerprint", by aggregate probes. The Exasol originals come from the cached
+    inspection; returns None when there is none.
+    """
+    check = check_card_fingerprint if mode == "fingerprint" else check_card_parity
+    try:
+        with open(f'inspections/dashboard_{dashboard_id}_inspection.json', 'r') as f:
+            dashboard_data = json.load(f)
+    except FileNotFoundError:
+        return None
+    cards = dashboard_source_cards(dashboard_data)
+    workers = workers or MIGRATION_SETTINGS.get("parity_workers", 4)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(cards) or 1))) as executor:
+        return list(executor.map(
+            lambda card: check(card['id'], card.get('name', 'Unknown'), card, migrator, migration_mapping),
+            cards.values()
+        ))
+
+def print_parity_report(dashboard_id: int, results: List[Dict]):
+    print(f"\n📊 Dashboard {dashboard_id}")
+    for result in results:
+        label = f"Question {result['question_id']} ({result['question_name']})"
+        rows = result.get("rows", {})
+        status = result["status"]
+        if status == "match" and "columns" in result:
+            print(f"  ✅ {label}: fingerprints match ({rows['exasol']} rows, {len(result['columns'])} numeric columns)")
+        elif status == "match" and "comparison" in result:
+            largest = max(result["comparison"].max_difference.values(), default=0.0)
+            print(f"  ✅ {label}: {rows['exasol']} rows match within tolerance (largest difference {largest:.3g})")
+        elif status == "match":
+            print(f"  ✅ {label}: {rows['exasol']} rows match")
+        elif status == "mismatch" and "differences" in result:
+            print(f"  ❌ {label}: fingerprints differ")
+            for difference in result["differences"]:
+                print(f"    🔸 {difference}")
+        elif status == "mismatch":
+            print(f"  ❌ {label}: results differ (Exasol {rows['exasol']} rows, StarRocks {rows['starrocks']} rows)")
+            diff = result.get("diff")
+            if diff is None:
+                print(f"    ⚠️  {result.get('reason', 'too many rows to diff')}")
+                continue
+            comparison = result["comparison"]
+            if comparison.reason:
+                print(f"    🔸 {comparison.reason}")
+            for column, count in comparison.mismatched.items():
+                print(f"    🔸 Column {column}: {count} rows differ beyond tolerance")
+            print(f"    📝 Columns: {diff['columns']}")
+            for side in ("exasol", "starrocks"):
+                if diff[side]["rows"]:
+                    print(f"    🔸 Only in {'Exasol' if side == 'exasol' else 'StarRocks'}: {diff[side]['rows']} rows")
+                    for example in diff[side]["examples"]:
+                        print(f"       {list(example)}")
+        elif status == "column_mismatch":
+            print(f"  ❌ {label}: {result['reason']}")
+        elif status == "error":
+            print(f"  ⚠️  {label}: {result['reason']}")
+        else:
+            print(f"  ⏭️  {label}: {result['reason']}")
+
+def main():
+    """Main function"""
+    start = time.time()
+
+    print(f"⚖️  Result parity between Exasol and StarRocks ({MODE} mode)")
+    print("=" * 60)
+
+    migration_mapping = load_migration_mapping()
+    if not migration_mapping:
+        return
+
+    migrator = MetabaseMigrator(MetabaseConfig(
+        base_url=METABASE_CONFIG["base_url"],
+        username=METABASE_CONFIG["username"],
+        password=METABASE_CONFIG["password"]
+    ))
+    if not migrator.authenticate():
+        print("❌ Authentication failed")
+        return
+
+    statuses = Counter()
+    for dashboard_id in DASHBOARD_IDS:
+        results = check_dashboard_parity(dashboard_id, migrator, migration_mapping, mode=MODE)
+        if results is None:
+            print(f"\n⚠️  Dashboard {dashboard_id}: no cached inspection with the Exasol originals")
+            continue
+        print_parity_report(dashboard_id, results)
+        statuses.update(result["status"] for result in results)
+
+    print(f"\n📊 {statuses['match']} cards match, {statuses['mismatch'] + statuses['column_mismatch']} differ, "
+          f"{statuses['error']} failed, {statuses['skipped']} skipped")
+    log_timing(start, "Result parity")
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,103 @@ SQL Converter for Exasol to StarRocks migration
 Handles complex SQL syntax conversions while preserving Metabase variables
 """
 
+import os
 import re
+import sys
+import hashlib
 import logging
-from typing import List, Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import List, Dict, Tuple, Optional, Mapping, Pattern, Iterable
 from config import DATABASE_MAPPINGS, FUNCTION_MAPPINGS, EXASOL_PATTERNS, STARROCKS_REPLACEMENTS
+from conversion_cache import ConversionCache, fingerprint, module_fingerprint, normalize_sql
 
 logger = logging.getLogger(__name__)
 
+VARIABLE_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
+# [DB.]SCHEMA.TABLE candidates; the rule table decides which ones are mapped
+QUALIFIED_NAME_PATTERN = re.compile(r'\b(?:(?P<db>\w+)\.)?(?P<schema>\w+)\.(?P<table>\w+)\b')
+
+@dataclass(frozen=True)
+class ConversionRules:
+    """Compiled rule table: one combined alternation per rule family plus its dispatch dict"""
+    version: str
+    table_targets: Mapping[Tuple[str, str], Tuple[str, str]]
+    function_pattern: Optional[Pattern]
+    function_targets: Mapping[str, str]
+    median_pattern: Optional[Pattern]
+    limit_offset_pattern: Pattern
+    top_pattern: Pattern
+    date_literal_pattern: Pattern
+
+def _alternation(names: List[str]) -> str:
+    """Regex alternation of literal names, longest first so prefixes never shadow longer names"""
+    return '|'.join(re.escape(name) for name in sorted(set(names), key=len, reverse=True))
+
+def compile_rules(database_mappings, function_mappings: Dict[str, str]) -> ConversionRules:
+    """Compile database and function mappings into a frozen rule table"""
+    # Table references: (schema, table) -> (exasol db, starrocks db.table), all case-folded keys.
+    # Looking names up in a dict keeps the cost per reference flat however many tables are mapped.
+    table_targets = {}
+    for mapping in database_mappings:
+        key = (mapping.exasol_schema.lower(), mapping.exasol_table.lower())
+        table_targets.setdefault(key, (
+            mapping.exasol_db.lower(),
+            f"{mapping.starrocks_db}.{mapping.starrocks_table}"
+        ))
+    
+    # Function names: NAME( -> REPLACEMENT( ; MEDIAN needs its own rewrite
+    function_targets = {
+        name.upper(): replacement
+        for name, replacement in function_mappings.items()
+        if name.upper() != "MEDIAN"
+    }
+    function_pattern = None
+    if function_targets:
+        function_pattern = re.compile(rf'\b(?P<func>{_alternation(list(function_targets))})\s*\(', re.IGNORECASE)
+    median_pattern = None
+    if any(name.upper() == "MEDIAN" for name in function_mappings):
+        median_pattern = re.compile(r'\bMEDIAN\s*\(\s*([^)]+)\s*\)', re.IGNORECASE)
+    
+    # Rule set version: changes whenever any mapping or pattern changes
+    fingerprint = hashlib.sha256()
+    for key in sorted(table_targets):
+        fingerprint.update(f"T|{'.'.join(key)}|{'|'.join(table_targets[key])}\n".encode())
+    for name in sorted(function_mappings):
+        fingerprint.update(f"F|{name}|{function_mappings[name]}\n".encode())
+    for name in sorted(EXASOL_PATTERNS):
+        fingerprint.update(f"P|{name}|{EXASOL_PATTERNS[name]}|{STARROCKS_REPLACEMENTS.get(name)}\n".encode())
+    
+    return ConversionRules(
+        version=fingerprint.hexdigest()[:16],
+        table_targets=MappingProxyType(table_targets),
+        function_pattern=function_pattern,
+        function_targets=MappingProxyType(function_targets),
+        median_pattern=median_pattern,
+        limit_offset_pattern=re.compile(EXASOL_PATTERNS["limit_offset"], re.IGNORECASE),
+        top_pattern=re.compile(EXASOL_PATTERNS["top_syntax"], re.IGNORECASE),
+        date_literal_pattern=re.compile(r"DATE\s+'([^']+)'", re.IGNORECASE)
+    )
+
 class SQLConverter:
-    def __init__(self):
+    CACHE_NAMESPACE = "sql_converter"
+    
+    def __init__(self, cache: Optional[ConversionCache] = None):
         self.database_mappings = DATABASE_MAPPINGS
         self.function_mappings = FUNCTION_MAPPINGS
+        self.cache = cache
+        self.rebuild()
+    
+    def rebuild(self):
+        """
+        Recompile the rule table; call after changing database_mappings or function_mappings
+        """
+        self.rules = compile_rules(self.database_mappings, self.function_mappings)
+        # Cache entries are only valid for this rule table, the mapping files and this module's code
+        self.cache_fingerprint = fingerprint(self.rules.version, module_fingerprint(sys.modules[__name__]))
+        if self.cache is not None:
+            self.cache.purge_stale(self.CACHE_NAMESPACE, self.cache_fingerprint)
         
     def convert_sql(self, sql: str) -> str:
         """
@@ -21,7 +107,21 @@ class SQLConverter:
         """
         if not sql:
             return sql
-            
+        sql = normalize_sql(sql)
+        
+        if self.cache is not None:
+            cached = self.cache.get(self.CACHE_NAMESPACE, self.cache_fingerprint, sql)
+            if cached is not None:
+                return cached[0]
+            final_sql = self._convert_sql(sql)
+            self.cache.put(self.CACHE_NAMESPACE, self.cache_fingerprint, sql, final_sql)
+            return final_sql
+        return self._convert_sql(sql)
+    
+    def _convert_sql(self, sql: str) -> str:
+        """
+        Run the conversion steps without consulting the cache
+        """
         logger.info("Starting SQL conversion from Exasol to StarRocks")
         
         # Step 1: Protect Metabase variables
@@ -50,7 +150,7 @@ class SQLConverter:
         protected_sql = sql
         
         # Find all Metabase variables {{variable_name}}
-        variables = re.findall(r'\{\{([^}]+)\}\}', sql)
+        variables = VARIABLE_PATTERN.findall(sql)
         
         for i, variable in enumerate(variables):
             placeholder = f"__METABASE_VAR_{i}__"
@@ -69,45 +169,55 @@ class SQLConverter:
         
         return restored_sql
     
+    def _table_replacement(self, match) -> Optional[str]:
+        """
+        StarRocks name for a QUALIFIED_NAME_PATTERN match, or None if it is not a mapped table
+        """
+        targets = self.rules.table_targets
+        db, schema, table = match.group('db'), match.group('schema'), match.group('table')
+        target = targets.get((schema.lower(), table.lower()))
+        if target:
+            # SCHEMA.TABLE or DB.SCHEMA.TABLE; keep a prefix that is not the mapped database
+            exasol_db, starrocks_table = target
+            if db and db.lower() != exasol_db:
+                return f"{db}.{starrocks_table}"
+            return starrocks_table
+        if db:
+            # SCHEMA.TABLE.COLUMN
+            target = targets.get((db.lower(), schema.lower()))
+            if target:
+                return f"{target[1]}.{table}"
+        return None
+    
     def _convert_table_references(self, sql: str) -> str:
         """
         Convert table references from Exasol format to StarRocks format
         """
-        converted_sql = sql
+        if not self.rules.table_targets:
+            return sql
         
-        for mapping in self.database_mappings:
-            # Pattern for Exasol: SCHEMA.TABLE or DB.SCHEMA.TABLE
-            exasol_patterns = [
-                rf'\b{mapping.exasol_schema}\.{mapping.exasol_table}\b',
-                rf'\b{mapping.exasol_db}\.{mapping.exasol_schema}\.{mapping.exasol_table}\b'
-            ]
-            
-            for pattern in exasol_patterns:
-                converted_sql = re.sub(
-                    pattern,
-                    f"{mapping.starrocks_db}.{mapping.starrocks_table}",
-                    converted_sql,
-                    flags=re.IGNORECASE
-                )
+        def replace_table(match):
+            return self._table_replacement(match) or match.group(0)
         
-        return converted_sql
+        return QUALIFIED_NAME_PATTERN.sub(replace_table, sql)
     
     def _convert_functions(self, sql: str) -> str:
         """
         Convert Exasol-specific functions to StarRocks equivalents
         """
+        rules = self.rules
         converted_sql = sql
         
         # Convert function names
-        for exasol_func, starrocks_func in self.function_mappings.items():
-            # Handle special cases
-            if exasol_func == "MEDIAN":
-                # MEDIAN is more complex - needs special handling
-                converted_sql = self._convert_median_function(converted_sql)
-            else:
-                # Simple function name replacement
-                pattern = rf'\b{re.escape(exasol_func)}\s*\('
-                converted_sql = re.sub(pattern, f"{starrocks_func}(", converted_sql, flags=re.IGNORECASE)
+        if rules.function_pattern is not None:
+            converted_sql = rules.function_pattern.sub(
+                lambda match: f"{rules.function_targets[match.group('func').upper()]}(",
+                converted_sql
+            )
+        
+        # MEDIAN is more complex - needs special handling
+        if rules.median_pattern is not None:
+            converted_sql = self._convert_median_function(converted_sql)
         
         return converted_sql
     
@@ -115,14 +225,11 @@ class SQLConverter:
         """
         Convert Exasol MEDIAN function to StarRocks equivalent
         """
-        # Pattern to match MEDIAN(column) or MEDIAN(expression)
-        median_pattern = r'\bMEDIAN\s*\(\s*([^)]+)\s*\)'
-        
         def replace_median(match):
             column_expr = match.group(1).strip()
             return f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY {column_expr})"
         
-        return re.sub(median_pattern, replace_median, sql, flags=re.IGNORECASE)
+        return self.rules.median_pattern.sub(replace_median, sql)
     
     def _convert_syntax_patterns(self, sql: str) -> str:
         """
@@ -131,19 +238,15 @@ class SQLConverter:
         converted_sql = sql
         
         # Convert LIMIT OFFSET syntax
-        converted_sql = re.sub(
-            EXASOL_PATTERNS["limit_offset"],
+        converted_sql = self.rules.limit_offset_pattern.sub(
             STARROCKS_REPLACEMENTS["limit_offset"],
-            converted_sql,
-            flags=re.IGNORECASE
+            converted_sql
         )
         
         # Convert TOP syntax to LIMIT
-        converted_sql = re.sub(
-            EXASOL_PATTERNS["top_syntax"],
+        converted_sql = self.rules.top_pattern.sub(
             STARROCKS_REPLACEMENTS["top_syntax"],
-            converted_sql,
-            flags=re.IGNORECASE
+            converted_sql
         )
         
         # Handle Exasol's specific date literals
@@ -160,8 +263,7 @@ class SQLConverter:
         """
         # Convert Exasol date format to StarRocks
         # Exasol: DATE '2023-01-01' -> StarRocks: '2023-01-01'
-        date_pattern = r"DATE\s+'([^']+)'"
-        return re.sub(date_pattern, r"'\1'", sql, flags=re.IGNORECASE)
+        return self.rules.date_literal_pattern.sub(r"'\1'", sql)
     
     def _convert_string_literals(self, sql: str) -> str:
         """
@@ -175,7 +277,7 @@ class SQLConverter:
         """
         Extract Metabase variables from SQL
         """
-        variables = re.findall(r'\{\{([^}]+)\}\}', sql)
+        variables = VARIABLE_PATTERN.findall(sql)
         return list(set(variables))  # Remove duplicates
     
     def validate_conversion(self, original_sql: str, converted_sql: str) -> Dict[str, any]:
@@ -200,30 +302,97 @@ class SQLConverter:
             validation_result["warnings"].append("Some Metabase variables may have been modified")
         
         # Count table conversions
-        for mapping in self.database_mappings:
-            original_count = len(re.findall(
-                rf'\b{mapping.exasol_schema}\.{mapping.exasol_table}\b',
-                original_sql,
-                flags=re.IGNORECASE
-            ))
-            if original_count > 0:
-                validation_result["tables_converted"] += original_count
-        
-        # Count function conversions
-        for exasol_func in self.function_mappings.keys():
-            if exasol_func != "MEDIAN":  # Skip MEDIAN as it's handled specially
-                count = len(re.findall(
-                    rf'\b{re.escape(exasol_func)}\s*\(',
-                    original_sql,
-                    flags=re.IGNORECASE
-                ))
-                validation_result["functions_converted"] += count
+        if self.rules.table_targets:
+            validation_result["tables_converted"] = sum(
+                1 for match in QUALIFIED_NAME_PATTERN.finditer(original_sql)
+                if self._table_replacement(match)
+            )
+        
+        # Count function conversions (MEDIAN is handled specially and not counted)
+        if self.rules.function_pattern is not None:
+            validation_result["functions_converted"] = sum(1 for _ in self.rules.function_pattern.finditer(original_sql))
         
         # Check for potential issues
         if "MEDIAN" in original_sql.upper():
             validation_result["warnings"].append("MEDIAN function conversion may need manual review")
         
         return validation_result
+    
+    def _convert_and_validate(self, sql: str) -> Tuple[str, Dict[str, any]]:
+        """
+        Convert one query and validate it; a failure is reported in the validation, not raised
+        """
+        try:
+            converted_sql = self._convert_sql(sql) if sql else sql
+            return converted_sql, self.validate_conversion(sql, converted_sql)
+        except Exception as e:
+            logger.error(f"Error converting SQL: {str(e)}")
+            return sql, {
+                "success": False,
+                "warnings": [],
+                "errors": [str(e)],
+                "variables_preserved": True,
+                "tables_converted": 0,
+                "functions_converted": 0
+            }
+    
+    def convert_many(self, sqls: Iterable[str], workers: Optional[int] = None,
+                     chunk_size: int = 64) -> List[Tuple[str, Dict[str, any]]]:
+        """
+        Convert a batch of queries, fanning chunks out over a process pool.
+        Returns (converted_sql, validation) pairs in input order.
+        Cached conversions are served from the parent; only misses go to the workers.
+        """
+        sqls = [normalize_sql(sql) if sql else sql for sql in sqls]
+        results: List[Optional[Tuple[str, Dict[str, any]]]] = [None] * len(sqls)
+        
+        pending = []
+        for index, sql in enumerate(sqls):
+            cached = None
+            if self.cache is not None and sql:
+                cached = self.cache.get(self.CACHE_NAMESPACE, self.cache_fingerprint, sql)
+            if cached is not None:
+                results[index] = (cached[0], self.validate_conversion(sql, cached[0]))
+            else:
+                pending.append(index)
+        
+        workers = workers or os.cpu_count() or 1
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        if workers > 1 and len(chunks) > 1:
+            logger.info(f"Converting {len(pending)} queries in {len(chunks)} chunks on {workers} processes")
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)),
+                initializer=_init_worker,
+                initargs=(self.database_mappings, self.function_mappings)
+            ) as executor:
+                converted_chunks = executor.map(_convert_chunk, [[sqls[i] for i in chunk] for chunk in chunks])
+                for chunk, converted in zip(chunks, converted_chunks):
+                    for index, result in zip(chunk, converted):
+                        results[index] = result
+        else:
+            for index in pending:
+                results[index] = self._convert_and_validate(sqls[index])
+        
+        if self.cache is not None:
+            for index in pending:
+                if sqls[index] and not results[index][1]["errors"]:
+                    self.cache.put(self.CACHE_NAMESPACE, self.cache_fingerprint, sqls[index], results[index][0])
+        return results
+
+# Converter owned by each convert_many worker process
+_worker_converter: Optional[SQLConverter] = None
+
+def _init_worker(database_mappings, function_mappings):
+    """Build the worker's converter once, from the parent's mappings"""
+    global _worker_converter
+    _worker_converter = SQLConverter()
+    _worker_converter.database_mappings = database_mappings
+    _worker_converter.function_mappings = function_mappings
+    _worker_converter.rebuild()
+
+def _convert_chunk(chunk: List[str]) -> List[Tuple[str, Dict[str, any]]]:
+    """Convert and validate one chunk of queries inside a worker process"""
+    return [_worker_converter._convert_and_validate(sql) for sql in chunk]
 
 # Example usage and testing
 def test_conversion():
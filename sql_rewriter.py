@@ -0,0 +1,437 @@
+"""
+Single-pass rewrite engine for StarRocks compatibility fixes
+Lexes Exasol SQL once and applies table, function and identifier rewrites in one traversal.
+
+Unlike the former chain of re.sub passes, function arguments are matched by balanced
+parentheses, and string literals, comments and {{template}} tags are never rewritten.
+"""
+
+import functools
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# One alternative per token kind. String literals, comments and Metabase
+# template tags are single tokens so nothing inside them is ever rewritten.
+# The kind of a token is recovered from its first character (see _is_word).
+TOKEN_PATTERN = re.compile(r"""
+    \s+                            # whitespace
+  | --[^\n]* | /\*.*?(?:\*/|\Z)     # comments
+  | '(?:[^']|'')*(?:'|\Z)          # string literal
+  | "(?:[^"]|"")*(?:"|\Z)          # quoted identifier
+  | \{\{.*?\}\}                     # template tag
+  | \d+(?:\.\d+)?                   # number
+  | [^\W\d]\w*                      # word
+  | .                               # punctuation
+""", re.S | re.X)
+
+# Clause keywords that may directly follow a derived table; anything else
+# after the closing parenthesis is treated as an existing alias
+CLAUSE_KEYWORDS = frozenset([
+    'where', 'group', 'order', 'having', 'limit', 'union', 'intersect', 'except',
+    'minus', 'join', 'inner', 'left', 'right', 'full', 'cross', 'natural', 'on',
+    'window', 'qualify', 'connect', 'offset', 'into', 'with',
+])
+
+SELECT_STAR_PATTERN = re.compile(r'\s*select\s+\*\s+from\s', re.IGNORECASE)
+GRANULARITY_FIELD_PATTERN = re.compile(r'[a-zA-Z_]+\.granularity', re.IGNORECASE)
+JSON_PATH_PATTERN = re.compile(r'[\'"]([^\'"]+)[\'"]')
+BIGINT_20_PATTERN = re.compile(r'bigint\s*\(\s*20\s*\)', re.IGNORECASE)
+CAST_PREFIX_PATTERN = re.compile(r'cast\s*\(', re.IGNORECASE)
+TABLE_MARKER_PATTERN = re.compile('\x00(\\d+)\x00')
+
+# Plain renames: the argument list is kept verbatim
+RENAMED_FUNCTIONS = {
+    'convert': 'cast',
+    'to_char': 'char',
+    'to_date': 'date',
+    'listagg': 'group_concat',
+}
+
+
+class _Frame:
+    """An open parenthesis: either a function call or a plain group"""
+    __slots__ = ('name', 'head', 'prefix', 'args', 'out', 'sig1', 'sig2', 'after_from')
+
+    def __init__(self, name: Optional[str], head: str, after_from: bool = False, prefix: str = ''):
+        self.name = name
+        self.head = head
+        # Source consumed after the parenthesis but kept out of the arguments
+        self.prefix = prefix
+        self.out: List[str] = []
+        self.args: List[List[str]] = [self.out]
+        self.sig1 = ''
+        self.sig2 = ''
+        self.after_from = after_from
+
+    def render(self, args: Optional[List[str]] = None, closed: bool = True) -> str:
+        """Re-emit the parenthesis unchanged"""
+        if args is None:
+            args = [''.join(arg) for arg in self.args]
+        return f"{self.head}({self.prefix}{','.join(args)}{')' if closed else ''}"
+
+
+def tokenize(sql: str) -> List[str]:
+    """Split SQL into tokens; joining them gives back the input"""
+    return TOKEN_PATTERN.findall(sql)
+
+
+def _is_word(token: str) -> bool:
+    return token[0].isalpha() or token[0] == '_'
+
+
+def _next_significant(tokens: List[str], index: int) -> int:
+    """Index of the first non-whitespace token at or after index"""
+    while index < len(tokens) and tokens[index][0].isspace():
+        index += 1
+    return index
+
+
+def _match_words(tokens: List[str], index: int, words: Iterable[str]) -> int:
+    """Match a whitespace-separated keyword sequence; return the index after it or -1"""
+    for word in words:
+        index = _next_significant(tokens, index)
+        if index >= len(tokens) or tokens[index].lower() != word:
+            return -1
+        index += 1
+    return index
+
+
+def _nullif(args: List[str]) -> Optional[str]:
+    """NULLIF(value, 0) -> NULLIF(cast(value as float), 0); nullif(bigint(20)) -> ifnull(bigint(20), 0)"""
+    if len(args) == 1 and BIGINT_20_PATTERN.fullmatch(args[0].strip()):
+        return 'ifnull(bigint(20), 0)'
+    if len(args) == 2 and args[1].strip() == '0':
+        value = args[0].strip()
+        if not CAST_PREFIX_PATTERN.match(value):
+            return f"NULLIF(cast({value} as float), 0)"
+    return None
+
+
+def _rewrite_call(name: str, args: List[str], events: set) -> Optional[str]:
+    """Return the StarRocks replacement for a closed function call, or None to keep it"""
+    if name in RENAMED_FUNCTIONS:
+        events.add(name)
+        return f"{RENAMED_FUNCTIONS[name]}({','.join(args)})"
+
+    if name == 'nullifzero':
+        value = ','.join(args).strip()
+        return _nullif([value, ' 0']) or f"NULLIF({value}, 0)"
+
+    if name == 'nullif':
+        return _nullif(args)
+
+    if name == 'zeroifnull':
+        return f"ifnull({','.join(args).strip()}, 0)"
+
+    if name == 'median':
+        return f"PERCENTILE_CONT({','.join(args).strip()}, 0.5)"
+
+    if name == 'json_value' and len(args) == 2:
+        path = JSON_PATH_PATTERN.fullmatch(args[1].strip())
+        if path:
+            return f"parse_json({args[0].strip()})->'{path.group(1)}'"
+
+    if name == 'date_trunc' and len(args) == 2:
+        if GRANULARITY_FIELD_PATTERN.fullmatch(args[0].strip()):
+            return f"date_trunc({{{{granularity}}}}, {args[1].strip()})"
+
+    return None
+
+
+class TableMatcher:
+    """
+    Precomputed matcher for table_mapping: a two-level trie over case-folded
+    identifiers (schema -> table -> StarRocks table) plus an index of bare table
+    names. Build it once per run and reuse it for every question.
+    """
+
+    def __init__(self, table_mapping: Dict[str, str]):
+        self.table_mapping = table_mapping
+        self.size = len(table_mapping)
+        # Qualified names match case-insensitively on (schema, table)
+        self.qualified: Dict[str, Dict[str, str]] = {}
+        # Bare names keep the exact-case (UPPER/lower) semantics of the contextual pass
+        self.bare: Dict[str, List[str]] = {}
+        self.starrocks_tables = frozenset(table_mapping.values())
+        # Content hash of the mapping, used to key cached conversions
+        self.version = hashlib.sha256(
+            '\n'.join(f"{key}={value}" for key, value in sorted(table_mapping.items())).encode()
+        ).hexdigest()[:16]
+
+        for exasol_table, starrocks_table in table_mapping.items():
+            if '.' in exasol_table:
+                exasol_schema, exasol_name = exasol_table.split('.', 1)
+                self.qualified.setdefault(exasol_schema.lower(), {})[exasol_name.lower()] = starrocks_table
+            else:
+                exasol_name = exasol_table
+            for variant in (exasol_name.upper(), exasol_name.lower()):
+                self.bare.setdefault(variant, []).append(starrocks_table)
+
+    def lookup(self, schema: str, table: str) -> Optional[str]:
+        """StarRocks table for an Exasol schema.table reference, in any letter case"""
+        tables = self.qualified.get(schema.lower())
+        return tables.get(table.lower()) if tables else None
+
+
+_FROM_FUNCTIONS = frozenset(('extract', 'substring', 'trim', 'position', 'overlay'))
+
+
+def referenced_tables(sql: str) -> List[Tuple[str, str]]:
+    """
+    (schema, table) of every qualified table reference after FROM or JOIN, including
+    the comma-separated ones of `FROM a.b x, c.d y`; a comma list ends at a subquery
+    """
+    tokens = [token for token in tokenize(sql)
+              if not token[0].isspace() and not token.startswith(('--', '/*'))]
+    total = len(tokens)
+    references = []
+    # Function each open parenthesis belongs to; EXTRACT(YEAR FROM t.col) names no table
+    calls = []
+    for i in range(total):
+        if tokens[i] == '(':
+            calls.append(tokens[i - 1].lower() if i and _is_word(tokens[i - 1]) else '')
+        elif tokens[i] == ')' and calls:
+            calls.pop()
+        if tokens[i].lower() not in ('from', 'join') or (calls and calls[-1] in _FROM_FUNCTIONS):
+            continue
+        j = i + 1
+        while j < total and _is_word(tokens[j]):
+            if j + 2 < total and tokens[j + 1] == '.' and _is_word(tokens[j + 2]):
+                references.append((tokens[j], tokens[j + 2]))
+                j += 3
+            else:
+                j += 1
+            if tokens[i].lower() == 'join':
+                break
+            # Optional alias, then a comma continues the FROM list
+            if j < total and tokens[j].lower() == 'as':
+                j += 1
+            if j < total and _is_word(tokens[j]):
+                j += 1
+            if j >= total or tokens[j] != ',':
+                break
+            j += 1
+    return references
+
+
+@functools.lru_cache(maxsize=8)
+def _build_table_matcher(items: Tuple[Tuple[str, str], ...]) -> TableMatcher:
+    return TableMatcher(dict(items))
+
+
+def get_table_matcher(table_mapping: Dict[str, str]) -> TableMatcher:
+    """
+    Return the matcher for the current content of table_mapping, building it only on first use.
+    Keyed on the mapping items, so a value edited in place gets a new matcher (and version).
+    """
+    return _build_table_matcher(tuple(sorted(table_mapping.items())))
+
+
+def rewrite_sql_for_starrocks(sql: str, visualization_columns: Iterable[str],
+                              table_mapping) -> Tuple[str, List[str]]:
+    """
+    Apply every StarRocks compatibility rewrite in a single traversal of the token stream.
+    table_mapping is either the migration table_mapping dict or a prebuilt TableMatcher.
+    Returns the rewritten SQL and the log messages describing what changed.
+    """
+    if not isinstance(table_mapping, TableMatcher):
+        table_mapping = get_table_matcher(table_mapping)
+    qualified_tables = table_mapping.qualified
+    bare_tables = table_mapping.bare
+    starrocks_tables = table_mapping.starrocks_tables
+
+    recase = {col.lower(): col for col in visualization_columns if col}
+
+    tokens = tokenize(sql)
+    total = len(tokens)
+    messages: List[str] = []
+    replaced_tables: Dict[str, str] = {}
+    used_tables = set()
+    markers: List[Tuple[str, List[str]]] = []
+    events = set()
+
+    root = _Frame(None, '')
+    stack = [root]
+    frame = root
+    out = root.out
+    i = 0
+
+    while i < total:
+        text = tokens[i]
+        first = text[0]
+
+        if first.isspace() or (len(text) > 1 and text[:2] in ('--', '/*')):
+            out.append(text)
+            i += 1
+            continue
+
+        if first.isalpha() or first == '_':
+            lower = text.lower()
+            after = tokens[i + 1] if i + 1 < total else ''
+
+            # schema.table reference
+            if after == '.' and lower in qualified_tables and i + 2 < total and _is_word(tokens[i + 2]):
+                starrocks_table = qualified_tables[lower].get(tokens[i + 2].lower())
+                if starrocks_table:
+                    replaced_tables[f"{text}.{tokens[i + 2]}"] = starrocks_table
+                    used_tables.add(starrocks_table)
+                    out.append(starrocks_table)
+                    frame.sig2, frame.sig1 = frame.sig1, 'table'
+                    i += 3
+                    continue
+
+            # Function call (or keyword) followed by an open parenthesis
+            j = i + 1
+            if after and after[0].isspace():
+                j += 1
+            if j < total and tokens[j] == '(':
+                frame = _Frame(lower, ''.join(tokens[i:j]))
+                stack.append(frame)
+                out = frame.out
+                i = j + 1
+                continue
+
+            if lower == 'partition':
+                end = _match_words(tokens, i + 1, ('by', '1'))
+                if end != -1:
+                    i = end
+                    continue
+            elif lower == 'full':
+                if _match_words(tokens, i + 1, ('outer', 'join')) != -1:
+                    events.add('full_outer_join')
+            elif lower == 'as' and recase and after and after[0].isspace() and i + 2 < total:
+                # "AS  column" -> "as column" for aliases referenced by visualizations
+                if tokens[i + 2].lower() in recase and _is_word(tokens[i + 2]):
+                    out.append('as ')
+                    frame.sig2, frame.sig1 = frame.sig1, lower
+                    i += 2
+                    continue
+
+            if lower == 'grouping':
+                text = lower = 'grouped'
+
+            if text in starrocks_tables:
+                used_tables.add(text)
+
+            if text in bare_tables:
+                out.append(f"\x00{len(markers)}\x00")
+                markers.append((recase.get(lower, text), bare_tables[text]))
+            else:
+                out.append(recase.get(lower, text))
+            frame.sig2, frame.sig1 = frame.sig1, lower
+            i += 1
+            continue
+
+        if text == '(':
+            frame = _Frame(None, '', after_from=frame.sig1 == 'from')
+            stack.append(frame)
+            out = frame.out
+            i += 1
+            continue
+
+        if text == ')' and len(stack) > 1:
+            closed = stack.pop()
+            parent = stack[-1]
+            name = closed.name
+            i += 1
+            args = [''.join(arg) for arg in closed.args]
+            replacement = None
+            sig = ')'
+
+            if name is None or name == 'from':
+                # Derived table without an alias
+                if ((name == 'from' or closed.after_from) and SELECT_STAR_PATTERN.match(args[0])
+                        and (i >= total or tokens[i][0].isspace())):
+                    nxt = _next_significant(tokens, i)
+                    if (nxt >= total or not _is_word(tokens[nxt])
+                            or tokens[nxt].lower() in CLAUSE_KEYWORDS):
+                        replacement = closed.render(args) + ' as subquery'
+            elif name == '__within_group__':
+                replacement = f"PERCENTILE_CONT({','.join(args).strip()}, 0.5)"
+            elif name == 'percentile_cont':
+                # PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY x) -> PERCENTILE_CONT(x, 0.5)
+                if len(args) == 1 and args[0].strip() == '0.5':
+                    end = _match_words(tokens, i, ('within', 'group'))
+                    if end != -1:
+                        end = _next_significant(tokens, end)
+                        if end < total and tokens[end] == '(':
+                            paren = end
+                            end = _match_words(tokens, paren + 1, ('order', 'by'))
+                            if end != -1:
+                                end = _next_significant(tokens, end)
+                                # Head and prefix keep the source, so an unclosed group is re-emitted as is
+                                frame = _Frame('__within_group__', closed.render(args) + ''.join(tokens[i:paren]),
+                                               prefix=''.join(tokens[paren + 1:end]))
+                                stack.append(frame)
+                                out = frame.out
+                                i = end
+                                continue
+            elif name == 'over':
+                if closed.head[4:] == ' ' and args == ['']:
+                    replacement = 'OVER ()'
+            elif name == 'sum':
+                # sum(a)/sum(b) -> sum(a)/cast(sum(b) as float)
+                sig = 'sum()'
+                if parent.sig1 == '/' and parent.sig2 == 'sum()':
+                    replacement = f"cast({closed.render(args)} as float)"
+                    sig = 'cast()'
+            elif name == 'count':
+                if (args[0].split(None, 1)[:1] in (['distinct'], ['DISTINCT'])
+                        and _match_words(tokens, i, ('over',)) != -1):
+                    events.add('distinct_window')
+            else:
+                replacement = _rewrite_call(name, args, events)
+
+            frame = parent
+            out = frame.out
+            out.append(closed.render(args) if replacement is None else replacement)
+            frame.sig2, frame.sig1 = frame.sig1, sig
+            continue
+
+        if text == ',' and len(stack) > 1:
+            out = frame.out = []
+            frame.args.append(out)
+            frame.sig1 = frame.sig2 = ''
+            i += 1
+            continue
+
+        out.append(text)
+        frame.sig2, frame.sig1 = frame.sig1, text
+        i += 1
+
+    # Unbalanced input: emit unclosed groups unchanged
+    while len(stack) > 1:
+        closed = stack.pop()
+        stack[-1].out.append(closed.render(closed=False))
+
+    result = ''.join(root.out)
+
+    for exasol_table, starrocks_table in replaced_tables.items():
+        messages.append(f"🔄 Replaced '{exasol_table}' -> '{starrocks_table}'")
+    for starrocks_table in sorted(used_tables):
+        messages.append(f"📋 Found StarRocks table in use: '{starrocks_table}'")
+
+    if markers:
+        contextual = {}
+
+        def resolve(match):
+            original, candidates = markers[int(match.group(1))]
+            for starrocks_table in candidates:
+                if starrocks_table in used_tables:
+                    contextual[original] = starrocks_table
+                    return starrocks_table
+            return original
+
+        result = TABLE_MARKER_PATTERN.sub(resolve, result)
+        for original, starrocks_table in contextual.items():
+            messages.append(f"🔄 Contextual replacement: '{original}' -> '{starrocks_table}'")
+
+    if 'to_char' in events:
+        messages.append("🔄 Replaced to_char() with char()")
+    if 'full_outer_join' in events:
+        messages.append("⚠️  WARNING: Found FULL OUTER JOIN - may need manual conversion")
+    if 'distinct_window' in events:
+        messages.append("⚠️  WARNING: Found DISTINCT in window function - not supported in StarRocks")
+
+    return result, messages
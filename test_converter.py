@@ -4,7 +4,41 @@ Test script for SQL converter functionality
 """
 
 from sql_converter import SQLConverter
+from config import DatabaseMapping
+from sql_rewriter import get_table_matcher, rewrite_sql_for_starrocks, referenced_tables
+from conversion_cache import ConversionCache, fingerprint
+from metabase_migrator import MetabaseMigrator, MetabaseConfig, MetabaseTransport, RateLimiter, AdaptiveConcurrency, QueryRun
+from async_metabase_client import AsyncMetabaseClient
+from migration_pipeline import Pipeline, Stage
+from migration_journal import MigrationJournal, get_migration_journal, sql_hash
+from migration_plan import compile_plan, load_migration_mapping, load_column_mapping_config
+from migrate_dashboard import (
+    preflight_dashboard, compare_result_columns, select_delta_cards, resume_completed, record_query_runs
+)
+from performance_ledger import PerformanceLedger, get_performance_ledger
+from load_test import dashcard_queries, LoadRunner, summarize_load
+from config import MIGRATION_SETTINGS
+from result_compare import load_columns, compare_results
+from result_parity import (
+    normalize_value, fold_rows, diff_rows, iter_text_lines, numeric_columns, fingerprint_query, compare_fingerprints
+)
+from benchmark_queries import percentile, summarize_runs, benchmark_card, summarize_dashboard
+import async_metabase_client
+import conversion_cache
+import benchmark_queries
+import result_compare
+import asyncio
+import requests
+import contextlib
+import csv
+from concurrent.futures import ThreadPoolExecutor
+import http.server
+import io
 import json
+import os
+import tempfile
+import threading
+import time
 
 def test_sql_converter():
     """Test the SQL converter with various Exasol queries"""
@@ -161,9 +195,1136 @@ def test_database_mappings():
         else:
             print("❌ Table mapping failed")
 
+def test_converter_rebuild():
+    """Test that the compiled rule table follows mapping changes only after rebuild()"""
+    
+    converter = SQLConverter()
+    
+    print("\n🔁 Testing Rule Table Rebuild")
+    print("=" * 50)
+    
+    version = converter.rules.version
+    converter.database_mappings = converter.database_mappings + [
+        DatabaseMapping("exasol", "md", "country_codes", "sr_md", "country_codes")
+    ]
+    assert converter.convert_sql("SELECT * FROM MD.COUNTRY_CODES") == "SELECT * FROM MD.COUNTRY_CODES"
+    
+    converter.rebuild()
+    assert converter.rules.version != version
+    assert converter.convert_sql("SELECT * FROM MD.COUNTRY_CODES") == "SELECT * FROM sr_md.country_codes"
+    assert converter.convert_sql("SELECT * FROM EXASOL.MART.TRANSACTIONS") == "SELECT * FROM sr_mart.transactions"
+    print("✅ New mappings applied after rebuild()")
+
+def test_starrocks_rewriter():
+    """Test the single-pass StarRocks rewrite engine used by migrate_dashboard.py"""
+    
+    table_mapping = {
+        "mart.transactions": "MART__TRANSACTIONS",
+        "mart.fatpay": "MART__FATPAY"
+    }
+    
+    print("\n🔧 Testing StarRocks Rewriter")
+    print("=" * 50)
+    
+    rewrite_tests = [
+        {
+            "name": "Table references in any case, literals and comments untouched",
+            "original": "select t.id from Mart.Transactions t where t.src = 'mart.transactions' -- mart.fatpay",
+            "expected": "select t.id from MART__TRANSACTIONS t where t.src = 'mart.transactions' -- mart.fatpay"
+        },
+        {
+            "name": "Contextual table name replacement",
+            "original": "select transactions.id from MART.TRANSACTIONS",
+            "expected": "select MART__TRANSACTIONS.id from MART__TRANSACTIONS"
+        },
+        {
+            "name": "Word boundaries on table names",
+            "original": "select * from mart.transactions_daily",
+            "expected": "select * from mart.transactions_daily"
+        },
+        {
+            "name": "Nested NULLIFZERO / ZEROIFNULL",
+            "original": "select a / NULLIFZERO(sum(b)), zeroifnull(max(c)) from t",
+            "expected": "select a / NULLIF(cast(sum(b) as float), 0), ifnull(max(c), 0) from t"
+        },
+        {
+            "name": "MEDIAN and PERCENTILE_CONT WITHIN GROUP",
+            "original": "select median(a), PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY b) from t",
+            "expected": "select PERCENTILE_CONT(a, 0.5), PERCENTILE_CONT(b, 0.5) from t"
+        },
+        {
+            "name": "Unclosed WITHIN GROUP kept verbatim",
+            "original": "select PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY b from t",
+            "expected": "select PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY b from t"
+        },
+        {
+            "name": "sum()/sum() division and json_value",
+            "original": "select sum(a)/sum(b), json_value(f, '$.fee') from t",
+            "expected": "select sum(a)/cast(sum(b) as float), parse_json(f)->'$.fee' from t"
+        },
+        {
+            "name": "Granularity, grouping alias and template tags",
+            "original": "select date_trunc(gran.granularity, t.created_at) as grouping from t where [[x = {{grouping}}]]",
+            "expected": "select date_trunc({{granularity}}, t.created_at) as grouped from t where [[x = {{grouping}}]]"
+        },
+        {
+            "name": "Derived table alias and PARTITION BY 1",
+            "original": "select sum(x) over (PARTITION BY 1) from (select * from t)\nwhere x > 0",
+            "expected": "select sum(x) OVER () from (select * from t) as subquery\nwhere x > 0"
+        },
+        {
+            "name": "Visualization column casing",
+            "original": "select tr.amount_eur as  amount_eur from tr",
+            "expected": "select tr.AMOUNT_EUR as AMOUNT_EUR from tr",
+            "visualization_columns": {"AMOUNT_EUR"}
+        }
+    ]
+    
+    all_passed = True
+    for test in rewrite_tests:
+        rewritten, _ = rewrite_sql_for_starrocks(
+            test["original"], test.get("visualization_columns", set()), table_mapping
+        )
+        if rewritten == test["expected"]:
+            print(f"✅ {test['name']}")
+        else:
+            print(f"❌ {test['name']}")
+            print(f"   expected: {test['expected']}")
+            print(f"   got:      {rewritten}")
+            all_passed = False
+    
+    assert all_passed
+
+def test_table_matcher():
+    """Test the table matcher shared by every question in a run"""
+    
+    table_mapping = {
+        "mart.transactions": "MART__TRANSACTIONS",
+        "raw.nuvei__movement_csv": "RAW__NUVEI__MOVEMENT_CSV"
+    }
+    
+    print("\n🔤 Testing Table Matcher")
+    print("=" * 50)
+    
+    matcher = get_table_matcher(table_mapping)
+    assert get_table_matcher(table_mapping) is matcher
+    assert matcher.lookup("Mart", "TRANSACTIONS") == "MART__TRANSACTIONS"
+    assert matcher.lookup("raw", "nuvei__movement_csv_unduplicated") is None
+    
+    rewritten, _ = rewrite_sql_for_starrocks(
+        "select * from RAW.Nuvei__Movement_CSV join raw.nuvei__movement_csv_unduplicated u on true",
+        set(), matcher
+    )
+    assert rewritten == "select * from RAW__NUVEI__MOVEMENT_CSV join raw.nuvei__movement_csv_unduplicated u on true"
+    print("✅ Case-insensitive, word-bounded lookups with a single shared matcher")
+    
+    table_mapping["mart.fatpay"] = "MART__FATPAY"
+    assert get_table_matcher(table_mapping) is not matcher
+    # A value edited in place keeps the size but must not reuse the old matcher or version
+    grown = get_table_matcher(table_mapping)
+    table_mapping["mart.fatpay"] = "MART__FATPAY_V2"
+    edited = get_table_matcher(table_mapping)
+    assert edited is not grown and edited.version != grown.version
+    assert edited.lookup("mart", "fatpay") == "MART__FATPAY_V2"
+    assert get_table_matcher(dict(table_mapping)) is edited
+    print("✅ Matcher rebuilt after the mapping changed")
+
+def test_conversion_cache():
+    """Test that cached conversions are reused and invalidated by rule changes"""
+    
+    print("\n♻️  Testing Conversion Cache")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ConversionCache(os.path.join(directory, "cache.sqlite"))
+        converter = SQLConverter(cache=cache)
+        sql = "SELECT * FROM MART.TRANSACTIONS"
+        
+        first = converter.convert_sql(sql)
+        assert converter.convert_sql(sql) == first
+        assert (cache.hits, cache.misses) == (1, 1)
+        print(f"✅ Second conversion served from cache ({cache.summary()})")
+        
+        converter.database_mappings = converter.database_mappings + [
+            DatabaseMapping("exasol", "md", "country_codes", "sr_md", "country_codes")
+        ]
+        converter.rebuild()
+        converter.convert_sql(sql)
+        assert cache.misses == 2
+        # Windows line endings share the entry and get the output a fresh conversion gives
+        multiline = "SELECT *\nFROM MART.TRANSACTIONS\nWHERE 1 = 1"
+        assert converter.convert_sql(multiline.replace("\n", "\r\n")) == converter.convert_sql(multiline)
+        assert converter.convert_sql(multiline) == SQLConverter().convert_sql(multiline)
+        
+        # Entries of the old rules were deleted when the converter was rebuilt
+        rows = cache._connection.execute("SELECT DISTINCT fingerprint FROM conversions").fetchall()
+        assert rows == [(converter.cache_fingerprint,)], rows
+        assert cache.purge_stale(SQLConverter.CACHE_NAMESPACE, converter.cache_fingerprint) == 0
+        print("✅ Changed mappings invalidate cached conversions and purge the stale ones")
+        cache.close()
+    
+    # The mapping files are found from any working directory
+    expected = fingerprint()
+    assert conversion_cache.file_fingerprint(conversion_cache.MAPPING_FILES[0])
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            assert fingerprint() == expected
+        finally:
+            os.chdir(cwd)
+    print("✅ Fingerprint independent of the working directory")
+
+def test_convert_many():
+    """Test that batch conversion over a process pool matches one-by-one conversion"""
+    
+    print("\n📦 Testing Batch Conversion")
+    print("=" * 50)
+    
+    converter = SQLConverter()
+    sqls = [
+        "SELECT * FROM MART.TRANSACTIONS WHERE d >= {{start_date}}",
+        "",
+        "SELECT MEDIAN(amount) FROM mart.transactions",
+        "SELECT TOP 10 * FROM other.table_name",
+    ] * 3
+    
+    results = converter.convert_many(sqls, workers=2, chunk_size=2)
+    assert [converted for converted, _ in results] == [converter.convert_sql(sql) for sql in sqls]
+    assert results[0][1]["tables_converted"] == 1
+    assert results[2][1]["warnings"] == ["MEDIAN function conversion may need manual review"]
+    print(f"✅ {len(results)} queries converted in input order with per-item validation")
+
+def test_concurrent_card_fetch():
+    """Test that card prefetching overlaps requests without exceeding the in-flight limit"""
+    
+    print("\n📥 Testing Concurrent Card Fetch")
+    print("=" * 50)
+    
+    class SlowMigrator(MetabaseMigrator):
+        in_flight = 0
+        peak = 0
+        lock = threading.Lock()
+        
+        def get_question_details(self, question_id, session=None):
+            with self.lock:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            time.sleep(0.05)
+            with self.lock:
+                self.in_flight -= 1
+            return {"id": question_id}
+    
+    migrator = SlowMigrator(MetabaseConfig("http://localhost", "", ""))
+    start = time.time()
+    cards = migrator.prefetch_question_details([1, 2, 3, 4, 5, 6, 7, 8, 2], max_in_flight=4)
+    elapsed = time.time() - start
+    
+    assert sorted(cards) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert migrator.peak == 4
+    assert elapsed < 0.3
+    print(f"✅ 8 cards fetched in {elapsed:.2f}s with at most {migrator.peak} in flight")
+
+def test_card_cache():
+    """Test that each card is read once per run and refreshed by updates"""
+    
+    print("\n🗂️  Testing Card Cache")
+    print("=" * 50)
+    
+    class PutResponse:
+        status_code = 200
+        
+        def __init__(self, body):
+            self.body = body
+        
+        def json(self):
+            return self.body
+    
+    class PutSession:
+        def put(self, url, headers=None, json=None):
+            return PutResponse({"id": 7, "dataset_query": json["dataset_query"]})
+    
+    class CountingMigrator(MetabaseMigrator):
+        fetches = 0
+        
+        def get_question_details(self, question_id, session=None):
+            self.fetches += 1
+            return {"id": question_id, "dataset_query": {"database": 2}}
+    
+    migrator = CountingMigrator(MetabaseConfig("http://localhost", "", ""))
+    migrator.session = PutSession()
+    
+    for _ in range(3):
+        assert migrator.get_card(7)["dataset_query"]["database"] == 2
+    assert (migrator.fetches, migrator.avoided_card_requests) == (1, 2)
+    
+    migrator.update_card(7, {"dataset_query": {"database": 16}})
+    assert migrator.get_card(7)["dataset_query"]["database"] == 16
+    assert migrator.fetches == 1
+    
+    migrator.reuse_put_response = False
+    migrator.update_card(7, {"dataset_query": {"database": 16}})
+    migrator.get_card(7)
+    assert migrator.fetches == 2
+    print(f"✅ {migrator.avoided_card_requests} card requests avoided, PUT invalidates the cached card")
+
+def test_embedded_cards():
+    """Test that embedded dashboard cards are reused unless they changed since the snapshot"""
+    
+    print("\n🧩 Testing Embedded Dashboard Cards")
+    print("=" * 50)
+    
+    def dashboard(*cards):
+        return {"dashcards": [
+            {"card": {"id": card_id, "updated_at": updated_at, "dataset_query": {"type": "native"}}}
+            for card_id, updated_at in cards
+        ]}
+    
+    snapshot = dashboard((1, "2025-06-23T10:26:20.290859Z"), (2, "2025-06-23T10:26:20.290859Z"))
+    current = dashboard((1, "2025-06-23T10:26:20.290859Z"), (2, "2025-07-01T08:00:00.000000Z"))
+    
+    migrator = MetabaseMigrator(MetabaseConfig("http://localhost", "", ""))
+    assert migrator.seed_cards_from_dashboard(snapshot, current) == [2]
+    assert migrator.get_card(1) is snapshot["dashcards"][0]["card"]
+    assert migrator.avoided_card_requests == 1
+    print("✅ Unchanged card served from the snapshot, changed card left to be refetched")
+
+def test_http_transport():
+    """Test retries on 429/5xx and token-bucket pacing against a local HTTP server"""
+    
+    print("\n🌐 Testing HTTP Transport")
+    print("=" * 50)
+    
+    statuses = [429, 503, 200]
+    
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(statuses.pop(0) if statuses else 200)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        
+        def log_message(self, *args):
+            pass
+    
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/card/1"
+    try:
+        transport = MetabaseTransport(settings={"backoff_factor": 0.01})
+        assert transport.get(url).status_code == 200
+        assert transport.retries == 2
+        print("✅ 429 and 503 retried until the request succeeded")
+        
+        transport = MetabaseTransport(rate_limiter=RateLimiter(rate=20, burst=1))
+        start = time.time()
+        for _ in range(5):
+            transport.get(url)
+        elapsed = time.time() - start
+        assert elapsed >= 0.19
+        print(f"✅ 5 requests at 20 req/s took {elapsed:.2f}s")
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    requests_seen = []
+    
+    class SlowHandler(http.server.BaseHTTPRequestHandler):
+        def respond(self):
+            requests_seen.append((self.command, self.path))
+            if self.path == "/api/card/1":
+                # Rate limited with a Retry-After far longer than we are willing to wait
+                status, delay = (429 if len(requests_seen) == 1 else 200), 0
+            else:
+                status, delay = 200, 0.5
+            time.sleep(delay)
+            self.send_response(status)
+            self.send_header("Retry-After", "3600")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        do_GET = do_POST = do_PUT = respond
+        
+        def log_message(self, *args):
+            pass
+    
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        transport = MetabaseTransport(settings={"backoff_factor": 0.01, "max_backoff": 0.05, "timeout": (1, 0.1)})
+        start = time.time()
+        assert transport.get(f"{base}/api/card/1").status_code == 200
+        assert time.time() - start < 1
+        print("✅ Retry-After capped by max_backoff")
+        
+        for method, path in [("POST", "/api/dataset"), ("PUT", "/api/card/2"), ("GET", "/api/dataset/1")]:
+            requests_seen.clear()
+            try:
+                transport.request(method, base + path)
+                assert False, "read timeout expected"
+            except requests.exceptions.ReadTimeout:
+                pass
+            assert requests_seen == [(method, path)], requests_seen
+        requests_seen.clear()
+        try:
+            transport.get(f"{base}/api/card/3")
+        except requests.exceptions.ReadTimeout:
+            pass
+        assert len(requests_seen) == transport.max_retries + 1
+        print("✅ Read timeouts retried only for idempotent requests outside /api/dataset")
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    # A POST that never reached the server is safe to retry
+    transport = MetabaseTransport(settings={"backoff_factor": 0.01, "max_retries": 2})
+    try:
+        transport.post("http://127.0.0.1:1/api/dataset", json={})
+        assert False, "connection error expected"
+    except requests.exceptions.ConnectionError:
+        pass
+    assert transport.retries == 2
+    print("✅ Refused connections retried for POST")
+
+def test_async_client():
+    """Test that the asyncio client bounds requests in flight with its semaphore"""
+    
+    print("\n⚡ Testing Async Metabase Client")
+    print("=" * 50)
+    
+    state = {"in_flight": 0, "peak": 0}
+    lock = threading.Lock()
+    
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.05)
+            with lock:
+                state["in_flight"] -= 1
+            body = json.dumps({"id": int(self.path.rsplit("/", 1)[-1])}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = MetabaseConfig(f"http://127.0.0.1:{server.server_address[1]}", "", "")
+    
+    async def fetch():
+        async with AsyncMetabaseClient(config, max_concurrency=5, rate_limiter=RateLimiter(1000, 1000)) as client:
+            return await client.get_question_details_many(range(1, 21))
+    
+    try:
+        cards = asyncio.run(fetch())
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    assert [card["id"] for card in cards.values()] == list(range(1, 21))
+    assert 1 < state["peak"] <= 5
+    print(f"✅ 20 cards fetched with at most {state['peak']} requests in flight")
+    
+    if async_metabase_client.aiohttp is None:
+        # The thread fallback is sized by pool_size and paced by the threaded rate limit
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        config = MetabaseConfig(f"http://127.0.0.1:{server.server_address[1]}", "", "")
+        state["peak"] = 0
+        
+        async def fetch_fallback():
+            settings = {"pool_size": 3, "requests_per_second": 100.0, "burst": 1, "adaptive_concurrency": None}
+            async with AsyncMetabaseClient(config, max_concurrency=100, settings=settings) as client:
+                cards = await client.get_question_details_many(range(1, 21))
+                return cards, client
+        
+        try:
+            start = time.time()
+            cards, client = asyncio.run(fetch_fallback())
+            elapsed = time.time() - start
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert len(cards) == 20 and client.in_flight_limit == 3 and state["peak"] <= 3
+        assert client.rate_limiter is not None and elapsed >= 0.19
+        print(f"✅ Thread fallback limited to {state['peak']} in flight and paced by HTTP_SETTINGS")
+
+def test_async_client_retries():
+    """Test the aiohttp retry and backoff path with a fake session"""
+    
+    print("\n🔁 Testing Async Client Retries")
+    print("=" * 50)
+    
+    class FakeClientError(Exception):
+        pass
+    
+    class FakeResponse:
+        def __init__(self, status, body, headers=None):
+            self.status = status
+            self.body = body
+            self.headers = headers or {}
+        
+        async def __aenter__(self):
+            return self
+        
+        async def __aexit__(self, *exc_info):
+            return False
+        
+        async def text(self):
+            return self.body
+    
+    class FakeSession:
+        def __init__(self, replies):
+            self.replies = replies
+            self.calls = 0
+        
+        def request(self, method, url, headers=None, json=None):
+            self.calls += 1
+            reply = self.replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+    
+    async def send(replies, settings):
+        client = AsyncMetabaseClient(MetabaseConfig("http://localhost", "", ""), max_concurrency=2,
+                                     rate_limiter=RateLimiter(1000, 1000), settings=settings)
+        client._semaphore = asyncio.Semaphore(2)
+        client._session = FakeSession(replies)
+        try:
+            return await client.request("GET", "/api/card/1"), client
+        finally:
+            client._session = None
+    
+    original_aiohttp = async_metabase_client.aiohttp
+    async_metabase_client.aiohttp = type("FakeAiohttp", (), {"ClientError": FakeClientError})
+    try:
+        replies = [FakeClientError("reset"), FakeResponse(429, "", {"Retry-After": "0"}),
+                   FakeResponse(503, ""), FakeResponse(200, '{"id": 1}')]
+        (status, body), client = asyncio.run(send(replies, {"backoff_factor": 0.001, "max_retries": 3}))
+        assert (status, body) == (200, {"id": 1})
+        assert client.retries == 3
+        print("✅ Connection error, 429 and 503 retried until the request succeeded")
+        
+        start = time.time()
+        (status, body), client = asyncio.run(send([FakeResponse(429, "", {"Retry-After": "3600"}), FakeResponse(200, "{}")],
+                                                  {"backoff_factor": 0.001, "max_retries": 1, "max_backoff": 0.01}))
+        assert status == 200 and time.time() - start < 1
+        print("✅ Retry-After capped by max_backoff")
+        
+        (status, body), client = asyncio.run(send([FakeResponse(503, "down")] * 3,
+                                                  {"backoff_factor": 0.001, "max_retries": 1}))
+        assert (status, body) == (503, "down")
+        assert client.retries == 1
+        print("✅ Last response returned once max_retries is reached")
+        
+        try:
+            asyncio.run(send([FakeClientError("reset")] * 2, {"backoff_factor": 0.001, "max_retries": 1}))
+            assert False, "connection error should be raised after the last retry"
+        except FakeClientError:
+            print("✅ Connection error raised after the last retry")
+    finally:
+        async_metabase_client.aiohttp = original_aiohttp
+    
+    assert AsyncMetabaseClient(MetabaseConfig("http://localhost", "", "")).rate_limiter is None
+    print("✅ No rate limit by default, only the in-flight bound")
+
+def test_migration_pipeline():
+    """Test that the staged pipeline passes items through every stage with bounded queues"""
+    
+    print("\n🏭 Testing Migration Pipeline")
+    print("=" * 50)
+    
+    def slow_double(item):
+        time.sleep(0.01)
+        return item * 2
+    
+    pipeline = Pipeline([
+        Stage("fetch", lambda item: item, 2),
+        Stage("convert", lambda item: item if item % 3 else None, 1),
+        Stage("update", slow_double, 4),
+    ], queue_size=2)
+    results = pipeline.run(range(1, 31))
+    
+    assert sorted(results) == [item * 2 for item in range(1, 31) if item % 3]
+    assert [metrics.processed for metrics in pipeline.metrics] == [30, 30, 20]
+    assert pipeline.metrics[1].dropped == 10
+    assert all(metrics.max_depth <= 2 for metrics in pipeline.metrics)
+    for line in pipeline.report():
+        print(f"  {line}")
+    print("✅ Items flowed through all stages without exceeding the queue bound")
+    
+    try:
+        Stage("convert", slow_double, 0)
+        assert False, "a stage without workers must be rejected"
+    except ValueError:
+        pass
+    
+    def chatty(item):
+        print(f"start {item}")
+        time.sleep(0.01)
+        print(f"end {item}")
+        return item
+    
+    captured = io.StringIO()
+    with contextlib.redirect_stdout(captured):
+        Pipeline([Stage("convert", chatty, 4)]).run(range(8))
+    lines = captured.getvalue().splitlines()
+    assert len(lines) == 16
+    assert all(lines[i].split()[1] == lines[i + 1].split()[1] for i in range(0, 16, 2)), lines
+    print("✅ Zero-worker stages rejected, output of concurrent workers kept together per item")
+
+def test_migration_journal():
+    """Test that journaled stages survive a restart and are tied to the source SQL"""
+    
+    print("\n📓 Testing Migration Journal")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "journal.jsonl")
+        journal = MigrationJournal(path, fsync_batch=2)
+        source = sql_hash("SELECT * FROM mart.transactions")
+        journal.record(421, 4218, "update", source, "ok", updated_at="2025-07-01T08:00:00.000000Z")
+        journal.record(421, 4218, "validate", source, "failed")
+        journal.close()
+        with open(path, "a") as f:
+            f.write('{"dashboard_id": 421, "question_id"')  # run killed mid-write
+        
+        resumed = MigrationJournal(path)
+        assert resumed.completed(421, 4218, "update", source)
+        assert not resumed.completed(421, 4218, "validate", source)
+        assert not resumed.completed(421, 4218, "update", sql_hash("SELECT 1"))
+        assert resumed.last_migrated(421, 4218) == "2025-07-01T08:00:00.000000Z"
+        assert resumed.last_migrated(421, 4217) is None
+        
+        resumed.record(421, 4219, "update", source, "ok", conversion="rules-v1")
+        assert resumed.completed(421, 4219, "update", source, "rules-v1")
+        assert not resumed.completed(421, 4219, "update", source, "rules-v2")
+        assert not resumed.completed(421, 4218, "update", source, "rules-v1")
+        resumed.close()
+    print("✅ Completed stages are skipped on rerun, changed SQL or conversion rules are migrated again")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "journal.jsonl")
+        original_path = MIGRATION_SETTINGS.get("journal_path")
+        MIGRATION_SETTINGS["journal_path"] = path
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                journals = list(executor.map(lambda _: get_migration_journal(), range(16)))
+        finally:
+            MIGRATION_SETTINGS["journal_path"] = original_path
+        assert all(journal is journals[0] for journal in journals)
+        journals[0].close()
+    print("✅ Concurrent callers share a single journal")
+
+def test_delta_selection():
+    """Test which cards a delta sync migrates, and that changed cards bypass the resume skip"""
+    
+    print("\n🔁 Testing Delta Selection")
+    print("=" * 50)
+    
+    class StubJournal:
+        def __init__(self, migrated, validated):
+            self.migrated = migrated
+            self.validated = validated
+        
+        def last_migrated(self, dashboard_id, question_id):
+            return self.migrated.get(question_id)
+        
+        def completed(self, dashboard_id, question_id, stage, source_hash, conversion=None):
+            return question_id in self.validated
+    
+    def card(question_id, updated_at):
+        return {"card": {"id": question_id, "name": f"Card {question_id}", "updated_at": updated_at,
+                         "dataset_query": {"native": {"query": f"select {question_id}"}}}}
+    
+    question_names = {1: "Changed", 2: "Unchanged", 3: "Removed", 4: "Never migrated", 5: "Failed validation"}
+    source_hashes = {question_id: sql_hash(f"select {question_id}") for question_id in question_names}
+    live_dashboard = {"dashcards": [
+        card(1, "2025-07-02T00:00:00Z"), card(2, "2025-07-01T00:00:00Z"), card(4, "2025-07-01T00:00:00Z"),
+        card(5, "2025-07-01T00:00:00Z"), card(6, "2025-07-03T00:00:00Z")
+    ]}
+    migrated_at = "2025-07-01T00:00:00Z"
+    journal = StubJournal({1: migrated_at, 2: migrated_at, 3: migrated_at, 5: migrated_at}, validated={1, 2, 3})
+    
+    changed, new, removed, unchanged = select_delta_cards(421, question_names, source_hashes, live_dashboard, journal)
+    assert changed == {1}
+    assert new == [6] and source_hashes[6] == sql_hash("select 6")
+    assert removed == [3]
+    assert unchanged == [2]
+    assert list(question_names) == [1, 4, 5, 6]
+    print("✅ Changed, never migrated, failed and new cards kept; unchanged and removed cards dropped")
+    
+    assert not resume_completed(journal, 421, 1, "validate", source_hashes[1], changed_cards=changed)
+    assert resume_completed(journal, 421, 2, "validate", source_hashes[2], changed_cards=changed)
+    assert not resume_completed(None, 421, 2, "validate", source_hashes[2])
+    print("✅ Changed cards bypass the resume skip even though they were validated before")
+
+def test_migration_plan():
+    """Test that a plan is compiled offline from the inspections, with a diff per card"""
+    
+    print("\n🗺️  Testing Migration Plan")
+    print("=" * 50)
+    
+    migration_mapping = load_migration_mapping()
+    column_config = load_column_mapping_config()
+    cache_path = MIGRATION_SETTINGS["conversion_cache_path"]
+    MIGRATION_SETTINGS["conversion_cache_path"] = None
+    try:
+        plan = compile_plan([421, 999999], migration_mapping, column_config, workers=1)
+    finally:
+        MIGRATION_SETTINGS["conversion_cache_path"] = cache_path
+    
+    dashboard, missing = plan["dashboards"]
+    assert "error" in missing
+    assert len(dashboard["cards"]) == 8 and not dashboard["skipped"]
+    for card in dashboard["cards"]:
+        assert card["update_data"]["dataset_query"]["database"] == migration_mapping["database_mapping"]["starrocks"]
+        assert card["diff"]["database"] == {"from": 2, "to": 16}
+        assert any(line.startswith("+") for line in card["diff"]["sql"])
+        assert card["sql_hash"] and card["updated_at"]
+    print(f"✅ Planned {len(dashboard['cards'])} card updates without contacting Metabase")
+
+def test_preflight():
+    """Test that the preflight reports every unmapped field and table of a dashboard"""
+    
+    print("\n🛫 Testing Preflight")
+    print("=" * 50)
+    
+    migration_mapping = load_migration_mapping()
+    with open("inspections/dashboard_421_inspection.json") as f:
+        dashboard_data = json.load(f)
+    assert preflight_dashboard(421, dashboard_data, migration_mapping) == []
+    
+    dashboard_data = {"dashcards": [{
+        "card": {"id": 1, "name": "Blocked", "dataset_query": {"type": "native", "native": {
+            "query": "SELECT * FROM mart.fatpay f JOIN mart.unknown_table u ON f.id = u.id WHERE {{CREATED_AT}}",
+            "template-tags": {
+                "CREATED_AT": {"type": "dimension", "dimension": ["field", 3869, None]},
+                "COUNTRY": {"type": "dimension", "dimension": ["field", 1, None]}
+            }
+        }}},
+        "parameter_mappings": [{"parameter_id": "p1", "target": ["dimension", ["field", 2, None]]}]
+    }]}
+    blockers = preflight_dashboard(1, dashboard_data, migration_mapping)
+    assert sorted((blocker["kind"], blocker["detail"]) for blocker in blockers) == [
+        ("parameter_mapping", "parameter p1 targets field 2"),
+        ("table", "mart.unknown_table"),
+        ("template_tag", "COUNTRY (dimension field: 1)"),
+    ]
+    print(f"✅ Found all {len(blockers)} blockers without contacting Metabase")
+    
+    assert referenced_tables(
+        "SELECT extract(year FROM f.created_at) FROM mart.fatpay f, raw.unknown AS u, t, mart.other "
+        "WHERE f.id IN (SELECT id FROM mart.inner_table) "
+        "LEFT JOIN mart.joined j ON 1 = 1"
+    ) == [("mart", "fatpay"), ("raw", "unknown"), ("mart", "other"), ("mart", "inner_table"), ("mart", "joined")]
+    print("✅ Comma joins and subqueries found, EXTRACT(... FROM ...) ignored")
+
+def test_schema_validation():
+    """Test that returned columns are compared with result_metadata by name and type family"""
+    
+    print("\n📐 Testing Schema Validation")
+    print("=" * 50)
+    
+    expected = [
+        {"name": "CREATED_AT", "base_type": "type/DateTime"},
+        {"name": "TURNOVER", "base_type": "type/Decimal"},
+        {"name": "MERCHANT", "base_type": "type/Text"},
+    ]
+    returned = [
+        {"name": "created_at", "base_type": "type/Date"},
+        {"name": "TURNOVER", "base_type": "type/BigInteger"},
+        {"name": "MERCHANT", "base_type": "type/Text"},
+    ]
+    assert compare_result_columns(returned, expected) == []
+    
+    returned = [
+        {"name": "CREATED_AT", "base_type": "type/Text"},
+        {"name": "MERCHANT", "base_type": "type/Text"},
+        {"name": "EXTRA", "base_type": "type/Float"},
+    ]
+    assert compare_result_columns(returned, expected) == [
+        "column CREATED_AT is type/Text, expected type/DateTime",
+        "missing column TURNOVER",
+        "unexpected column EXTRA",
+    ]
+    print("✅ Renamed, missing and retyped columns are reported")
+
+def test_database_slots():
+    """Test that queries on one database never exceed the per-database cap"""
+    
+    print("\n🚦 Testing Per-Database Query Cap")
+    print("=" * 50)
+    
+    migrator = MetabaseMigrator(MetabaseConfig("http://localhost", "", ""))
+    migrator.max_queries_per_database = 2
+    lock = threading.Lock()
+    running = {16: 0, 2: 0}
+    peak = {16: 0, 2: 0}
+    
+    def query(database_id):
+        with migrator.database_slot(database_id):
+            with lock:
+                running[database_id] += 1
+                peak[database_id] = max(peak[database_id], running[database_id])
+            time.sleep(0.02)
+            with lock:
+                running[database_id] -= 1
+    
+    threads = [threading.Thread(target=query, args=(database_id,)) for database_id in [16] * 6 + [2] * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == {16: 2, 2: 2}
+    print(f"✅ At most {peak[16]} queries in flight per database")
+
+def test_adaptive_concurrency():
+    """Test that the in-flight limit grows additively and is cut multiplicatively"""
+    
+    print("\n🎚️  Testing Adaptive Concurrency")
+    print("=" * 50)
+    
+    controller = AdaptiveConcurrency("api", initial=2, maximum=3, target_p95=0.5, window=4)
+    
+    def window(status=200):
+        # Fill every slot, then complete them, until a full window of responses is in
+        done = 0
+        while done < 4:
+            for started in [controller.acquire() for _ in range(int(controller.limit))]:
+                controller.release(started, status)
+                done += 1
+    
+    window()
+    assert controller.limit == 3
+    window()
+    assert controller.limit == 3  # capped at maximum
+    
+    stale = controller.acquire()
+    fresh = controller.acquire()
+    controller.release(fresh, 429)
+    assert int(controller.limit) == 1
+    controller.release(stale, 503)  # sent before the cut: no second cut
+    assert int(controller.limit) == 1
+    
+    controller.target_p95 = -1  # every response is now too slow
+    window()
+    assert controller.limit == 1 and controller.decisions[-1][1] == "decrease"
+    assert controller.in_flight == 0
+    print(f"✅ {controller.summary()}")
+
+def test_result_parity():
+    """Test order-insensitive result digests and the row diff pulled on a mismatch"""
+    
+    print("\n⚖️  Testing Result Parity")
+    print("=" * 50)
+    
+    assert normalize_value("1.50") == normalize_value("1.5") == "1.5"
+    assert normalize_value("-0.0000001") == "0"
+    assert normalize_value("2025-07-01T08:00:00.000Z") == normalize_value("2025-07-01 08:00:00") == "2025-07-01 08:00:00"
+    assert normalize_value("TRUE") == "true" and normalize_value(" EUR ") == "EUR"
+    print("✅ Numbers, timestamps and booleans normalized across engines")
+    
+    exasol = (["ID", "AMOUNT"], [["1", "1.50"], ["2", "2.00"], ["2", "2.00"]])
+    starrocks = (["amount", "id"], [["2", "2"], ["1.5", "1"], ["2", "2"]])
+    columns, digest = fold_rows(*exasol)
+    assert columns == ["amount", "id"]
+    assert fold_rows(*starrocks)[1] == digest
+    assert fold_rows(["amount", "id"], [["2", "2"], ["1.5", "1"]])[1] != digest
+    print("✅ Digests ignore row and column order but not duplicate rows")
+    
+    changed = (["amount", "id"], [["2", "2"], ["1.5", "1"], ["3", "2"]])
+    diff = diff_rows(lambda: contextlib.nullcontext(exasol), lambda: contextlib.nullcontext(changed))
+    assert diff["exasol"] == {"rows": 1, "examples": [("2", "2")]}
+    assert diff["starrocks"] == {"rows": 1, "examples": [("3", "2")]}
+    assert diff_rows(lambda: contextlib.nullcontext(exasol), lambda: contextlib.nullcontext(changed), max_rows=2) is None
+    print("✅ Row diff names the rows only one side returned")
+    
+    lines = list(iter_text_lines(['id,note\n1,"two', '\nlines"\n2,', 'x']))
+    assert list(csv.reader(lines)) == [["id", "note"], ["1", "two\nlines"], ["2", "x"]]
+    print("✅ Streamed CSV chunks split into lines, quoted newlines kept")
+    
+    columns = numeric_columns(
+        [{"name": "TURNOVER", "base_type": "type/Decimal"}, {"name": "COUNTRY", "base_type": "type/Text"}],
+        [{"name": "turnover", "base_type": "type/Float"}, {"name": "country", "base_type": "type/Text"}]
+    )
+    assert columns == [("TURNOVER", "turnover")]
+    probe = fingerprint_query({"database": 16, "type": "native", "native": {
+        "query": "select turnover from t where [[x = {{x}}]] -- note;", "template-tags": {"x": {}}}}, ["turnover"], "starrocks")
+    assert probe["native"]["query"] == (
+        "SELECT COUNT(*), SUM(`turnover`), MIN(`turnover`), MAX(`turnover`), APPROX_COUNT_DISTINCT(`turnover`) "
+        "FROM (\nselect turnover from t where [[x = {{x}}]] -- note\n) fingerprint_source"
+    )
+    assert probe["native"]["template-tags"] == {"x": {}} and probe["database"] == 16
+    tolerances = {"row_count": 0.0, "sum": 1e-6, "min": 0.0, "max": 0.0, "distinct": 0.05}
+    exasol = [1000, 12345.6789, 0, 99.5, 400]
+    assert compare_fingerprints(["turnover"], exasol, [1000, 12345.67890001, 0, 99.5, 410], tolerances) == []
+    assert compare_fingerprints(["turnover"], exasol, [999, 12345.6789, 0, 99.5, 500], tolerances) == [
+        "row count: Exasol 1000, StarRocks 999", "DISTINCT(turnover): Exasol 400, StarRocks 500"
+    ]
+    # Float noise around zero passes the absolute tolerance, a short probe row is a mismatch
+    assert compare_fingerprints(["turnover"], [1000, 0.0, 0, 99.5, 400], [1000, 1e-12, -1e-12, 99.5, 400], tolerances) == []
+    assert compare_fingerprints(["turnover"], [1000, 0.0, 0, 99.5, 400], [1000, 1e-3, 0, 99.5, 400], tolerances) == [
+        "SUM(turnover): Exasol 0.0, StarRocks 0.001"
+    ]
+    assert compare_fingerprints(["turnover"], exasol, exasol[:3], tolerances) == [
+        "probe returned 5 values on Exasol and 3 on StarRocks, expected 5"
+    ]
+    print("✅ Aggregate probes built per dialect and compared with relative tolerances")
+
+def test_result_compare():
+    """Test the column-wise result comparator with numeric tolerances, with and without NumPy"""
+    
+    print("\n📐 Testing Result Comparator")
+    print("=" * 50)
+    
+    exasol = (["COUNTRY", "ID", "RATE"], [["DE", "1", "0.3333333333"], ["FR", "2", ""], ["DE", "3", "0.5"]])
+    starrocks = (["rate", "country", "id"], [["0.5", "DE", "3"], ["0.33333333333333331", "DE", "1"], ["", "FR", "2"]])
+    
+    backends = [result_compare.numpy, None] if result_compare.numpy is not None else [None]
+    original_numpy = result_compare.numpy
+    try:
+        for backend in backends:
+            result_compare.numpy = backend
+            name = "NumPy" if backend is not None else "array module"
+            comparison = compare_results(load_columns(*exasol), load_columns(*starrocks))
+            assert comparison.matches, comparison
+            assert comparison.max_difference["rate"] < 1e-9
+            
+            changed = (starrocks[0], [["0.51", "DE", "3"], ["0.33333333333333331", "DE", "1"], ["0", "FR", "2"]])
+            comparison = compare_results(load_columns(*exasol), load_columns(*changed), sample=5)
+            assert not comparison.matches
+            assert comparison.mismatched == {"rate": 2}
+            assert comparison.examples[0] == (1, "rate", 0.5, 0.51)
+            
+            comparison = compare_results(load_columns(*exasol), load_columns(starrocks[0], starrocks[1][:2]))
+            assert not comparison.matches and comparison.reason == "row counts differ: 3 vs 2"
+            
+            # A column numeric on one side only is compared as text without retyping the caller's result
+            left, right = load_columns(*exasol), load_columns(["COUNTRY", "ID", "RATE"], [["DE", "1", "n/a"], ["FR", "2", ""], ["DE", "3", "0.5"]])
+            assert not compare_results(left, right).matches
+            assert left.is_numeric("rate") and not right.is_numeric("rate")
+            assert list(left.row_source()[1])[0] == ["DE", "1.0", "0.3333333333"]
+            print(f"✅ Shuffled rows matched within tolerance and differences located ({name})")
+    finally:
+        result_compare.numpy = original_numpy
+
+def test_query_benchmark():
+    """Test latency percentiles, speedups and the slower-card flag of the query benchmark"""
+    
+    print("\n⏱️  Testing Query Benchmark")
+    print("=" * 50)
+    
+    assert percentile([], 50) is None
+    assert percentile([30, 10, 20], 50) == 20
+    assert abs(percentile([10, 20, 30, 40, 50], 95) - 48) < 1e-9
+    
+    class StubMigrator:
+        """Answers /api/dataset with a fixed running_time per database, failing once where asked"""
+        def __init__(self, running_times, failures=()):
+            self.running_times = running_times
+            self.failures = list(failures)
+            self.calls = []
+        def database_slot(self, database_id):
+            return contextlib.nullcontext()
+        def run_query(self, dataset_query):
+            database = dataset_query['database']
+            self.calls.append(database)
+            if database in self.failures:
+                self.failures.remove(database)
+                return QueryRun(500, 0.01, None, None, "HTTP 500: boom")
+            return QueryRun(202, self.running_times[database] / 1000, self.running_times[database], 3)
+    
+    runs = summarize_runs([QueryRun(202, 0.1, 100, 3), QueryRun(202, 0.3, 300, 3), QueryRun(None, 1.0, None, None, "timeout")])
+    assert runs["errors"] == 1 and runs["running_p50"] == 200 and runs["rows"] == 3
+    
+    mapping = load_migration_mapping()
+    source_card = {
+        "id": 1, "name": "Orders",
+        "dataset_query": {"type": "native", "database": 2, "native": {"query": "SELECT 1 AS X", "template-tags": {}}},
+        "result_metadata": [{"name": "X"}],
+    }
+    migrator = StubMigrator({2: 400, 16: 100})
+    original = benchmark_queries.migrated_card
+    try:
+        benchmark_queries.migrated_card = lambda question_id, card, migrator, mapping: (
+            {**card, "dataset_query": {**card["dataset_query"], "database": 16}}, None)
+        fast = benchmark_card(1, "Orders", source_card, migrator, mapping, runs=3, warmup=1)
+        assert migrator.calls == [2, 16] * 4, migrator.calls
+        assert fast["status"] == "ok" and fast["speedup"] == 4.0 and len(fast["runs"]["exasol"]) == 3
+        
+        slow = benchmark_card(2, "Slow", source_card, StubMigrator({2: 100, 16: 250}), mapping, runs=2, warmup=0)
+        assert slow["status"] == "slower" and slow["speedup"] == 0.4
+        
+        # A failure during warm-up is discarded, one in a measured run is not
+        warm = benchmark_card(3, "Warm", source_card, StubMigrator({2: 100, 16: 100}, failures=[16]), mapping, runs=2, warmup=1)
+        assert warm["status"] == "ok"
+        failed = benchmark_card(4, "Failed", source_card, StubMigrator({2: 100, 16: 100}, failures=[16]), mapping, runs=2, warmup=0)
+        assert failed["status"] == "error" and failed["starrocks"]["error"] == "HTTP 500: boom"
+        
+        benchmark_queries.migrated_card = lambda question_id, card, migrator, mapping: (None, "not migrated yet")
+        skipped = benchmark_card(5, "Skipped", source_card, migrator, mapping)
+        assert skipped["status"] == "skipped"
+    finally:
+        benchmark_queries.migrated_card = original
+    
+    summary = summarize_dashboard([fast, slow, failed, skipped])
+    assert summary["measured"] == 2 and summary["slower_cards"] == [2]
+    assert summary["exasol_total_p50"] == 500 and summary["starrocks_total_p50"] == 350
+    assert abs(summary["speedup"] - 500 / 350) < 1e-9 and summary["median_card_speedup"] == 2.2
+    print("✅ Percentiles, speedups, warm-up runs and slower cards reported")
+
+def test_performance_ledger():
+    """Test that executions are recorded and latency regressions found against the rolling baseline"""
+    
+    print("\n📒 Testing Performance Ledger")
+    print("=" * 50)
+    
+    def run(running_time, sql="SELECT 1", database_id=16, error=None):
+        return QueryRun(202, running_time / 1000, running_time, 1, error, time.time(), database_id, sql)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ledger.sqlite")
+        for session, (slow, steady) in enumerate([(100, 900), (110, 1000), (90, 1100), (105, 950)]):
+            ledger = PerformanceLedger(path)
+            ledger.run_id = f"run-{session}"
+            ledger.record_many([(1, run(slow)), (2, run(steady)), (3, run(20))], "validate", 421)
+            ledger.close()
+        
+        ledger = PerformanceLedger(path)
+        ledger.run_id = "run-latest"
+        # Card 1 got much slower after a converter change; card 2 is within its usual range;
+        # card 3 tripled but only by 40ms; card 4 has no baseline; the failed run is ignored
+        ledger.record_many([(1, run(400, sql="SELECT 2")), (1, run(420, sql="SELECT 2")), (2, run(1200)),
+                            (3, run(60)), (4, run(5000)), (2, run(9000, error="timeout"))], "validate", 421)
+        # The Exasol side of a benchmark is judged separately from StarRocks
+        ledger.record(1, run(400, database_id=2), "benchmark")
+        assert ledger.summary() == "19 executions of 4 cards"
+        
+        regressions = ledger.regressions(threshold=0.5, window=20, min_runs=3, min_delta_ms=100)
+        assert [(r.card_id, r.database_id, r.kind) for r in regressions] == [(1, 16, "validate")], regressions
+        regression = regressions[0]
+        assert regression.baseline_ms == 102.5 and regression.latest_ms == 410
+        assert regression.baseline_runs == 4 and regression.latest_runs == 2
+        assert regression.sql_changed and regression.dashboard_id == 421
+        assert [r.card_id for r in ledger.regressions(threshold=0.5, min_delta_ms=10)] == [1, 3]
+        assert ledger.regressions(min_runs=5) == []
+        ledger.close()
+        
+        class StubMigrator:
+            query_runs = {4218: run(300), 4217: run(50), 9999: run(70)}
+        original_path = MIGRATION_SETTINGS["performance_ledger_path"]
+        MIGRATION_SETTINGS["performance_ledger_path"] = os.path.join(directory, "validation.sqlite")
+        try:
+            record_query_runs(421, [{"question_id": 4218}, {"question_id": 4217}, {"question_id": 4216}], StubMigrator)
+            assert get_performance_ledger().summary() == "2 executions of 2 cards"
+            assert list(StubMigrator.query_runs) == [9999]
+            get_performance_ledger().close()
+        finally:
+            MIGRATION_SETTINGS["performance_ledger_path"] = original_path
+    print("✅ Executions recorded and regressions flagged against the rolling baseline")
+
+def test_load_test():
+    """Test that a simulated dashboard open fires every card at once with default filter values"""
+    
+    print("\n🚦 Testing Dashboard Load Simulation")
+    print("=" * 50)
+    
+    with open("inspections/dashboard_421_inspection.json") as f:
+        dashboard = json.load(f)
+    first_tab = [dashcard for dashcard in dashboard["dashcards"] if dashcard["dashboard_tab_id"] == 277]
+    queries = dashcard_queries(dashboard, "dashcard")
+    assert [query["dashcard_id"] for query in queries] == [dashcard["id"] for dashcard in first_tab]
+    assert len(dashcard_queries(dashboard, "dashcard", all_tabs=True)) == len(dashboard["dashcards"])
+    period = next(p for p in queries[0]["body"]["parameters"] if p["id"] == "a469fd43")
+    assert period["value"] == "past1weeks" and period["target"][1] == ["template-tag", "CREATED_AT"]
+    # Filters without a default are left out, as the frontend does
+    assert all(p["value"] is not None for query in queries for p in query["body"]["parameters"])
+    dataset = dashcard_queries(dashboard, "dataset")[0]
+    assert dataset["path"] == "/api/dataset" and dataset["body"]["native"] and dataset["body"]["parameters"]
+    
+    failing = queries[1]["card_id"]
+    state = {"in_flight": 0, "peak": 0, "paths": set()}
+    lock = threading.Lock()
+    
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+                state["paths"].add(self.path)
+            time.sleep(0.05)
+            with lock:
+                state["in_flight"] -= 1
+            card_id = int(self.path.split("/")[-2])
+            if card_id == failing:
+                body = json.dumps({"status": "failed", "error": "Query timeout"}).encode()
+            else:
+                body = json.dumps({"status": "completed", "row_count": 1, "running_time": 40, "data": {"rows": [[1]]}}).encode()
+            self.send_response(202)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        runner = LoadRunner(f"http://127.0.0.1:{server.server_address[1]}", "token", queries)
+        loads = runner.run(users=2, loads_per_user=2, think_time=0)
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    # Both users' cards were in flight together, not one query at a time
+    assert state["peak"] >= len(queries), state["peak"]
+    assert state["paths"] == {query["path"] for query in queries}
+    summary = summarize_load(loads, queries)
+    assert summary["loads"] == 4 and summary["requests"] == 4 * len(queries)
+    assert summary["errors"] == 4 and abs(summary["error_rate"] - 1 / len(queries)) < 1e-9
+    assert summary["cards"][failing]["error_rate"] == 1.0 and summary["cards"][failing]["error"] == "Query timeout"
+    assert 50 <= summary["time_to_last_card_p50"] < 50 * len(queries)
+    assert all(card["p50"] >= 50 for card_id, card in summary["cards"].items() if card_id != failing)
+    print(f"✅ {summary['requests']} card queries fired concurrently (peak {state['peak']} in flight), "
+          f"time to last card p50 {summary['time_to_last_card_p50']:.0f}ms")
+
 if __name__ == "__main__":
     # Run tests
     sql_tests_passed = test_sql_converter()
     test_database_mappings()
+    test_converter_rebuild()
+    test_starrocks_rewriter()
+    test_table_matcher()
+    test_conversion_cache()
+    test_convert_many()
+    test_concurrent_card_fetch()
+    test_card_cache()
+    test_embedded_cards()
+    test_http_transport()
+    test_async_client()
+    test_async_client_retries()
+    test_migration_pipeline()
+    test_migration_journal()
+    test_delta_selection()
+    test_migration_plan()
+    test_preflight()
+    test_schema_validation()
+    test_database_slots()
+    test_adaptive_concurrency()
+    test_result_parity()
+    test_result_compare()
+    test_query_benchmark()
+    test_performance_ledger()
+    test_load_test()
     
     print(f"\n🎯 Overall Result: {'PASSED' if sql_tests_passed else 'FAILED'}") 
\ No newline at end of file